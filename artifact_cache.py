@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import pandas as pd
+from tools import path
+
+
+def frame_fingerprint(data):
+    """
+    Content hash of a quotes frame: its values, index, column names and dtypes.
+
+    Returns:
+        str: A hex digest that changes whenever any bar changes.
+    """
+    digest = hashlib.sha256(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    digest.update(json.dumps([[str(column), str(dtype)] for column, dtype in data.dtypes.items()]).encode())
+    return digest.hexdigest()
+
+
+def _link(source, target):
+    """
+    Hard-link `source` as `target`, copying where links are not possible (another filesystem, FAT...).
+    """
+    temporary = f"{target}.tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    try:
+        os.link(source, temporary)
+    except OSError:
+        shutil.copyfile(source, temporary)
+    os.replace(temporary, target)
+
+
+def _stat(file_path):
+    stat = os.stat(file_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    A content-addressed cache of the files an analysis writes, so an unchanged run reuses them instead of
+    recomputing the indicators and writing the files again.
+
+    An entry is keyed by the fingerprint of the fetched frame and the parameters that shape the output (indicators,
+    windows, theme, file names...), see `key`. It maps every output path to a blob named by the hash of its content,
+    stored under '<root>/blobs', so files shared by many entries (plotly.min.js) are stored once. On a hit the outputs
+    that are missing or differ from their blobs are put back; outputs left untouched since are not even read.
+
+    Blobs are hard links of the outputs (copies where the filesystem cannot link), so caching takes no extra space.
+    An output rewritten in place, as the exporters do, rewrites its blob too: every blob's size and modification time
+    are recorded, and an entry whose blobs changed since is a miss, while `store` replaces a changed blob.
+
+    The blobs are limited to `max_bytes`: the least recently used entries are evicted first, together with the blobs
+    no other entry refers to. The index is a JSON file written aside and renamed.
+
+    Attributes:
+        root (str): The directory of the cache.
+        max_bytes (int): The size limit of the blobs.
+        hits (int): Lookups served from the cache.
+        misses (int): Lookups that had to produce the files.
+        seconds_saved (float): The production time recorded for the hits, minus the time the hits took.
+    """
+    def __init__(self, root=None, max_bytes=512 * 2 ** 20):
+        self.root = str(root or os.path.join(path, "store", "artifacts"))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._index_path = os.path.join(self.root, "index.json")
+        self._lock = threading.Lock()
+        self._index = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, encoding='utf-8') as file:
+                self._index = json.load(file)
+
+    @staticmethod
+    def key(fingerprint, **params):
+        """
+        The key of an artifact: the frame fingerprint (see `frame_fingerprint`) and every parameter of the output.
+        """
+        payload = json.dumps({'data': fingerprint, **params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _blob(self, digest):
+        return os.path.join(self.root, "blobs", digest)
+
+    def _blob_stat(self, digest):
+        return _stat(self._blob(digest)) if os.path.exists(self._blob(digest)) else None
+
+    def _save_index(self):
+        temporary = f"{self._index_path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self._index, file)
+        os.replace(temporary, self._index_path)
+
+    def restore(self, logger, key):
+        """
+        Bring back the outputs of `key` if it is cached.
+
+        Returns:
+            bool: True on a hit (the outputs are in place), False on a miss.
+
+        Logs:
+            Logs a debug message with the outcome.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None or not all(self._blob_stat(digest) == entry.get('blobs', {}).get(digest)
+                                        for digest in entry['files'].values()):
+                self.misses += 1
+                logger.debug("Artifact cache miss %s", key[:12])
+                return False
+            for file_path, digest in entry['files'].items():
+                stat = _stat(file_path) if os.path.exists(file_path) else None
+                if stat != entry['stats'].get(file_path):
+                    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+                    _link(self._blob(digest), file_path)
+                    entry['stats'][file_path] = _stat(file_path)
+            entry['last_used'] = time.time()
+            self._save_index()
+            self.hits += 1
+            saved = entry['seconds'] - (time.perf_counter() - started)
+            self.seconds_saved += saved
+        logger.debug("Artifact cache hit %s: %s files reused, %.3fs saved", key[:12], len(entry['files']), saved)
+        return True
+
+    def store(self, logger, key, files, seconds):
+        """
+        Record the outputs of `key`, produced in `seconds`, and evict old entries beyond `max_bytes`.
+
+        Args:
+            logger (logging.Logger): The logger object used to log debug messages.
+            key (str): The key from `key`.
+            files (iterable): Paths of the written files. Missing paths are skipped.
+            seconds (float): How long producing the files took; a later hit counts it as saved.
+
+        Logs:
+            Logs a debug message with the stored files and the evicted entries.
+        """
+        with self._lock:
+            os.makedirs(os.path.join(self.root, "blobs"), exist_ok=True)
+            entry = {'files': {}, 'stats': {}, 'blobs': {}, 'seconds': seconds, 'last_used': time.time()}
+            for file_path in files:
+                if not file_path or not os.path.exists(file_path):
+                    continue
+                file_path = str(file_path)
+                digest = _file_hash(file_path)
+                recorded = next((other['blobs'][digest] for other in [entry, *self._index.values()]
+                                 if digest in other.get('blobs', {})), None)
+                # A blob missing, unknown or changed since it was recorded is (re)made from the output
+                if recorded is None or self._blob_stat(digest) != recorded:
+                    _link(file_path, self._blob(digest))
+                entry['files'][file_path] = digest
+                entry['stats'][file_path] = _stat(file_path)
+                entry['blobs'][digest] = self._blob_stat(digest)
+            self._index[key] = entry
+            evicted = self._evict()
+            self._save_index()
+        logger.debug("Artifact cache stored %s: %s files, %s entries evicted", key[:12], len(entry['files']), evicted)
+
+    def _sizes(self):
+        return {digest: os.path.getsize(self._blob(digest)) for entry in self._index.values()
+                for digest in entry['files'].values() if os.path.exists(self._blob(digest))}
+
+    def _evict(self):
+        evicted = 0
+        sizes = self._sizes()
+        # Keep at least the newest entry, even if it alone exceeds the limit
+        while sum(sizes.values()) > self.max_bytes and len(self._index) > 1:
+            oldest = min(self._index, key=lambda key: self._index[key]['last_used'])
+            del self._index[oldest]
+            evicted += 1
+            referenced = self._sizes()
+            for digest in set(sizes) - set(referenced):
+                os.remove(self._blob(digest))
+            sizes = referenced
+        return evicted
+
+    def stats(self):
+        sizes = self._sizes()
+        return {'hits': self.hits, 'misses': self.misses, 'seconds_saved': self.seconds_saved,
+                'entries': len(self._index), 'bytes': sum(sizes.values())}
@@ -0,0 +1,242 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import numpy as np
+import pandas as pd
+from rich.table import Table
+from data_download import fetch_stock_data
+from log_manager import Logger
+from quote_store import QuoteStore
+from wide_indicators import rsi, ewm_mean
+from tools import console
+
+# Parameter grids swept by default, per strategy
+DEFAULT_GRIDS = {'ma': {'window': list(range(2, 201))},
+                 'rsi': {'window': [14], 'lower': [20, 25, 30, 35], 'upper': [65, 70, 75, 80]},
+                 'macd': {'short': [8, 12], 'long': [21, 26], 'signal': [9]}}
+# Metrics of every backtest, in the column order of the results
+METRICS = ['total_return', 'buy_and_hold', 'max_drawdown', 'hit_rate', 'trades', 'exposure']
+
+
+def ma_matrix(close, windows):
+    """
+    Moving averages of a 1-D price array for many windows at once.
+
+    All windows are computed from one cumulative sum: the mean of the `w` prices ending at row t is
+    (cumsum[t] - cumsum[t - w]) / w. Matches `add_moving_average` for every window (NaN until `w` prices).
+
+    Returns:
+        numpy.ndarray: A (rows, len(windows)) array.
+    """
+    windows = np.asarray(windows)
+    sums = np.concatenate([[0.0], np.cumsum(close)])
+    end = np.arange(1, len(close) + 1)[:, None]
+    begin = end - windows[None, :]
+    with np.errstate(invalid='ignore'):
+        result = (sums[end] - sums[np.maximum(begin, 0)]) / windows[None, :]
+    result[begin < 0] = np.nan
+    return result
+
+
+def _hold(entries, exits):
+    """Position 1 from an entry until the next exit (a bar with both counts as an entry), 0 otherwise."""
+    state = np.where(entries, 1.0, np.where(exits, 0.0, np.nan))
+    rows = np.where(np.isnan(state), 0, np.arange(len(state))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    held = state[rows, np.arange(state.shape[1])[None, :]]
+    return np.nan_to_num(held, nan=0.0)
+
+
+def ma_signals(close, windows):
+    """
+    Long while the close is above its moving average, one column per window.
+    """
+    with np.errstate(invalid='ignore'):
+        return (close[:, None] > ma_matrix(close, windows)).astype(float)
+
+
+def rsi_signals(close, window, lower, upper):
+    """
+    Long from the RSI falling below `lower` (oversold) until it rises above `upper`, one column per (lower, upper).
+    """
+    values = rsi(close[:, None], window)
+    lower, upper = np.asarray(lower, dtype=float), np.asarray(upper, dtype=float)
+    with np.errstate(invalid='ignore'):
+        return _hold(values < lower[None, :], values > upper[None, :])
+
+
+def macd_signals(close, pairs, signal_span=9):
+    """
+    Long while the MACD line is above its signal line, one column per (short, long) span pair.
+    """
+    spans = sorted({span for pair in pairs for span in pair})
+    emas = {span: ewm_mean(close[:, None], span)[:, 0] for span in spans}
+    lines = np.column_stack([emas[short] - emas[long] for short, long in pairs])
+    with np.errstate(invalid='ignore'):
+        return (lines > ewm_mean(lines, signal_span)).astype(float)
+
+
+def performance(close, signals):
+    """
+    Evaluate long/flat signals on a price series, all columns at once.
+
+    A signal decided on the close of bar t is held during bar t + 1, so no strategy trades on a price it could not
+    have known.
+
+    Args:
+        close (numpy.ndarray): 1-D prices without gaps.
+        signals (numpy.ndarray): (rows, strategies) array of 0 (flat) or 1 (long).
+
+    Returns:
+        dict: {metric: 1-D array} for METRICS. total_return and buy_and_hold are fractions (0.1 = +10%),
+              max_drawdown is the largest peak-to-trough loss of the equity curve, hit_rate the share of trades
+              with a positive return, exposure the share of bars in the market.
+    """
+    returns = np.zeros_like(close)
+    returns[1:] = close[1:] / close[:-1] - 1
+    held = np.zeros_like(signals)
+    held[1:] = signals[:-1]
+    log_returns = held * np.log1p(returns)[:, None]
+    equity = np.exp(np.cumsum(log_returns, axis=0))
+    drawdown = 1 - equity / np.maximum.accumulate(equity, axis=0)
+    # Sum the log returns of every trade: consecutive held bars share a trade number
+    previous = np.zeros_like(held)
+    previous[1:] = held[:-1]
+    entries = (held > 0) & (previous == 0)
+    trade = np.cumsum(entries, axis=0)
+    in_trade = held > 0
+    rows, columns = held.shape
+    keys = (np.arange(columns)[None, :] * (rows + 1) + trade)[in_trade]
+    trade_returns = np.bincount(keys, weights=log_returns[in_trade], minlength=columns * (rows + 1))
+    wins = (trade_returns.reshape(columns, rows + 1) > 0).sum(axis=1)
+    trades = entries.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hit_rate = np.where(trades > 0, wins / trades, np.nan)
+    return {'total_return': equity[-1] - 1,
+            'buy_and_hold': np.full(columns, close[-1] / close[0] - 1),
+            'max_drawdown': drawdown.max(axis=0),
+            'hit_rate': hit_rate,
+            'trades': trades,
+            'exposure': held.mean(axis=0)}
+
+
+def backtest(close, grids=None):
+    """
+    Sweep the parameter grids of the MA, RSI and MACD strategies on one price series.
+
+    Args:
+        close (array-like): Close prices in time order; missing prices are filled with the last known one.
+        grids (dict, optional): {strategy: {parameter: values}}, see DEFAULT_GRIDS. Strategies left out are skipped.
+
+    Returns:
+        pandas.DataFrame: One row per strategy and parameter combination with the columns 'strategy', 'params'
+                          and METRICS. Empty when there are no prices or no valid parameter combination.
+    """
+    grids = DEFAULT_GRIDS if grids is None else grids
+    close = pd.Series(np.asarray(close, dtype=float)).ffill().dropna().to_numpy()
+    empty = pd.DataFrame(columns=['strategy', 'params', *METRICS])
+    if not len(close):
+        return empty
+    tables = []
+    windows = list(grids['ma']['window']) if 'ma' in grids else []
+    if windows:
+        tables.append(('ma', [f"window={w}" for w in windows], ma_signals(close, windows)))
+    if 'rsi' in grids:
+        grid = grids['rsi']
+        pairs = [(lower, upper) for lower, upper in product(grid['lower'], grid['upper']) if lower < upper]
+        for window in grid['window'] if pairs else []:
+            tables.append(('rsi', [f"window={window} lower={lower} upper={upper}" for lower, upper in pairs],
+                           rsi_signals(close, window, *zip(*pairs))))
+    if 'macd' in grids:
+        grid = grids['macd']
+        pairs = [(short, long) for short, long in product(grid['short'], grid['long']) if short < long]
+        for signal_span in grid.get('signal', [9]) if pairs else []:
+            tables.append(('macd', [f"short={short} long={long} signal={signal_span}" for short, long in pairs],
+                           macd_signals(close, pairs, signal_span)))
+    results = []
+    for strategy, params, signals in tables:
+        metrics = performance(close, signals)
+        results.append(pd.DataFrame({'strategy': strategy, 'params': params, **metrics}))
+    return pd.concat(results, ignore_index=True) if results else empty
+
+
+def _backtest_job(ticker, close, grids):
+    # Runs in a worker process
+    result = backtest(close, grids)
+    result.insert(0, 'ticker', ticker)
+    return result
+
+
+# Backtest many tickers on a process pool
+def run_backtests(logger, closes, grids=None, max_workers=None):
+    """
+    Sweep the parameter grids for every ticker, spreading the tickers over a process pool.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        closes (dict): {ticker: close prices}, e.g. {ticker: data['Close']} of fetched frames.
+        grids (dict, optional): The parameter grids, see `backtest`.
+        max_workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+        pandas.DataFrame: The `backtest` rows of all tickers with a 'ticker' column, best total return first.
+
+    Logs:
+        Logs a debug message with the number of backtests and the time taken, and every failed ticker.
+    """
+    started = time.perf_counter()
+    tables = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {ticker: pool.submit(_backtest_job, ticker, np.asarray(close, dtype=float), grids)
+                   for ticker, close in closes.items()}
+        for ticker, future in futures.items():
+            try:
+                tables.append(future.result())
+            except Exception as e:
+                logger.debug("Backtest of %s failed: %s", ticker, e)
+    result = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=['ticker', 'strategy',
+                                                                                      'params'] + METRICS)
+    result = result.sort_values('total_return', ascending=False, ignore_index=True)
+    logger.debug("%s backtests of %s tickers in %.2fs", len(result), len(closes), time.perf_counter() - started)
+    return result
+
+
+def print_backtests(results, top=20):
+    """
+    Print the best `top` rows of `run_backtests` as a table.
+    """
+    table = Table(title="Best strategies", header_style="#00a400 bold")
+    for column in ['Ticker', 'Strategy', 'Params', 'Return', 'Buy & hold', 'Max drawdown', 'Hit rate', 'Trades']:
+        table.add_column(column, justify="left" if column in ('Ticker', 'Strategy', 'Params') else "right")
+    for row in results.head(top).itertuples(index=False):
+        table.add_row(row.ticker, row.strategy, row.params, f"{row.total_return:.1%}", f"{row.buy_and_hold:.1%}",
+                      f"{row.max_drawdown:.1%}", "-" if np.isnan(row.hit_rate) else f"{row.hit_rate:.0%}",
+                      str(row.trades))
+    console.print(table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest MA, RSI and MACD strategies over parameter grids")
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--period", default="5y")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    logger = Logger()
+    log, func_log = logger.get_main_logger(), logger.get_function_logger()
+    store = QuoteStore()
+    closes = {}
+    for ticker in dict.fromkeys(args.tickers):
+        data = fetch_stock_data(func_log, ticker, args.period, store=store)
+        if data is not None:
+            closes[ticker] = data['Close'].to_numpy()
+    log.info(f"Backtesting {len(closes)} symbols")
+    results = run_backtests(func_log, closes, max_workers=args.workers)
+    print_backtests(results, args.top)
+    log.info("Stop\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from data_download import fetch_stock_data, statistic_indicators
+from indicator_engine import IndicatorEngine
+from compact import compact_indicators
+from tools import console, period_spell
+
+
+# Fetch and process one ticker, raising on failure so the batch can record it
+def analyze_ticker(logger, ticker, period, provider=None, store=None, window_size=5, interval='1d', compact=False,
+                   engine=None):
+    """
+    Fetch quotes for one ticker and run the MA, RSI, MACD and statistic indicators pipeline on them.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        ticker (str): The stock ticker symbol, e.g., 'AAPL'.
+        period (str | list): A preset period code or a custom [start, end] list.
+        provider (optional): The data provider passed to `fetch_stock_data`.
+        store (quote_store.QuoteStore, optional): The local quote store passed to `fetch_stock_data`.
+        window_size (int): The moving average window size.
+        interval (str): The bar interval passed to `fetch_stock_data`.
+        compact (bool): Keep the quotes and the indicators in float32 without unused columns.
+        engine (indicator_engine.IndicatorEngine, optional): The engine computing the indicators, a new one by default.
+
+    Returns:
+        tuple: (data, summary) - the fetched quotes with the indicator columns added and the statistic indicators.
+
+    Raises:
+        LookupError: If no quotes were received for the ticker.
+    """
+    data = fetch_stock_data(logger, ticker, period, store=store, provider=provider, interval=interval, compact=compact)
+    if data is None:
+        raise LookupError(f"No quotes received for {ticker}")
+    if compact:
+        data = compact_indicators(logger, data, window_size)
+    else:
+        (engine or IndicatorEngine()).add_to(logger, data, ('MA', 'RSI', 'MACD'), window_size=window_size)
+    summary = statistic_indicators(logger, data, ticker, period)
+    return data, summary
+
+
+# Fetch and process many tickers concurrently
+def run_batch(logger, tickers, period, provider=None, store=None, max_workers=8, window_size=5, interval='1d',
+              compact=False, engine=None):
+    """
+    Fetch and analyze a list of tickers concurrently on a bounded thread pool.
+
+    Fetching is I/O bound, so a thread pool overlaps the network waits of up to `max_workers` requests. A failure of
+    one ticker (network error, unknown symbol) is recorded and does not affect the others.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        tickers (list): The stock ticker symbols to process.
+        period (str | list): A preset period code or a custom [start, end] list.
+        provider (optional): The data provider, defaults to Yahoo Finance.
+        store (quote_store.QuoteStore, optional): The local quote store shared by all workers.
+        max_workers (int): The maximum number of concurrent fetches.
+        window_size (int): The moving average window size.
+        interval (str): The bar interval, e.g. '1d' or '5m'.
+        compact (bool): Keep the results memory-lean (see `analyze_ticker`), for multi-thousand-ticker universes.
+        engine (indicator_engine.IndicatorEngine, optional): The engine shared by the workers (its memo is
+                                                             thread-safe), a new one per batch by default.
+
+    Returns:
+        dict: {'results': {ticker: DataFrame}, 'summaries': {ticker: dict}, 'errors': {ticker: str},
+               'seconds': float, 'throughput': float}, where throughput is the number of processed tickers per second.
+
+    Logs:
+        Logs a debug message for every failed ticker and the overall throughput.
+    """
+    results, summaries, errors = {}, {}, {}
+    started = time.perf_counter()
+    engine = engine or IndicatorEngine()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(analyze_ticker, logger, ticker, period, provider, store, window_size, interval,
+                               compact, engine): ticker
+                   for ticker in dict.fromkeys(tickers)}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                results[ticker], summaries[ticker] = future.result()
+            except Exception as e:
+                errors[ticker] = str(e)
+                logger.debug("Batch processing of %s failed: %s", ticker, e)
+    seconds = time.perf_counter() - started
+    throughput = (len(results) + len(errors)) / seconds if seconds else 0.0
+    logger.debug("Batch of %s tickers processed in %.2fs (%.1f tickers/s)", len(futures), seconds, throughput)
+    return {'results': results, 'summaries': summaries, 'errors': errors, 'seconds': seconds,
+            'throughput': throughput}
+
+
+def print_batch_summary(batch, period):
+    """
+    Print the outcome of `run_batch`: processed and failed tickers and the overall throughput.
+    """
+    console.print(f"[#00a400 bold]Processed {len(batch['results'])} tickers for {period_spell(period)} "
+                  f"in {batch['seconds']:.2f}s ({batch['throughput']:.1f} tickers/s)[#00a400 bold]")
+    for ticker, error in sorted(batch['errors'].items()):
+        console.print(f"[red]{ticker}: {error}[red]")
@@ -0,0 +1,605 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+import data_download
+from data_download import add_moving_average, calculate_rsi, calculate_macd
+from wide_indicators import wide_indicators
+from data_plotting import build_figure, render_chart
+from providers import FakeProvider
+from batch import run_batch
+from log_manager import Logger
+from compact import compact_report
+from screener import screen
+from mmap_store import MmapStore
+from correlation import RollingCorrelation
+from resampling import ResamplingPyramid
+from tools import console, path
+
+SUITES = {"quick": {"rows": [1_000, 10_000], "tickers": [1, 10]},
+          "default": {"rows": [1_000, 100_000, 1_000_000], "tickers": [1, 100, 1_000]},
+          "full": {"rows": [1_000, 100_000, 1_000_000, 10_000_000], "tickers": [1, 100, 1_000, 5_000]}}
+
+# Charts are only rendered up to this size; beyond it the HTML alone would take gigabytes
+CHART_MAX_ROWS = 1_000_000
+
+# Import-time budgets of the entry points in ms (`python -X importtime`, cumulative); pandas alone takes ~450 ms
+STARTUP_BUDGETS_MS = {"main": 700, "batch": 650, "watch": 650, "service": 650, "backtest": 700}
+# Heavy modules that importing an entry point must not load; they are imported on first use
+LAZY_MODULES = ("InquirerPy", "yfinance", "requests", "plotly.graph_objects", "plotly.offline")
+
+# Benchmarks log into a logger without handlers, so logging cost does not distort timings
+bench_logger = logging.getLogger("benchmark")
+bench_logger.propagate = False
+
+
+def synthetic_close_matrix(n_rows, n_tickers, seed=0):
+    """
+    Random-walk close prices indexed by business days with one column per ticker.
+    """
+    rng = np.random.default_rng(seed)
+    values = 100 + rng.standard_normal((n_rows, n_tickers)).cumsum(axis=0)
+    dates = pd.bdate_range("2000-01-03", periods=n_rows, name="Date")
+    return pd.DataFrame(values, index=dates, columns=[f"T{i:05d}" for i in range(n_tickers)])
+
+
+def synthetic_ohlcv(n_rows, seed=0):
+    """
+    A yfinance-shaped OHLCV frame of `n_rows` bars indexed by 'Date'.
+
+    Business days are used while they fit into the pandas date range, minute bars beyond that.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.standard_normal(n_rows).cumsum() * 0.1
+    close = np.abs(close) + 1
+    spread = np.abs(rng.standard_normal(n_rows)) * 0.5
+    freq = "B" if n_rows <= 60_000 else "min"
+    dates = pd.date_range("2000-01-03", periods=n_rows, freq=freq, name="Date", tz="America/New_York")
+    return pd.DataFrame({"Open": close + rng.standard_normal(n_rows) * 0.1,
+                         "High": close + spread,
+                         "Low": close - spread,
+                         "Close": close,
+                         "Volume": rng.integers(1_000, 1_000_000, n_rows).astype(float),
+                         "Dividends": 0.0,
+                         "Stock Splits": 0.0}, index=dates)
+
+
+class FrameProvider:
+    """
+    Local fake provider serving a prepared OHLCV frame for any ticker, so fetch timings exclude the network.
+    """
+    def __init__(self, frame):
+        self.frame = frame
+
+    def history(self, ticker, **kwargs):
+        return self.frame.copy()
+
+
+def timed(func, *args, repeat=1, **kwargs):
+    """
+    Best wall time (in seconds) of `repeat` calls of func(*args, **kwargs) and the result of the last call.
+    """
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def per_ticker_indicators(close, window_size=5):
+    frames = {}
+    for ticker in close.columns:
+        data = pd.DataFrame({"Close": close[ticker]})
+        add_moving_average(bench_logger, data, window_size)
+        calculate_rsi(bench_logger, data)
+        calculate_macd(bench_logger, data)
+        frames[ticker] = data
+    return frames
+
+
+def bench_wide_indicators(n_rows=2520, n_tickers=2000, repeat=3):
+    """
+    Compare the per-ticker indicator functions with the wide-frame engine on the same universe.
+
+    Returns:
+        dict: Timings of both paths, the speedup and the largest absolute difference between their results.
+    """
+    close = synthetic_close_matrix(n_rows, n_tickers)
+    per_ticker_time, frames = timed(per_ticker_indicators, close, repeat=repeat)
+    wide_time, wide = timed(wide_indicators, bench_logger, close, repeat=repeat)
+    max_diff = max(np.nanmax(np.abs(wide[column].to_numpy() - pd.DataFrame({t: f[column] for t, f in frames.items()}).to_numpy()))
+                   for column in ("MA", "RSI", "MACD"))
+    return {"rows": n_rows, "tickers": n_tickers, "per_ticker_s": per_ticker_time, "wide_s": wide_time,
+            "speedup": per_ticker_time / wide_time, "max_abs_diff": float(max_diff)}
+
+
+def synthetic_quotes(n_rows, freq="min", seed=0):
+    """
+    A single-ticker quote frame with a 'Date' column and the MA, RSI and MACD columns added.
+    """
+    close = synthetic_close_matrix(n_rows, 1, seed).iloc[:, 0].to_numpy()
+    data = pd.DataFrame({"Date": pd.date_range("2020-01-01", periods=n_rows, freq=freq), "Close": close})
+    add_moving_average(bench_logger, data, 5)
+    calculate_rsi(bench_logger, data)
+    calculate_macd(bench_logger, data)
+    return data
+
+
+def bench_chart(n_rows=500_000, max_points=2000):
+    """
+    Compare the full-resolution SVG chart with inlined plotly.js against an LTTB-downsampled WebGL chart that
+    references a shared plotly.js file.
+
+    Returns:
+        dict: {'full': {...}, 'downsampled': {...}} with the file size in bytes and the build and write times.
+    """
+    data = synthetic_quotes(n_rows)
+    modes = {"full": dict(max_points=None, webgl=False, include_plotlyjs=True),
+             "downsampled": dict(max_points=max_points, webgl=True, include_plotlyjs="directory")}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, options in modes.items():
+            file_path = os.path.join(tmp, f"{name}.html")
+            build_time, fig = timed(build_figure, data, "max", max_points=options["max_points"],
+                                    webgl=options["webgl"])
+            write_time, _ = timed(fig.write_html, file_path, include_plotlyjs=options["include_plotlyjs"])
+            results[name] = {"rows": n_rows, "bytes": os.path.getsize(file_path),
+                             "build_s": build_time, "write_s": write_time}
+    return results
+
+
+def bench_logging(n_calls=100_000):
+    """
+    Measure the cost per `logger.debug` call on the calling thread for the logging modes of `log_manager.Logger`.
+
+    Modes: synchronous file handler or background queue, eager f-string or lazy %-style message, and the level
+    set to DEBUG (record written) or INFO (record dropped, where only an eager f-string still costs formatting).
+
+    Returns:
+        dict: {mode: {'us_per_call': float, 'close_s': float}}, where close_s is the time to flush on close.
+    """
+    ticker, window_size = "AAPL", 5
+    results = {}
+    for use_queue in (False, True):
+        for level in (logging.DEBUG, logging.INFO):
+            for lazy in (False, True):
+                with tempfile.TemporaryDirectory() as tmp:
+                    logger = Logger(log_dir=tmp, log_level=level, use_queue=use_queue)
+                    log = logger.get_function_logger()
+                    log.setLevel(level)
+                    started = time.perf_counter()
+                    if lazy:
+                        for i in range(n_calls):
+                            log.debug("Column with moving average price for %s days added to %s #%s",
+                                      window_size, ticker, i)
+                    else:
+                        for i in range(n_calls):
+                            log.debug(f"Column with moving average price for {window_size} days added to {ticker} #{i}")
+                    elapsed = time.perf_counter() - started
+                    closed = time.perf_counter()
+                    logger.close()
+                    log.setLevel(logging.DEBUG)
+                    mode = (f"{'queue' if use_queue else 'sync'}-{'lazy' if lazy else 'fstring'}-"
+                            f"{logging.getLevelName(level).lower()}")
+                    results[mode] = {"us_per_call": elapsed / n_calls * 1e6, "close_s": time.perf_counter() - closed}
+    return results
+
+
+def bench_startup(modules=None, repeat=5):
+    """
+    Measure the import time of the command entry points with `python -X importtime` in fresh interpreters.
+
+    Every module is imported `repeat` times in a new process and the median cumulative import time is reported,
+    together with the heaviest modules it pulls in and the LAZY_MODULES that were loaded although they should not be.
+
+    Args:
+        modules (iterable, optional): Module names, the keys of STARTUP_BUDGETS_MS by default.
+        repeat (int): Number of fresh interpreters per module.
+
+    Returns:
+        dict: {module: {'import_ms', 'budget_ms', 'heaviest': [(name, ms)], 'eager': [names]}}.
+    """
+    results = {}
+    for module in modules or STARTUP_BUDGETS_MS:
+        runs = []
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=path,
+                                    capture_output=True, text=True, check=True).stderr
+            times = {}
+            for line in output.splitlines():
+                if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+                    _, cumulative, name = line.split("|")
+                    times[name.strip()] = int(cumulative) / 1000
+            runs.append(times)
+        import_ms = float(np.median([times[module] for times in runs]))
+        direct = {name: ms for name, ms in runs[-1].items() if name != module and "." not in name}
+        results[module] = {"import_ms": import_ms, "budget_ms": STARTUP_BUDGETS_MS.get(module),
+                           "heaviest": sorted(direct.items(), key=lambda item: -item[1])[:5],
+                           "eager": [name for name in LAZY_MODULES if name in runs[-1]]}
+    return results
+
+
+def bench_correlation(n_tickers=2_000, n_rows=2520, window=60, updates=20, block_size=256, max_workers=None):
+    """
+    Time and peak memory of the correlation and beta matrices of a universe, and of incremental updates.
+
+    pandas `DataFrame.corr` on the same window is timed as the reference, and the largest difference is reported.
+
+    Returns:
+        dict: {'fit_s', 'matrices_s', 'update_ms', 'pandas_s', 'peak_mb', 'state_mb', 'max_abs_diff'}.
+    """
+    close = synthetic_close_matrix(n_rows + updates, n_tickers) + 100
+    close.iloc[:n_rows // 2, ::7] = np.nan  # late listings
+    history, new_bars = close.iloc[:n_rows], close.iloc[n_rows:]
+    tracemalloc.start()
+    started = time.perf_counter()
+    rolling = RollingCorrelation(close.columns, window, block_size=block_size, max_workers=max_workers).fit(history)
+    fitted = time.perf_counter()
+    correlation, beta = rolling.correlation(), rolling.beta()
+    finished = time.perf_counter()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    update_started = time.perf_counter()
+    for _, bar in new_bars.iterrows():
+        rolling.update(bar)
+    update_ms = (time.perf_counter() - update_started) / max(updates, 1) * 1000
+    pandas_started = time.perf_counter()
+    reference = close.pct_change(fill_method=None).iloc[-window:].corr()
+    pandas_s = time.perf_counter() - pandas_started
+    difference = np.nanmax(np.abs(rolling.correlation().to_numpy() - reference.to_numpy()))
+    return {"tickers": n_tickers, "window": window, "fit_s": fitted - started, "matrices_s": finished - fitted,
+            "update_ms": update_ms, "pandas_s": pandas_s, "peak_mb": peak / 2 ** 20,
+            "state_mb": rolling.nbytes() / 2 ** 20, "max_abs_diff": float(difference)}
+
+
+def bench_resampling(n_rows=1_000_000, new_rows=390, max_points=2000):
+    """
+    Build time of a resampling pyramid over minute bars, the cost of appending `new_rows` bars, and the rows read by
+    a full-range query within `max_points`, against charting every bar with LTTB.
+
+    Returns:
+        dict: {'build_s', 'append_ms', 'touched', 'levels', 'level', 'rows_read', 'select_ms', 'lttb_s', 'level_s'}.
+    """
+    data = synthetic_ohlcv(n_rows + new_rows).reset_index()
+    started = time.perf_counter()
+    pyramid = ResamplingPyramid(data.iloc[:n_rows], interval="1m")
+    built = time.perf_counter()
+    touched = pyramid.append(data.iloc[n_rows:])
+    appended = time.perf_counter()
+    level, frame = pyramid.select(max_points=max_points)
+    selected = time.perf_counter()
+    full, _ = timed(build_figure, pyramid.base.assign(MA=0.0, RSI=0.0, MACD=0.0), "max", max_points=max_points,
+                    webgl=True)
+    rollup_chart, _ = timed(build_figure, frame, "max", max_points=max_points, webgl=True)
+    return {"rows": len(pyramid.base), "build_s": built - started, "append_ms": (appended - built) * 1000,
+            "touched": touched, "levels": pyramid.stats(), "level": level, "rows_read": len(frame),
+            "select_ms": (selected - appended) * 1000, "lttb_s": full, "level_s": rollup_chart}
+
+
+def bench_compact(n_rows=100_000, n_tickers=5_000):
+    """
+    Bytes per row and indicator accuracy of compact frames (float32 and scaled int32 prices) against float64 frames.
+
+    Returns:
+        dict: {prices: `compact.compact_report` result plus 'universe_gib_before' and 'universe_gib_after'},
+              the memory of `n_tickers` such frames of 2520 rows (10 years of daily bars).
+    """
+    data = synthetic_ohlcv(n_rows).reset_index()
+    results = {}
+    for prices in ("float32", "int32"):
+        report = compact_report(bench_logger, data, prices)
+        for when in ("before", "after"):
+            report[f"universe_gib_{when}"] = report[f"bytes_per_row_{when}"] * 2520 * n_tickers / 2 ** 30
+        results[prices] = report
+    return results
+
+
+def bench_history_formats(n_rows=1_000_000, slice_rows=10_000, repeat=3):
+    """
+    Compare loading a long history from CSV, Parquet and the memory-mapped store, in full and as a recent slice.
+
+    Every load ends with the moving average of 'Close', so lazily mapped pages are actually read.
+
+    Returns:
+        dict: {format: {'bytes', 'full_s', 'slice_s'}} with the size on disk and the best load times.
+    """
+    data = synthetic_ohlcv(n_rows).reset_index()
+    tz = data["Date"].dt.tz
+    first = data["Date"].iloc[-slice_rows]
+    start = first.tz_localize(None)
+
+    def read_csv():
+        frame = pd.read_csv(csv_path)
+        frame["Date"] = pd.to_datetime(frame["Date"], utc=True).dt.tz_convert(tz)
+        return frame
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, parquet_path = os.path.join(tmp, "history.csv"), os.path.join(tmp, "history.parquet")
+        data.to_csv(csv_path, index=False)
+        data.to_parquet(parquet_path, index=False)
+        store = MmapStore(os.path.join(tmp, "mmap"))
+        store.save("BENCH", data)
+        loaders = {
+            "csv": (read_csv, lambda: (lambda frame: frame[frame["Date"] >= first])(read_csv())),
+            "parquet": (lambda: pd.read_parquet(parquet_path),
+                        lambda: pd.read_parquet(parquet_path, filters=[("Date", ">=", first)])),
+            "mmap": (lambda: store.load("BENCH"), lambda: store.load("BENCH", start=start)),
+        }
+        ticker_dir = os.path.join(store.root, "BENCH")
+        sizes = {"csv": os.path.getsize(csv_path), "parquet": os.path.getsize(parquet_path),
+                 "mmap": sum(os.path.getsize(os.path.join(ticker_dir, f)) for f in os.listdir(ticker_dir))}
+        moving_average = lambda load: load()["Close"].rolling(5).mean()
+        for name, (full, recent) in loaders.items():
+            full_time, _ = timed(moving_average, full, repeat=repeat)
+            slice_time, recent_ma = timed(moving_average, recent, repeat=repeat)
+            results[name] = {"bytes": sizes[name], "full_s": full_time, "slice_s": slice_time,
+                             "slice_rows": len(recent_ma)}
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=path, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _single_ticker_cases(n_rows):
+    """
+    (name, callable) pairs timing every function of data_download and data_plotting on one ticker.
+    """
+    raw = synthetic_ohlcv(n_rows)
+    data = raw.reset_index()
+    add_moving_average(bench_logger, data, 5)
+    calculate_rsi(bench_logger, data)
+    calculate_macd(bench_logger, data)
+    summary = data_download.statistic_indicators(bench_logger, data, "BENCH", "max")
+    fresh = lambda: data[["Date", "Close"]].copy()
+    provider = FrameProvider(raw)
+    cases = [
+        ("fetch_stock_data", lambda: data_download.fetch_stock_data(bench_logger, "BENCH", "max", provider=provider)),
+        ("add_moving_average", lambda: add_moving_average(bench_logger, fresh(), 5)),
+        ("calculate_rsi", lambda: calculate_rsi(bench_logger, fresh())),
+        ("calculate_macd", lambda: calculate_macd(bench_logger, fresh())),
+        ("statistic_indicators", lambda: data_download.statistic_indicators(bench_logger, data, "BENCH", "max")),
+        ("rolling_statistic_indicators", lambda: data_download.rolling_statistic_indicators(bench_logger, data, 20)),
+        ("calculate_and_display_average_price",
+         lambda: data_download.calculate_and_display_average_price(bench_logger, data, "BENCH", "max")),
+        ("notify_if_strong_fluctuations",
+         lambda: data_download.notify_if_strong_fluctuations(bench_logger, data, 10.0, "BENCH", "max")),
+        ("export_to_csv", lambda: data_download.export_to_csv(bench_logger, data, "BENCH", "max", summary)),
+        ("build_figure", lambda: build_figure(data, "max", summary, max_points=2000, webgl=True)),
+    ]
+    if n_rows <= CHART_MAX_ROWS:
+        cases.append(("render_chart", lambda: render_chart(bench_logger, data, "BENCH", "max", summary,
+                                                           max_points=2000, webgl=True, include_plotlyjs="directory",
+                                                           output_dir=f"{data_download.path}/charts",
+                                                           verbose=False)))
+    return cases
+
+
+def _universe_cases(n_tickers, n_rows=2520):
+    """
+    (name, callable) pairs timing the multi-ticker paths on a universe of `n_tickers`.
+    """
+    close = synthetic_close_matrix(n_rows, n_tickers)
+    tickers = list(close.columns)
+    return [
+        ("run_batch", lambda: run_batch(bench_logger, tickers, "1y", provider=FakeProvider(), max_workers=8)),
+        ("wide_indicators", lambda: wide_indicators(bench_logger, close)),
+        ("screen", lambda: screen(bench_logger, close, windows=(5, 20, 60))),
+    ]
+
+
+def run_suite(suite="quick", rows=None, tickers=None, repeat=3, progress=None):
+    """
+    Time the pipeline on synthetic data of every configured size.
+
+    Every function of `data_download` and `data_plotting` is timed on single-ticker frames of each row count, and the
+    multi-ticker paths (`run_batch` against the offline FakeProvider, `wide_indicators`, `screen`) on each universe size.
+    Files are written into a temporary directory and console output is silenced while timing.
+
+    Args:
+        suite (str): A key of SUITES giving the default row counts and universe sizes.
+        rows (list, optional): Row counts overriding the suite.
+        tickers (list, optional): Universe sizes overriding the suite.
+        repeat (int): Number of runs per case; the best time is kept.
+        progress (callable, optional): Called with every finished result.
+
+    Returns:
+        dict: {'commit', 'python', 'platform', 'timestamp', 'results': [{'name', 'rows', 'tickers', 'seconds'}]}.
+    """
+    rows = rows or SUITES[suite]["rows"]
+    tickers = tickers or SUITES[suite]["tickers"]
+    results = []
+    quiet = console.quiet
+    console.quiet = True
+    try:
+        with tempfile.TemporaryDirectory() as tmp, patch.object(data_download, "path", tmp):
+            for n_rows in rows:
+                for name, case in _single_ticker_cases(n_rows):
+                    seconds, _ = timed(case, repeat=repeat if n_rows < 1_000_000 else 1)
+                    results.append({"name": name, "rows": n_rows, "tickers": 1, "seconds": seconds})
+                    progress and progress(results[-1])
+            for n_tickers in tickers:
+                for name, case in _universe_cases(n_tickers):
+                    seconds, _ = timed(case, repeat=repeat if n_tickers < 1_000 else 1)
+                    results.append({"name": name, "rows": 2520, "tickers": n_tickers, "seconds": seconds})
+                    progress and progress(results[-1])
+    finally:
+        console.quiet = quiet
+    return {"commit": git_commit(), "python": sys.version.split()[0], "platform": platform.platform(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"), "results": results}
+
+
+def compare_results(baseline, current, threshold=0.25, thresholds=None, min_seconds=0.001):
+    """
+    Compare two `run_suite` results and list the cases that became slower than allowed.
+
+    Args:
+        baseline (dict): The reference results, e.g. from the previous commit.
+        current (dict): The new results.
+        threshold (float): Allowed relative slowdown, 0.25 means 25% slower.
+        thresholds (dict, optional): Per-case overrides keyed by case name.
+        min_seconds (float): Cases faster than this in the baseline are ignored as noise.
+
+    Returns:
+        list: {'name', 'rows', 'tickers', 'baseline', 'current', 'change'} for every regression.
+    """
+    thresholds = thresholds or {}
+    reference = {(r["name"], r["rows"], r["tickers"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        key = (result["name"], result["rows"], result["tickers"])
+        if key not in reference or reference[key] < min_seconds:
+            continue
+        change = result["seconds"] / reference[key] - 1
+        if change > thresholds.get(result["name"], threshold):
+            regressions.append({"name": key[0], "rows": key[1], "tickers": key[2], "baseline": reference[key],
+                                "current": result["seconds"], "change": change})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="StockScope benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    wide = subparsers.add_parser("wide", help="per-ticker vs wide-frame indicators")
+    wide.add_argument("--rows", type=int, default=2520)
+    wide.add_argument("--tickers", type=int, default=2000)
+    wide.add_argument("--repeat", type=int, default=3)
+    chart = subparsers.add_parser("chart", help="full vs downsampled WebGL chart")
+    chart.add_argument("--rows", type=int, default=500_000)
+    chart.add_argument("--max-points", type=int, default=2000)
+    formats = subparsers.add_parser("formats", help="load times of CSV, Parquet and memory-mapped histories")
+    formats.add_argument("--rows", type=int, default=1_000_000)
+    formats.add_argument("--slice", type=int, default=10_000)
+    formats.add_argument("--repeat", type=int, default=3)
+    compact = subparsers.add_parser("compact", help="memory and accuracy of compact frames")
+    compact.add_argument("--rows", type=int, default=100_000)
+    compact.add_argument("--tickers", type=int, default=5_000)
+    logs = subparsers.add_parser("logging", help="logging overhead per call")
+    logs.add_argument("--calls", type=int, default=100_000)
+    corr = subparsers.add_parser("correlation", help="correlation and beta matrices of a ticker universe")
+    corr.add_argument("--tickers", type=int, default=2_000)
+    corr.add_argument("--window", type=int, default=60)
+    corr.add_argument("--updates", type=int, default=20)
+    corr.add_argument("--block-size", type=int, default=256)
+    corr.add_argument("--workers", type=int)
+    resample = subparsers.add_parser("resampling", help="resampling pyramid build, append and long-range query")
+    resample.add_argument("--rows", type=int, default=1_000_000)
+    resample.add_argument("--max-points", type=int, default=2000)
+    startup = subparsers.add_parser("startup", help="import time of the entry points against their budgets")
+    startup.add_argument("modules", nargs="*", help="modules to import, the budgeted entry points by default")
+    startup.add_argument("--repeat", type=int, default=5)
+    suite = subparsers.add_parser("suite", help="time the whole pipeline on synthetic data")
+    suite.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    suite.add_argument("--rows", type=int, nargs="+", help="row counts overriding the suite")
+    suite.add_argument("--tickers", type=int, nargs="+", help="universe sizes overriding the suite")
+    suite.add_argument("--repeat", type=int, default=3)
+    suite.add_argument("--output", help="write the results to this JSON file")
+    suite.add_argument("--baseline", help="compare against this JSON file and exit with 1 on regressions")
+    suite.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown")
+    suite.add_argument("--thresholds", help="JSON file with per-case thresholds, e.g. {\"render_chart\": 0.5}")
+    compare = subparsers.add_parser("compare", help="compare two suite result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.25)
+    compare.add_argument("--thresholds")
+    args = parser.parse_args(argv)
+
+    if args.benchmark == "wide":
+        result = bench_wide_indicators(args.rows, args.tickers, args.repeat)
+        console.print(f"[#00a400 bold]{result['tickers']} tickers x {result['rows']} rows: "
+                      f"per-ticker {result['per_ticker_s']:.3f}s, wide {result['wide_s']:.3f}s, "
+                      f"speedup x{result['speedup']:.1f}, max diff {result['max_abs_diff']:.2e}[#00a400 bold]")
+    elif args.benchmark == "chart":
+        for name, result in bench_chart(args.rows, args.max_points).items():
+            console.print(f"[#00a400 bold]{name}: {result['rows']} rows, {result['bytes'] / 2 ** 20:.2f} MiB, "
+                          f"build {result['build_s']:.3f}s, write {result['write_s']:.3f}s[#00a400 bold]")
+    elif args.benchmark == "formats":
+        for name, result in bench_history_formats(args.rows, args.slice, args.repeat).items():
+            console.print(f"[#00a400 bold]{name:<8} {result['bytes'] / 2 ** 20:8.1f} MiB, full load + MA "
+                          f"{result['full_s'] * 1000:9.2f} ms, last {args.slice} rows "
+                          f"{result['slice_s'] * 1000:9.2f} ms[#00a400 bold]")
+    elif args.benchmark == "compact":
+        for prices, result in bench_compact(args.rows, args.tickers).items():
+            errors = ", ".join(f"{column} {error:.1e}" for column, error in result["max_rel_error"].items())
+            console.print(f"[#00a400 bold]{prices}: {result['bytes_per_row_before']:.0f} -> "
+                          f"{result['bytes_per_row_after']:.0f} bytes/row, {args.tickers} tickers x 2520 rows "
+                          f"{result['universe_gib_before']:.2f} -> {result['universe_gib_after']:.2f} GiB, "
+                          f"max relative error: {errors}[#00a400 bold]")
+    elif args.benchmark == "logging":
+        for mode, result in bench_logging(args.calls).items():
+            console.print(f"[#00a400 bold]{mode:<22} {result['us_per_call']:7.2f} us/call, "
+                          f"flush on close {result['close_s']:.3f}s[#00a400 bold]")
+    elif args.benchmark == "correlation":
+        result = bench_correlation(args.tickers, window=args.window, updates=args.updates,
+                                   block_size=args.block_size, max_workers=args.workers)
+        console.print(f"[#00a400 bold]{result['tickers']} tickers, {result['window']} bars: sums {result['fit_s']:.3f}s, "
+                      f"correlation and beta {result['matrices_s']:.3f}s, update {result['update_ms']:.1f} ms/bar, "
+                      f"peak {result['peak_mb']:.0f} MiB (state {result['state_mb']:.0f} MiB); pandas corr "
+                      f"{result['pandas_s']:.3f}s, max diff {result['max_abs_diff']:.1e}[#00a400 bold]")
+    elif args.benchmark == "resampling":
+        result = bench_resampling(args.rows, max_points=args.max_points)
+        console.print(f"[#00a400 bold]{result['rows']} minute bars, levels {result['levels']}: build "
+                      f"{result['build_s']:.3f}s, append 390 bars {result['append_ms']:.1f} ms "
+                      f"({result['touched']} rows aggregated again); full range within {args.max_points} points reads "
+                      f"{result['rows_read']} {result['level']} rows in {result['select_ms']:.2f} ms, chart "
+                      f"{result['level_s']:.3f}s vs {result['lttb_s']:.3f}s over every bar[#00a400 bold]")
+    elif args.benchmark == "startup":
+        failed = 0
+        for module, result in bench_startup(args.modules, args.repeat).items():
+            budget = result["budget_ms"]
+            over = (budget is not None and result["import_ms"] > budget) or result["eager"]
+            failed += bool(over)
+            heaviest = ", ".join(f"{name} {ms:.0f}" for name, ms in result["heaviest"])
+            console.print(f"[{'red' if over else '#00a400 bold'}]{module:<10} {result['import_ms']:7.1f} ms "
+                          f"(budget {budget or '-'} ms), heaviest: {heaviest}"
+                          f"{', loaded eagerly: ' + ', '.join(result['eager']) if result['eager'] else ''}"
+                          f"[{'red' if over else '#00a400 bold'}]")
+        return 1 if failed else 0
+    elif args.benchmark in ("suite", "compare"):
+        if args.benchmark == "suite":
+            show = lambda r: print(f"{r['name']:<36} rows={r['rows']:<9} tickers={r['tickers']:<5} "
+                                   f"{r['seconds'] * 1000:10.2f} ms", flush=True)
+            current = run_suite(args.suite, args.rows, args.tickers, args.repeat, progress=show)
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as file:
+                    json.dump(current, file, indent=2)
+            if not args.baseline:
+                return 0
+            baseline_path = args.baseline
+        else:
+            baseline_path = args.baseline
+            with open(args.current, encoding="utf-8") as file:
+                current = json.load(file)
+        with open(baseline_path, encoding="utf-8") as file:
+            baseline = json.load(file)
+        thresholds = None
+        if args.thresholds:
+            with open(args.thresholds, encoding="utf-8") as file:
+                thresholds = json.load(file)
+        regressions = compare_results(baseline, current, args.threshold, thresholds)
+        for r in regressions:
+            console.print(f"[red]{r['name']} rows={r['rows']} tickers={r['tickers']}: {r['baseline'] * 1000:.2f} ms -> "
+                          f"{r['current'] * 1000:.2f} ms (+{r['change']:.0%})[red]")
+        console.print(f"[#00a400 bold]{len(regressions)} regressions against {baseline.get('commit')}[#00a400 bold]")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+from wide_indicators import rolling_mean, rsi, macd
+from indicator_engine import IndicatorEngine
+
+PRICE_COLUMNS = ('Open', 'High', 'Low', 'Close')
+# Columns the analysis uses; Dividends, Stock Splits and the like are dropped in compact mode
+KEEP_COLUMNS = ('Date',) + PRICE_COLUMNS + ('Volume',)
+# Scaled-integer prices keep 4 decimals, which limits them to prices below 214,748
+PRICE_SCALE = 10_000
+# Marks a missing price in scaled-integer columns
+MISSING_PRICE = np.iinfo(np.int32).min
+
+
+def _encode_prices(values, prices, scale):
+    if prices == 'float32':
+        return values.astype(np.float32)
+    if prices == 'int32':
+        scaled = np.rint(values * scale)
+        finite = scaled[~np.isnan(scaled)]
+        if finite.size and (finite.max() > np.iinfo(np.int32).max or finite.min() <= MISSING_PRICE):
+            raise ValueError(f"Prices up to {finite.max() / scale} do not fit into int32 with scale {scale}")
+        return np.where(np.isnan(scaled), MISSING_PRICE, scaled).astype(np.int32)
+    raise ValueError(f"Unknown price storage: {prices}")
+
+
+# Shrink a quotes frame to the columns and dtypes the analysis needs
+def compact_frame(data, prices='float32', scale=PRICE_SCALE):
+    """
+    Return a memory-lean copy of a quotes frame.
+
+    Only the 'Date', OHLC and 'Volume' columns are kept. Prices are stored as float32 (about 7 significant digits)
+    or, with prices='int32', as integers scaled by `scale` (exact to 1/scale, the scale is kept in
+    `frame.attrs['price_scale']`; read them with `price_values`). Volume is downcast to the smallest integer type
+    that holds it. Converting a column makes its new array (prices pass through float64, which is a further
+    temporary copy when they are not stored as float64); the frame is then built on these arrays with copy=False,
+    so assembling it copies nothing more.
+
+    Args:
+        data (pandas.DataFrame): Quotes as returned by `fetch_stock_data`.
+        prices (str): 'float32' or 'int32'.
+        scale (int): The multiplier of scaled-integer prices.
+
+    Returns:
+        pandas.DataFrame: The compact frame.
+
+    Raises:
+        ValueError: If `prices` is unknown or the prices overflow int32 at the given scale.
+    """
+    columns = {}
+    for column in KEEP_COLUMNS:
+        if column not in data.columns:
+            continue
+        values = data[column]
+        if column in PRICE_COLUMNS:
+            values = _encode_prices(values.to_numpy(dtype=np.float64), prices, scale)
+        elif column == 'Volume':
+            values = pd.to_numeric(values, downcast='unsigned' if values.notna().all() else 'float').to_numpy()
+        columns[column] = values
+    frame = pd.DataFrame(columns, index=data.index, copy=False)
+    if prices == 'int32':
+        frame.attrs['price_scale'] = scale
+    return frame
+
+
+def price_values(data, column='Close'):
+    """
+    The prices of a column as float64, decoding scaled-integer storage.
+    """
+    values = data[column].to_numpy()
+    scale = data.attrs.get('price_scale')
+    if scale is None:
+        return values.astype(np.float64)
+    decoded = values / scale
+    decoded[values == MISSING_PRICE] = np.nan
+    return decoded
+
+
+# Add float32 MA, RSI and MACD columns without intermediate frame copies
+def compact_indicators(logger, data, window_size=5):
+    """
+    Add MA, RSI and MACD to a compact frame as float32 columns.
+
+    The indicators are computed in float64 from the (decoded) close prices, with the same definitions as
+    `add_moving_average`, `calculate_rsi` and `calculate_macd`, and each is stored once as float32. The result
+    frame shares the columns of `data` instead of copying them on every column assignment.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        data (pandas.DataFrame): A frame from `compact_frame` (any frame with a 'Close' column works).
+        window_size (int): The window size (in rows) of the moving average.
+
+    Returns:
+        pandas.DataFrame: `data` with the 'MA', 'RSI' and 'MACD' columns. Returns `data` unchanged if an error occurs.
+
+    Logs:
+        Logs a debug message when the indicators are added or if an error occurs.
+    """
+    try:
+        close = price_values(data)[:, None]
+        columns = {column: data[column] for column in data.columns}
+        columns['MA'] = rolling_mean(close, window_size)[:, 0].astype(np.float32)
+        columns['RSI'] = rsi(close)[:, 0].astype(np.float32)
+        columns['MACD'] = macd(close)[:, 0].astype(np.float32)
+        frame = pd.DataFrame(columns, index=data.index, copy=False)
+        frame.attrs.update(data.attrs)
+        logger.debug("Compact MA, RSI and MACD columns have been added")
+        return frame
+    except Exception as e:
+        logger.debug("Error calculating compact indicators: %s", e)
+        return data
+
+
+def bytes_per_row(data):
+    """
+    Memory used by a frame, including its index and object columns, divided by its number of rows.
+    """
+    return data.memory_usage(deep=True, index=True).sum() / max(len(data), 1)
+
+
+# Compare the memory use and the indicator accuracy of compact and full frames
+def compact_report(logger, data, prices='float32', window_size=5):
+    """
+    Measure what compact mode saves and costs on a quotes frame.
+
+    The full path adds the float64 indicators with `IndicatorEngine` (the same values as `add_moving_average`,
+    `calculate_rsi` and `calculate_macd`); the compact path runs `compact_frame` and `compact_indicators` on the
+    same quotes.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        data (pandas.DataFrame): Quotes as returned by `fetch_stock_data`. It is not modified.
+        prices (str): The compact price storage, 'float32' or 'int32'.
+        window_size (int): The moving average window size.
+
+    Returns:
+        dict: {'prices', 'rows', 'bytes_per_row_before', 'bytes_per_row_after', 'max_abs_error': {column: float},
+               'max_rel_error': {column: float}}, where the relative error is scaled by the largest absolute
+               float64 value of the column.
+    """
+    full = data.copy()
+    IndicatorEngine().add_to(logger, full, window_size=window_size)
+    compact = compact_indicators(logger, compact_frame(data, prices), window_size)
+    abs_error, rel_error = {}, {}
+    for column in ('Close', 'MA', 'RSI', 'MACD'):
+        expected = full[column].to_numpy(dtype=np.float64)
+        actual = price_values(compact, column) if column == 'Close' else compact[column].to_numpy(dtype=np.float64)
+        error = np.abs(actual - expected)
+        abs_error[column] = float(np.nanmax(error)) if np.isfinite(error).any() else 0.0
+        reference = np.nanmax(np.abs(expected[np.isfinite(expected)])) if np.isfinite(expected).any() else 0.0
+        rel_error[column] = abs_error[column] / reference if reference else 0.0
+    return {'prices': prices, 'rows': len(data), 'bytes_per_row_before': bytes_per_row(full),
+            'bytes_per_row_after': bytes_per_row(compact), 'max_abs_error': abs_error, 'max_rel_error': rel_error}
@@ -0,0 +1,243 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+def returns_matrix(close):
+    """
+    Simple returns of a wide close-price matrix, NaN where either of two consecutive closes is missing.
+
+    Args:
+        close (pandas.DataFrame): Close prices indexed by date with one column per ticker, see
+                                  `wide_indicators.close_matrix` or `QuoteStore.load_column`.
+
+    Returns:
+        numpy.ndarray: A (rows - 1, tickers) float64 array.
+    """
+    values = close.to_numpy(dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return values[1:] / values[:-1] - 1
+
+
+class RollingCorrelation:
+    """
+    Pairwise correlations and betas of returns over the last `window` bars of a ticker universe.
+
+    Four (tickers, tickers) matrices of pairwise sums over the window are kept: the number of bars where both tickers
+    have a return, the sum and the sum of squares of the first ticker's returns over those bars, and the sum of
+    products. Pairs only use the bars where both returns exist, like `pandas.DataFrame.corr`. Correlations and
+    betas follow from the sums, and a new bar only adds its outer products and subtracts those of the bar leaving the
+    window, O(tickers²) instead of O(window * tickers²). Every `window` updates the sums are recomputed from the
+    retained returns, so rounding errors of the running sums do not build up.
+
+    The sums are built with matrix products over blocks of `block_size` tickers, run on a thread pool of
+    `max_workers` (NumPy releases the GIL in matrix products), and updates work on blocks of rows as well, so
+    temporaries stay at block_size * tickers values next to the state of 4 * tickers² float64 values.
+
+    Attributes:
+        tickers (list): The tickers, in the order of the matrix rows and columns.
+        window (int): The number of returns in the window.
+        min_periods (int): Pairs with fewer common returns get NaN.
+    """
+    def __init__(self, tickers, window=60, min_periods=None, block_size=256, max_workers=None):
+        self.tickers = list(tickers)
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.block_size = block_size
+        self.max_workers = max_workers
+        size = len(self.tickers)
+        self.count = np.zeros((size, size))
+        self.sum = np.zeros((size, size))
+        self.sum_sq = np.zeros((size, size))
+        self.sum_prod = np.zeros((size, size))
+        self._returns = deque(maxlen=window)
+        self._last_close = None
+        self._updates = 0
+
+    def _blocks(self):
+        size = len(self.tickers)
+        return [slice(start, min(start + self.block_size, size)) for start in range(0, size, self.block_size)]
+
+    def _recompute(self):
+        """Rebuild the sums from the returns in the window, one block of rows per task."""
+        size = len(self.tickers)
+        values = np.array(self._returns).reshape(-1, size)
+        valid = ~np.isnan(values)
+        mask = valid.astype(float)
+        x = np.where(valid, values, 0.0)
+        x_sq = x * x
+
+        def block(rows):
+            self.count[rows] = mask[:, rows].T @ mask
+            self.sum[rows] = x[:, rows].T @ mask
+            self.sum_sq[rows] = x_sq[:, rows].T @ mask
+            self.sum_prod[rows] = x[:, rows].T @ x
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            list(pool.map(block, self._blocks()))
+        self._updates = 0
+
+    def fit(self, close):
+        """
+        Start from a wide close-price matrix: the window holds its last `window` returns.
+
+        Args:
+            close (pandas.DataFrame): Close prices with one column per ticker of `tickers`.
+
+        Returns:
+            RollingCorrelation: self.
+        """
+        close = close[self.tickers]
+        returns = returns_matrix(close.iloc[-self.window - 1:])
+        self._returns.clear()
+        self._returns.extend(returns)
+        self._last_close = close.iloc[-1].to_numpy(dtype=float)
+        self._recompute()
+        return self
+
+    def _add(self, added, removed=None):
+        """Add the outer products of the return row `added` and subtract those of `removed`, as rank-2 products."""
+        rows = np.array([added] if removed is None else [added, removed])
+        valid = ~np.isnan(rows)
+        mask = valid.astype(float)
+        x = np.where(valid, rows, 0.0)
+        sign = np.array([[1.0], [-1.0]])[:len(rows)]
+        signed_mask, signed_x = sign * mask, sign * x
+        for block in self._blocks():
+            self.count[block] += signed_mask[:, block].T @ mask
+            self.sum[block] += signed_x[:, block].T @ mask
+            self.sum_sq[block] += (signed_x[:, block] * x[:, block]).T @ mask
+            self.sum_prod[block] += signed_x[:, block].T @ x
+
+    def update(self, close):
+        """
+        Add the bar with the closes `close` (one per ticker, NaN when missing) and drop the oldest return.
+
+        Args:
+            close (array-like | pandas.Series): The new closes; a Series is aligned to `tickers`.
+        """
+        if isinstance(close, pd.Series):
+            close = close.reindex(self.tickers)
+        close = np.asarray(close, dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            row = close / self._last_close - 1
+        self._last_close = close
+        self._updates += 1
+        removed = self._returns[0] if len(self._returns) == self.window else None
+        self._returns.append(row)
+        if self._updates >= self.window:
+            self._recompute()
+        else:
+            self._add(row, removed)
+
+    def _finish(self, kind):
+        size = len(self.tickers)
+        result = np.empty((size, size))
+        for rows in self._blocks():
+            n, sum_x, sum_sq_x = self.count[rows], self.sum[rows], self.sum_sq[rows]
+            sum_y, sum_sq_y = self.sum[:, rows].T, self.sum_sq[:, rows].T
+            covariance = n * self.sum_prod[rows] - sum_x * sum_y
+            var_y = n * sum_sq_y - sum_y * sum_y
+            with np.errstate(invalid='ignore', divide='ignore'):
+                if kind == 'correlation':
+                    values = covariance / np.sqrt((n * sum_sq_x - sum_x * sum_x) * var_y)
+                else:
+                    values = covariance / var_y
+            values[n < max(self.min_periods, 2)] = np.nan
+            result[rows] = values
+        if kind == 'correlation':
+            np.clip(result, -1.0, 1.0, out=result)
+        return pd.DataFrame(result, index=self.tickers, columns=self.tickers)
+
+    def correlation(self):
+        """
+        Returns:
+            pandas.DataFrame: The correlation matrix of the returns in the window.
+        """
+        return self._finish('correlation')
+
+    def beta(self):
+        """
+        Returns:
+            pandas.DataFrame: Betas, where row a, column b is the beta of a's returns against b's.
+        """
+        return self._finish('beta')
+
+    def nbytes(self):
+        return sum(matrix.nbytes for matrix in (self.count, self.sum, self.sum_sq, self.sum_prod))
+
+
+# Correlation and beta matrices of a whole universe
+def correlation_beta(logger, close, window=60, min_periods=None, block_size=256, max_workers=None):
+    """
+    Compute the pairwise correlation and beta matrices of the returns over the last `window` bars.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        close (pandas.DataFrame): Close prices indexed by date with one column per ticker.
+        window (int): The number of returns.
+        min_periods (int, optional): Pairs with fewer common returns get NaN. Defaults to `window`.
+        block_size (int): Tickers per block, see `RollingCorrelation`.
+        max_workers (int, optional): Threads computing the blocks.
+
+    Returns:
+        tuple: (correlation, beta) DataFrames indexed and labeled by ticker, or None if an error occurs.
+
+    Logs:
+        Logs a debug message with the universe size and the time taken, or if an error occurs.
+    """
+    try:
+        started = time.perf_counter()
+        rolling = RollingCorrelation(close.columns, window, min_periods, block_size, max_workers).fit(close)
+        result = rolling.correlation(), rolling.beta()
+        logger.debug("Correlation and beta of %s tickers over %s bars in %.3fs", close.shape[1], window,
+                     time.perf_counter() - started)
+        return result
+    except Exception as e:
+        logger.debug("Error computing correlations: %s", e)
+
+
+def rolling_beta(close, benchmark, window=60, min_periods=None):
+    """
+    Rolling correlation and beta of every ticker against one benchmark column, for every bar.
+
+    All windows are computed from cumulative sums over the bars where both returns exist, so the cost is
+    O(rows * tickers) whatever the window.
+
+    Args:
+        close (pandas.DataFrame): Close prices indexed by date with one column per ticker.
+        benchmark (str): The column to regress on, e.g. an index ETF like 'SPY'.
+        window (int): The number of returns per window.
+        min_periods (int, optional): Windows with fewer common returns get NaN. Defaults to `window`.
+
+    Returns:
+        tuple: (correlation, beta) DataFrames shaped like `close`; the first row is NaN (no return yet).
+    """
+    min_periods = window if min_periods is None else min_periods
+    values = returns_matrix(close)
+    market = values[:, [close.columns.get_loc(benchmark)]]
+    valid = ~np.isnan(values) & ~np.isnan(market)
+    x = np.where(valid, values, 0.0)
+    y = np.where(valid, market, 0.0)
+
+    def windowed(terms):
+        sums = np.cumsum(terms, axis=0)
+        sums[window:] = sums[window:] - sums[:-window]
+        return sums
+
+    n = windowed(valid.astype(float))
+    sum_x, sum_y = windowed(x), windowed(y)
+    covariance = n * windowed(x * y) - sum_x * sum_y
+    var_x = n * windowed(x * x) - sum_x * sum_x
+    var_y = n * windowed(y * y) - sum_y * sum_y
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlation = np.clip(covariance / np.sqrt(var_x * var_y), -1.0, 1.0)
+        beta = covariance / var_y
+    short = n < max(min_periods, 2)
+    correlation[short] = np.nan
+    beta[short] = np.nan
+    first = np.full((1, close.shape[1]), np.nan)
+    return (pd.DataFrame(np.vstack([first, correlation]), index=close.index, columns=close.columns),
+            pd.DataFrame(np.vstack([first, beta]), index=close.index, columns=close.columns))
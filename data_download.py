@@ -1,15 +1,32 @@
-import yfinance as yf
 from datetime import timedelta, datetime
+import math
 import os
+import numpy as np
+import pandas as pd
 from tools import path, console, period_spell
+from quote_store import period_range
+from providers import default_provider, fetch_range
+from compact import compact_frame
+
+
+def _last_sessions(data, sessions, interval):
+    """
+    Keep the bars of the last `sessions` trading days (for daily bars simply the last `sessions` rows).
+    """
+    if not sessions or data.empty:
+        return data
+    if interval == '1d':
+        return data.tail(sessions)
+    days = data.index.normalize()
+    return data[days >= days.unique()[-sessions:][0]]
 
 
 # Get data from fc.yahoo.com
-def fetch_stock_data(logger, ticker, period):
+def fetch_stock_data(logger, ticker, period, store=None, provider=None, interval='1d', compact=False):
     """
     Fetch historical stock data for a given ticker symbol over a specified period from Yahoo Finance.
 
-    This function uses the `yfinance` library to retrieve stock price data. It logs a success message if data is obtained,
+    By default this function uses the `yfinance` library to retrieve stock price data. It logs a success message if data is obtained,
     and logs a debug message if the data could not be retrieved.
 
     Args:
@@ -17,26 +34,43 @@ def fetch_stock_data(logger, ticker, period):
         ticker (str): The stock ticker symbol, e.g., 'AAPL' for Apple Inc.
         period (str): The period for which to fetch the historical data.
                       Examples include '1d', '5d', '1mo', '1y', etc.
+        store (quote_store.QuoteStore, optional): A local quote store. When given, only the date ranges missing
+                      from the store are requested from Yahoo Finance and the rest is served locally.
+        provider (optional): The data provider to fetch from, any object with a yfinance-like `history` method.
+                      Defaults to the shared, rate-limited providers.YahooProvider.
+        interval (str): The bar interval: '1d' (default) or intraday '1h', '15m', '5m', '1m'. Intraday ranges are
+                      split into the windows Yahoo Finance serves per request and fetched in parallel.
+        compact (bool): Keep only the Date, OHLC and Volume columns and store the prices as float32
+                      (see `compact.compact_frame`), for large universes.
 
     Returns:
-        pandas.DataFrame: A DataFrame containing the historical stock data, with the date as the index.
-                          If no data is available, returns an empty DataFrame.
+        pandas.DataFrame: A DataFrame containing the historical stock data, with the timestamps in the 'Date' column
+                          (exchange timezone, also for intraday bars). If no data is available, returns None.
 
     Logs:
         Logs a debug message indicating whether the data was successfully fetched or not.
     """
-    stock = yf.Ticker(ticker)
-    if isinstance(period, str):
-        data = stock.history(period=period).reset_index()
-    if isinstance(period, list):
+    provider = provider or default_provider()
+    if store is not None or interval != '1d':
+        start, end, tail = period_range(period)
+        fetch = lambda range_start, range_end: fetch_range(provider, ticker, range_start, range_end, interval)
+        data = store.get(ticker, interval, start, end, fetch) if store is not None else fetch(start, end)
+        data = _last_sessions(data, tail, interval).reset_index()
+        if store is not None:
+            logger.debug("Quote store for %s: %s", ticker, store.stats())
+    elif isinstance(period, str):
+        data = provider.history(ticker, period=period).reset_index()
+    elif isinstance(period, list):
         start = datetime.strptime(period[0], "%d.%m.%Y")
         end = datetime.strptime(period[1], "%d.%m.%Y")
-        data = stock.history(start=start - timedelta(days=1), end=end + timedelta(days=1), interval='1d').reset_index()
+        data = provider.history(ticker, start=start - timedelta(days=1), end=end + timedelta(days=1), interval='1d').reset_index()
+    # yfinance names the index 'Datetime' for intraday bars
+    data = data.rename(columns={'Datetime': 'Date'})
     if not data.empty:
-        logger.debug(f"Quotes for symbol {ticker} received successfully")
-        return data
+        logger.debug("Quotes for symbol %s received successfully", ticker)
+        return compact_frame(data) if compact else data
     else:
-        logger.debug(f"Quotes for symbol {ticker} not received")
+        logger.debug("Quotes for symbol %s not received", ticker)
 
 
 # Calculate moving average based on close prices
@@ -61,18 +95,86 @@ def add_moving_average(logger, data, window_size):
     """
     try:
         data['MA'] = data['Close'].rolling(window=window_size).mean()
-        logger.debug(f"Column with moving average price for {window_size} days added")
+        logger.debug("Column with moving average price for %s days added", window_size)
     except Exception as e:
-        logger.debug(f"Moving average price column not added: {e}")
+        logger.debug("Moving average price column not added: %s", e)
+
+
+class SummaryAccumulator:
+    """
+    One-pass accumulator of count, mean, variance, min and max of a price series.
+
+    Values are consumed in chunks: every chunk is reduced with NumPy and merged into the running totals with the
+    pairwise update of Chan et al. (the chunked form of Welford's algorithm), so each value is read once and the
+    result stays numerically stable for long histories. NaN values are ignored, as pandas does.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        count = len(values)
+        mean = values.mean()
+        m2 = np.square(values - mean).sum()
+        delta = mean - self.mean
+        total = self.count + count
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+
+def summary_statistics(close, chunk_size=65536):
+    """
+    Calculate the Median, STD, Variance, Max, Min and coefficient of variation of a close price series.
+
+    STD and Variance use the sample (ddof=1) definition, like pandas. The median needs a selection and is computed
+    with `numpy.nanmedian`; everything else comes from a single chunked pass of `SummaryAccumulator`.
+
+    Args:
+        close (array-like): The close prices.
+        chunk_size (int): The number of values reduced at once.
+
+    Returns:
+        dict: {'Count', 'Mean', 'Median', 'STD', 'Variance', 'Max', 'Min', 'Var_coef'} as plain floats.
+    """
+    values = np.asarray(close, dtype=float)
+    accumulator = SummaryAccumulator()
+    for start in range(0, len(values), chunk_size):
+        accumulator.update(values[start:start + chunk_size])
+    std = math.sqrt(accumulator.variance)
+    empty = accumulator.count == 0
+    return {'Count': accumulator.count,
+            'Mean': math.nan if empty else float(accumulator.mean),
+            'Median': math.nan if empty else float(np.nanmedian(values)),
+            'STD': std,
+            'Variance': accumulator.variance,
+            'Max': math.nan if empty else float(accumulator.max),
+            'Min': math.nan if empty else float(accumulator.min),
+            'Var_coef': std / accumulator.mean * 100 if not empty else math.nan}
 
 
 # Calculate statistic indicators
 def statistic_indicators(logger, data, ticker, period):
     """
-    Calculates key statistical indicators for a dataset of closing prices and updates the 'data' dictionary with results.
+    Calculates key statistical indicators for a dataset of closing prices and returns them as a summary record.
 
     This function computes the median, standard deviation (STD), variance, maximum, minimum, and coefficient of variation
-    for the 'Close' column in the provided dataset and stores these indicators in the 'data' dictionary. The function also
+    for the 'Close' column in the provided dataset in one pass (see `summary_statistics`). The values are returned as
+    a small dictionary instead of being repeated in every row of the DataFrame. The function also
     logs the completion of the calculation or any errors encountered.
 
    Args:
@@ -83,22 +185,55 @@ def statistic_indicators(logger, data, ticker, period):
                       (e.g., '1d', '1mo').
 
     Returns:
-        None
+        dict: The summary record with the keys 'Count', 'Mean', 'Median', 'STD', 'Variance', 'Max', 'Min' and
+              'Var_coef'. Returns None if an error occurs.
 
     Logs:
         Logs a debug message when the statistic indicators are successfully calculated or if an error occurs.
 
     """
     try:
-        data['Median'] = data['Close'].median()
-        data['STD'] = data['Close'].std()
-        data['Variance'] = data['Close'].var()
-        data['Max'] = data['Close'].max()
-        data['Min'] = data['Close'].min()
-        data['Var_coef'] = (data['Close'].std() / data['Close'].mean()) * 100
-        logger.debug(f"Statistic indicators have been calculated")
+        summary = summary_statistics(data['Close'].to_numpy())
+        logger.debug("Statistic indicators have been calculated")
+        return summary
+    except Exception as e:
+        logger.debug("Error calculating statistic indicators: %s", e)
+
+
+# Calculate statistic indicators over a rolling window
+def rolling_statistic_indicators(logger, data, window_size):
+    """
+    Calculate the statistic indicators of the 'Close' prices over a rolling window.
+
+    Unlike `statistic_indicators`, the values change from row to row, so they are returned as a DataFrame aligned
+    with the input. The input DataFrame is not modified.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        data (pandas.DataFrame): A DataFrame containing stock data, which must have a 'Close' column with price data.
+        window_size (int): The window size (in rows) over which the indicators are computed.
+
+    Returns:
+        pandas.DataFrame: Columns 'Median', 'STD', 'Variance', 'Max', 'Min' and 'Var_coef' indexed like `data`.
+                          Returns None if an error occurs.
+
+    Logs:
+        Logs a debug message when the rolling indicators are calculated or if an error occurs.
+    """
+    try:
+        rolling = data['Close'].rolling(window=window_size)
+        variance = rolling.var()
+        std = np.sqrt(variance)
+        result = pd.DataFrame({'Median': rolling.median(),
+                               'STD': std,
+                               'Variance': variance,
+                               'Max': rolling.max(),
+                               'Min': rolling.min(),
+                               'Var_coef': std / rolling.mean() * 100})
+        logger.debug("Rolling statistic indicators for %s rows have been calculated", window_size)
+        return result
     except Exception as e:
-        logger.debug(f"Error calculating statistic indicators: {e}")
+        logger.debug("Error calculating rolling statistic indicators: %s", e)
 
 
 # Average price for whole requested period
@@ -128,11 +263,11 @@ def calculate_and_display_average_price(logger, data, ticker, period):
     """
     try:
         avg_price = data['Close'].mean()
-        logger.debug(f"Average closing price calculated")
+        logger.debug("Average closing price calculated")
         console.print(f'[#00a400 bold]Average closing price of {ticker} for {period_spell(period)}: {avg_price}[#00a400 bold]')
         return avg_price
     except Exception as e:
-        logger.debug(f"Error calculating average closing price: {e}")
+        logger.debug("Error calculating average closing price: %s", e)
 
 
 # Print an alert if fluctuation exceeded expectations
@@ -166,30 +301,32 @@ def notify_if_strong_fluctuations(logger, data, threshold, ticker, period):
         if fluctuation > threshold:
             console.print(f'[#00a400 bold]The fluctuation in the closing price of {ticker}\
              for {period_spell(period)} {fluctuation}% exceeded the specified threshold {threshold}%\n[#00a400 bold]')
-            logger.debug(f"% fluctuation in closing price calculated successfully")
+            logger.debug("% fluctuation in closing price calculated successfully")
             return True
         return False
     except Exception as e:
-        logger.debug(f"Error calculating the closing price fluctuation: {e}")
+        logger.debug("Error calculating the closing price fluctuation: %s", e)
 
 
 # Export all fetched data to csv
-def export_to_csv(logger, data, ticker, period):
+def export_to_csv(logger, data, ticker, period, summary=None):
     """
     Export stock data to a CSV file, creating necessary directories if they do not exist.
 
     This function exports the provided DataFrame to a CSV file. The file is saved in a 'csv' directory
     within the script's directory. The filename includes the stock ticker and the period. If any directories
     in the path do not exist, they will be created automatically. The function logs the success or failure of the export.
+    If a summary record is given, it is saved next to the data as a one-row '..._summary.csv' file.
 
     Args:
         logger (logging.Logger): The logger object used to log debug messages.
         data (pandas.DataFrame): The DataFrame containing the stock data to be exported.
         ticker (str): The stock ticker symbol, which will be included in the filename.
         period (str): The period string, which will also be part of the filename (e.g., '1d', '1mo').
+        summary (dict, optional): The statistic indicators returned by `statistic_indicators`.
 
     Returns:
-        None: This function performs an export to CSV and logs messages. It does not return any value.
+        list: The paths of the written files (the data, then the summary if given). Returns None if an error occurs.
 
     Logs:
         Logs a debug message when the data is successfully saved to CSV or if an error occurs during the export process.
@@ -199,11 +336,17 @@ def export_to_csv(logger, data, ticker, period):
     """
     os.makedirs(f"{path}/csv", exist_ok=True)
     try:
-        data.to_csv(f"{path}/csv/{ticker}{period_spell(period)}.csv")
-        logger.debug(f"Data saved in: {path}\\csv\\{ticker}{period_spell(period)}.csv")
+        paths = [f"{path}/csv/{ticker}{period_spell(period)}.csv"]
+        data.to_csv(paths[0])
+        logger.debug("Data saved in: %s\\csv\\%s%s.csv", path, ticker, period_spell(period))
         console.print(f"[#00a400 bold]Data saved in: {path}\\csv\\{ticker}{period_spell(period)}.csv[#00a400 bold]")
+        if summary is not None:
+            paths.append(f"{path}/csv/{ticker}{period_spell(period)}_summary.csv")
+            pd.DataFrame([summary]).to_csv(paths[1], index=False)
+            logger.debug("Summary saved in: %s\\csv\\%s%s_summary.csv", path, ticker, period_spell(period))
+        return paths
     except Exception as e:
-        logger.debug(f"Error saving data: {e}")
+        logger.debug("Error saving data: %s", e)
 
 
 # Calculate RSI with default 14 period
@@ -245,9 +388,9 @@ def calculate_rsi(logger, data):
         rs = avg_gain / avg_loss
         rsi = 100 - (100 / (1 + rs))
         data['RSI'] = rsi
-        logger.debug(f"RSI column has been added")
+        logger.debug("RSI column has been added")
     except Exception as e:
-        logger.debug(f"RSI column not added: {e}")
+        logger.debug("RSI column not added: %s", e)
 
 
 # Calculate macd with default short=12 and long=26 periods
@@ -277,6 +420,6 @@ def calculate_macd(logger, data):
         short_ema = data['Close'].ewm(span=12, adjust=False).mean()
         long_ema = data['Close'].ewm(span=26, adjust=False).mean()
         data['MACD'] = short_ema - long_ema
-        logger.debug(f"MACD column has been added")
+        logger.debug("MACD column has been added")
     except Exception as e:
-        logger.debug(f"MACD column not added: {e}")
+        logger.debug("MACD column not added: %s", e)
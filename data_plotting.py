@@ -1,12 +1,127 @@
-import plotly.graph_objects as go
 from tools import period_spell
 import os
-from InquirerPy import inquirer
-from tools import path, console, colors
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from tools import path, console, lazy_import
+from data_download import summary_statistics
+
+# Loaded when a chart is built or a theme is asked for, not when the module is imported
+go = lazy_import('plotly.graph_objects')
+offline = lazy_import('plotly.offline')
+inquirer = lazy_import('InquirerPy.inquirer')
+
+THEMES = ["plotly_white", "plotly_dark", "ggplot2", "seaborn", "simple_white", "presentation", "xgridoff", "ygridoff",
+          "gridon", "polar"]
+
+
+# Largest-triangle-three-buckets downsampling
+def lttb(x, y, threshold):
+    """
+    Select the indices of at most `threshold` points that preserve the visual shape of a line.
+
+    Implements the largest-triangle-three-buckets algorithm (Steinarsson, 2013): the first and last points are kept
+    and from every one of the remaining `threshold - 2` buckets the point forming the largest triangle with the
+    previously selected point and the average of the next bucket is chosen. Peaks and troughs survive, which plain
+    decimation would drop.
+
+    Args:
+        x (numpy.ndarray): Monotonic x coordinates (numbers; convert dates to int64 first).
+        y (numpy.ndarray): The y values, without NaN.
+        threshold (int): The number of points to keep.
+
+    Returns:
+        numpy.ndarray: Sorted indices of the selected points.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(area.argmax())
+        selected[i + 1] = previous
+    return selected
+
+
+def _line(x, y, name, max_points=None, webgl=False, **kwargs):
+    """
+    Build a line trace, optionally downsampled with `lttb` and rendered with WebGL (`Scattergl`).
+    """
+    if max_points:
+        x, y = np.asarray(x), np.asarray(y, dtype=float)
+        valid = ~np.isnan(y)
+        x, y = x[valid], y[valid]
+        numeric_x = x.astype('datetime64[ns]').astype(np.int64) if np.issubdtype(x.dtype, np.datetime64) else x
+        keep = lttb(numeric_x, y, max_points)
+        x, y = x[keep], y[keep]
+    trace = go.Scattergl if webgl else go.Scatter
+    return trace(x=x, y=y, mode='lines', name=name, **kwargs)
+
+
+def build_figure(data, period, summary=None, theme='plotly', max_points=None, webgl=False):
+    """
+    Build the close price chart figure described in `create_and_save_plot` without saving it.
+
+    Args:
+        data (pandas.DataFrame): A DataFrame with the columns 'Date', 'Close', 'MA', 'RSI' and 'MACD'.
+        period (str): The period string representing the timeframe for the stock data (e.g., '1d', '1mo').
+        summary (dict, optional): The statistic indicators returned by `statistic_indicators`.
+        theme (str): The plotly template name.
+        max_points (int, optional): Downsample every line to at most this many points with LTTB.
+        webgl (bool): Render the lines with `Scattergl` instead of SVG `Scatter`.
+
+    Returns:
+        plotly.graph_objects.Figure: The chart.
+    """
+    if summary is None:
+        summary = summary_statistics(data['Close'])
+    dates = data['Date']
+    if getattr(dates.dt, 'tz', None) is not None:
+        # Plot exchange-local wall time; numpy has no timezone-aware datetimes for downsampling
+        dates = dates.dt.tz_localize(None)
+    fig = go.Figure()
+    fig.add_trace(_line(dates, data['Close'], 'Close Price', max_points, webgl))
+    fig.add_trace(_line(dates, data['MA'], 'Moving Average', max_points, webgl))
+    fig.add_trace(_line(dates, data['RSI'], 'RSI', max_points, webgl, yaxis='y2'))
+    fig.add_trace(_line(dates, data['MACD'], 'MACD', max_points, webgl, yaxis='y3'))
+
+    # Constant levels need only the two end points of the date axis
+    edges = [dates.iloc[0], dates.iloc[-1]]
+    for name in ('Median', 'Max', 'Min'):
+        fig.add_trace(go.Scatter(x=edges, y=[summary[name]] * 2, mode='lines', name=name))
+
+    fig.update_layout(
+        title={'text': f"Close price for  {period_spell(period)}", 'x': 0.5, 'xanchor': 'center',
+               'yanchor': 'top'},
+        yaxis=dict(title='Close Price, MACD', ticklabelposition='outside left'),
+        yaxis2=dict(title='RSI', overlaying='y', side='right', range=[0, 100]),
+        yaxis3=dict(overlaying='y', side='left', ticklabelposition='inside'),
+        annotations=[dict(text=f"Standard Deviation: {summary['STD']:.4f}<br>Variance: {summary['Variance']:.4f}<br>"
+                               f"Coefficient of Variation: {summary['Var_coef']:.2f}%",
+                          xref='paper', yref='paper', x=1, y=-0.5, showarrow=False, align='left')],
+        width=1920,
+        height=1080,
+        legend=dict(x=0, y=-0.5),
+        template=theme
+    )
+    return fig
 
 
 # Export charts as png
-def create_and_save_plot(logger, data, ticker, period):
+def create_and_save_plot(logger, data, ticker, period, summary=None, max_points=None, webgl=False,
+                         include_plotlyjs=True):
     """
         Create and save a plot of stock price data, including Close Price, Moving Average, RSI, and MACD.
 
@@ -21,12 +136,21 @@ def create_and_save_plot(logger, data, ticker, period):
         Args:
             logger (logging.Logger): The logger object used to log debug messages.
             data (pandas.DataFrame): A DataFrame containing stock data. It must have the columns 'Date', 'Close', 'MA',
-                                     'RSI', and 'MACD', 'Median', 'STD', 'Variance', 'Max', 'Min', 'Var_coef'.
+                                     'RSI', and 'MACD'.
             ticker (str): The stock ticker symbol, which will be used in the filename.
             period (str): The period string representing the timeframe for the stock data (e.g., '1d', '1mo').
+            summary (dict, optional): The statistic indicators returned by `statistic_indicators`.
+                                      Computed from 'Close' if not given.
+            max_points (int, optional): Downsample every line to at most this many points with LTTB, which keeps
+                                        long and intraday histories small and fast to open.
+            webgl (bool): Render the lines with WebGL (`Scattergl`) instead of SVG.
+            include_plotlyjs (bool | str): How plotly.js is included, see `plotly.io.write_html`. True inlines the
+                                           library (~3.5 MB per file); 'directory' references one shared
+                                           'plotly.min.js' copied once into the 'charts' directory; 'cdn' loads it
+                                           from the internet.
 
         Returns:
-            None: The function generates and saves a plot as an image, but does not return any value.
+            dict: {'ticker', 'path', 'seconds'} of the saved chart, see `render_chart`. Returns None on error.
 
         Logs:
             Logs a debug message when the plot is successfully saved or if an error occurs during the process.
@@ -40,63 +164,115 @@ def create_and_save_plot(logger, data, ticker, period):
               - 'Moving Average': displayed on the main y-axis.
               - 'RSI': displayed on a secondary y-axis with a range of 0 to 100.
               - 'MACD': displayed on a third y-axis overlaying the main axis.
-              - 'Max Min': displayed maximum and minimum close price values.
-              - 'Median': displayed middle of close price series.
-              - 'STD': Standard deviation, displayed measure of volatility.
-              - 'Variance': displayed close price spread around the average.
-              - 'Coefficient of Variation': displayed ratio of standard deviation to mean
+              - 'Max Min': horizontal lines at the maximum and minimum close price values.
+              - 'Median': horizontal line at the middle of close price series.
+              - 'STD', 'Variance', 'Coefficient of Variation': shown in a text box, as they are not price levels.
         """
 
+    return render_chart(logger, data, ticker, period, summary, select_theme(), max_points, webgl, include_plotlyjs)
+
+
+def select_theme():
+    """
+    Ask the user whether to change the chart theme and return the selected plotly template name.
+    """
+    from tools import colors
     command = inquirer.text(
         message="Would you like to change a theme?",
         instruction="y\\n\n",
         style=colors).execute()
     if command == 'y':
-        theme = inquirer.select(
+        return inquirer.select(
             message="Select theme:",
-            choices=["plotly_white", "plotly_dark", "ggplot2", "seaborn", "simple_white", "presentation", "xgridoff", "ygridoff", "gridon", "polar"],
+            choices=THEMES,
             style=colors,
             cycle=False
         ).execute()
-    else:
-        theme = 'plotly'
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=data['Date'], y=data['Close'], mode='lines', name='Close Price'))
-    fig.add_trace(go.Scatter(x=data['Date'], y=data['MA'], mode='lines', name='Moving Average'))
-    fig.add_trace(go.Scatter(x=data['Date'], y=data['RSI'], mode='lines', name='RSI', yaxis='y2'))
-    fig.add_trace(go.Scatter(x=data['Date'], y=data['MACD'], mode='lines', name='MACD', yaxis='y3'))
-
-    fig.add_trace(go.Scatter(x=data['Date'], y=data['Median'], mode='lines', name='Median'))
-    fig.add_trace(
-        go.Scatter(x=data['Date'], y=data['STD'], mode='lines', name='Standard Deviation', yaxis='y4'))
-    fig.add_trace(go.Scatter(x=data['Date'], y=data['Variance'], mode='lines', name='Variance', yaxis='y5'))
-    fig.add_trace(go.Scatter(x=data['Date'], y=data['Max'], mode='lines', name='Max'))
-    fig.add_trace(go.Scatter(x=data['Date'], y=data['Min'], mode='lines', name='Min'))
-    fig.add_trace(go.Scatter(x=data['Date'], y=data['Var_coef'], mode='lines', name='Coefficient of Variation', yaxis='y6'))
+    return 'plotly'
 
-    fig.update_layout(
-        title={'text': f"Close price for  {period_spell(period)}", 'x': 0.5, 'xanchor': 'center',
-               'yanchor': 'top'},
-        yaxis=dict(title='Close Price, MACD', ticklabelposition='outside left'),
-        yaxis2=dict(title='RSI', overlaying='y', side='right', range=[0, 100]),
-        yaxis3=dict(overlaying='y', side='left', ticklabelposition='inside'),
-        yaxis4=dict(overlaying='y', range=[min(data['STD']), max(data['STD'])], showticklabels=False, visible=False),
-        yaxis5=dict(overlaying='y', range=[min(data['Variance']), max(data['Variance'])], showticklabels=False, visible=False),
-        yaxis6=dict(overlaying='y', range=[min(data['Var_coef']), max(data['Var_coef'])], showticklabels=False,
-                    visible=False),
-        width=1920,
-        height=1080,
-        legend=dict(x=0, y=-0.5),
-        template=theme
-    )
-    try:
 
-        os.makedirs(f"{path}/charts", exist_ok=True)
-        fig.write_html(f"{path}/charts/{ticker}{period_spell(period)}.html")
-        logger.debug(f"The chart has been saved to: {path}\\charts\\{ticker}{period_spell(period)}.html")
-        console.print(f"[#00a400 bold]The chart has been saved to: {path}\\charts\\{ticker}{period_spell(period)}.html[#00a400 bold]")
-        # fig.write_image(f"{path}/charts/{ticker}{period_spell(period)}.png")
-        # logger.debug(f"The chart has been saved to: {path}\\charts\\{ticker}{period_spell(period)}.png")
-        # console.print(f"[#00a400 bold]The chart has been saved to: {path}\\charts\\{ticker}{period_spell(period)}.png[#00a400 bold]")
+# Build and save a chart without any prompts
+def render_chart(logger, data, ticker, period, summary=None, theme='plotly', max_points=None, webgl=False,
+                 include_plotlyjs=True, output_dir=None, verbose=True):
+    """
+    Build the chart of `create_and_save_plot` with the given theme and save it as HTML, without asking anything.
+
+    This is the non-interactive rendering API used by `create_and_save_plot` and by unattended jobs.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        data (pandas.DataFrame): A DataFrame with the columns 'Date', 'Close', 'MA', 'RSI' and 'MACD'.
+        ticker (str): The stock ticker symbol, which will be used in the filename.
+        period (str): The period string representing the timeframe for the stock data (e.g., '1d', '1mo').
+        summary (dict, optional): The statistic indicators returned by `statistic_indicators`.
+        theme (str): The plotly template name, e.g. 'plotly' or one of THEMES.
+        max_points (int, optional): Downsample every line to at most this many points with LTTB.
+        webgl (bool): Render the lines with WebGL (`Scattergl`) instead of SVG.
+        include_plotlyjs (bool | str): How plotly.js is included, see `create_and_save_plot`.
+        output_dir (str, optional): The directory of the chart. Defaults to 'charts' within the script's directory.
+        verbose (bool): Print the saved path to the console.
+
+    Returns:
+        dict: {'ticker', 'path', 'seconds', 'bundle'} of the saved chart, where bundle is the path of the plotly.min.js
+              the chart loads when include_plotlyjs is 'directory', else None. Returns None if an error occurs.
+
+    Logs:
+        Logs a debug message when the chart is saved or if an error occurs.
+    """
+    try:
+        started = time.perf_counter()
+        output_dir = output_dir or f"{path}/charts"
+        fig = build_figure(data, period, summary, theme, max_points, webgl)
+        os.makedirs(output_dir, exist_ok=True)
+        file_path = f"{output_dir}/{ticker}{period_spell(period)}.html"
+        fig.write_html(file_path, include_plotlyjs=include_plotlyjs)
+        logger.debug("The chart has been saved to: %s", file_path)
+        if verbose:
+            console.print(f"[#00a400 bold]The chart has been saved to: {file_path}[#00a400 bold]")
+        bundle = f"{output_dir}/plotly.min.js" if include_plotlyjs == 'directory' else None
+        return {'ticker': ticker, 'path': file_path, 'seconds': time.perf_counter() - started, 'bundle': bundle}
     except Exception as e:
-        logger.debug(f"Error saving the chart: {e}")
+        logger.debug("Error saving the chart: %s", e)
+
+
+def _render_job(job, options):
+    return render_chart(logging.getLogger("func"), *job, verbose=False, **options)
+
+
+# Render the charts of many tickers in a process pool
+def render_charts(logger, jobs, theme='plotly', max_workers=None, max_points=None, webgl=False,
+                  include_plotlyjs='directory', output_dir=None):
+    """
+    Render the charts of many tickers in parallel worker processes, without any prompts.
+
+    Building and serializing plotly figures is CPU bound, so the charts are spread over a process pool. By default
+    every chart references one shared plotly.min.js, which is copied into the output directory before the workers
+    start.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        jobs (list): (data, ticker, period, summary) tuples, one per chart.
+        theme (str): The plotly template name for all charts.
+        max_workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+        max_points, webgl, include_plotlyjs, output_dir: See `render_chart`.
+
+    Returns:
+        list: The `render_chart` report of every chart, in the order of `jobs`. Failed charts are reported as None.
+
+    Logs:
+        Logs a debug message with the number of charts rendered and the total time.
+    """
+    started = time.perf_counter()
+    output_dir = output_dir or f"{path}/charts"
+    os.makedirs(output_dir, exist_ok=True)
+    bundle = os.path.join(output_dir, "plotly.min.js")
+    if include_plotlyjs == 'directory' and not os.path.exists(bundle):
+        with open(bundle, 'w', encoding='utf-8') as file:
+            file.write(offline.get_plotlyjs())
+    options = {'theme': theme, 'max_points': max_points, 'webgl': webgl, 'include_plotlyjs': include_plotlyjs,
+               'output_dir': output_dir}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        reports = list(pool.map(_render_job, jobs, [options] * len(jobs)))
+    rendered = [report for report in reports if report]
+    logger.debug("%s of %s charts rendered in %.2fs", len(rendered), len(jobs), time.perf_counter() - started)
+    return reports
@@ -0,0 +1,225 @@
+import glob
+import json
+import os
+import time
+import pandas as pd
+from mmap_store import MmapStore
+from tools import path, console, period_spell
+
+
+def _report(logger, file_path, rows, started, files=None):
+    """
+    Build the report of one export, log it and print it to the console. `files` lists the files written by this
+    export when `file_path` is a directory; bytes is their total size.
+    """
+    seconds = time.perf_counter() - started
+    files = [str(f) for f in files] if files is not None else [str(file_path)]
+    size = sum(os.path.getsize(f) for f in files if os.path.isfile(f))
+    report = {'path': str(file_path), 'rows': rows, 'bytes': size, 'seconds': seconds, 'files': files}
+    logger.debug("Data saved in: %s (%s rows, %s bytes, %.3fs)", file_path, rows, size, seconds)
+    console.print(f"[#00a400 bold]Data saved in: {file_path} ({rows} rows, {size / 1024:.1f} KiB, "
+                  f"{seconds:.3f}s)[#00a400 bold]")
+    return report
+
+
+# Export fetched data to a compressed parquet file
+def export_to_parquet(logger, data, ticker, period, compression='zstd'):
+    """
+    Export stock data to a compressed Parquet file in the 'parquet' directory.
+
+    Parquet stores the columns in binary form, so the file is much smaller than the CSV and loads without text parsing.
+    Requires the `pyarrow` package.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        data (pandas.DataFrame): The DataFrame containing the stock data to be exported.
+        ticker (str): The stock ticker symbol, which will be included in the filename.
+        period (str): The period string, which will also be part of the filename (e.g., '1d', '1mo').
+        compression (str): The Parquet compression codec, e.g. 'zstd', 'snappy' or 'gzip'.
+
+    Returns:
+        dict: {'path', 'rows', 'bytes', 'seconds', 'files'} describing the written file.
+              Returns None if an error occurs.
+
+    Logs:
+        Logs a debug message when the data is saved or if an error occurs during the export.
+    """
+    try:
+        started = time.perf_counter()
+        os.makedirs(f"{path}/parquet", exist_ok=True)
+        file_path = f"{path}/parquet/{ticker}{period_spell(period)}.parquet"
+        data.to_parquet(file_path, compression=compression, index=False)
+        return _report(logger, file_path, len(data), started)
+    except Exception as e:
+        logger.debug("Error saving data to parquet: %s", e)
+
+
+# Export fetched data to a compressed feather (Arrow IPC) file
+def export_to_feather(logger, data, ticker, period, compression='lz4'):
+    """
+    Export stock data to a compressed Feather (Arrow IPC) file in the 'feather' directory.
+
+    Feather is the fastest format to write and to read back into pandas. Requires the `pyarrow` package.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        data (pandas.DataFrame): The DataFrame containing the stock data to be exported.
+        ticker (str): The stock ticker symbol, which will be included in the filename.
+        period (str): The period string, which will also be part of the filename (e.g., '1d', '1mo').
+        compression (str): 'lz4', 'zstd' or 'uncompressed'.
+
+    Returns:
+        dict: {'path', 'rows', 'bytes', 'seconds', 'files'} describing the written file.
+              Returns None if an error occurs.
+
+    Logs:
+        Logs a debug message when the data is saved or if an error occurs during the export.
+    """
+    try:
+        started = time.perf_counter()
+        os.makedirs(f"{path}/feather", exist_ok=True)
+        file_path = f"{path}/feather/{ticker}{period_spell(period)}.feather"
+        data.reset_index(drop=True).to_feather(file_path, compression=compression)
+        return _report(logger, file_path, len(data), started)
+    except Exception as e:
+        logger.debug("Error saving data to feather: %s", e)
+
+
+# Stream a large frame to csv chunk by chunk
+def export_to_csv_chunked(logger, data, ticker, period, chunk_size=100_000):
+    """
+    Export stock data to a CSV file in the 'csv' directory, writing `chunk_size` rows at a time.
+
+    Formatting a very large frame in one `to_csv` call builds the whole text in memory; writing chunks keeps the
+    memory use bounded by the chunk size.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        data (pandas.DataFrame): The DataFrame containing the stock data to be exported.
+        ticker (str): The stock ticker symbol, which will be included in the filename.
+        period (str): The period string, which will also be part of the filename (e.g., '1d', '1mo').
+        chunk_size (int): The number of rows formatted and written at once.
+
+    Returns:
+        dict: {'path', 'rows', 'bytes', 'seconds', 'files'} describing the written file.
+              Returns None if an error occurs.
+
+    Logs:
+        Logs a debug message when the data is saved or if an error occurs during the export.
+    """
+    try:
+        started = time.perf_counter()
+        os.makedirs(f"{path}/csv", exist_ok=True)
+        file_path = f"{path}/csv/{ticker}{period_spell(period)}.csv"
+        with open(file_path, 'w', newline='', encoding='utf-8') as file:
+            for start in range(0, max(len(data), 1), chunk_size):
+                data.iloc[start:start + chunk_size].to_csv(file, header=start == 0)
+        return _report(logger, file_path, len(data), started)
+    except Exception as e:
+        logger.debug("Error saving data: %s", e)
+
+
+# Append new rows to a parquet dataset partitioned by ticker and year
+def append_to_dataset(logger, data, ticker, root=None, compression='zstd'):
+    """
+    Append the new rows of stock data to a Parquet dataset partitioned by ticker and year.
+
+    The dataset is laid out as 'dataset/ticker=<TICKER>/year=<YYYY>/part-<first>-<last>.parquet'. A small
+    '_manifest.json' per ticker remembers the last stored date, so a daily refresh writes only the rows after it
+    instead of rewriting the whole history. The part files are written aside and renamed, and the manifest is
+    replaced only after all of them are in place, so a failed append leaves no partial rows that a retry would
+    duplicate. Requires the `pyarrow` package.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        data (pandas.DataFrame): Stock data with a 'Date' column, as returned by `fetch_stock_data`.
+        ticker (str): The stock ticker symbol.
+        root (str, optional): The dataset directory. Defaults to 'dataset' within the script's directory.
+        compression (str): The Parquet compression codec.
+
+    Returns:
+        dict: {'path', 'rows', 'bytes', 'seconds', 'files'}, where rows, bytes and files are the appended rows and
+              the part files written by this call. Returns None if an error occurs.
+
+    Logs:
+        Logs a debug message when rows are appended or if an error occurs.
+    """
+    try:
+        started = time.perf_counter()
+        ticker_dir = os.path.join(root or f"{path}/dataset", f"ticker={ticker}")
+        manifest_path = os.path.join(ticker_dir, "_manifest.json")
+        os.makedirs(ticker_dir, exist_ok=True)
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as file:
+                manifest = json.load(file)
+        new = data
+        if manifest.get('last_date'):
+            new = data[data['Date'] > pd.Timestamp(manifest['last_date'])]
+        parts = []
+        try:
+            for year, rows in new.groupby(new['Date'].dt.year):
+                year_dir = os.path.join(ticker_dir, f"year={year}")
+                os.makedirs(year_dir, exist_ok=True)
+                first, last = (rows['Date'].iloc[i].strftime('%Y%m%d%H%M') for i in (0, -1))
+                parts.append(os.path.join(year_dir, f"part-{first}-{last}.parquet"))
+                rows.to_parquet(f"{parts[-1]}.tmp", compression=compression, index=False)
+        except Exception:
+            for part in parts:
+                if os.path.exists(f"{part}.tmp"):
+                    os.remove(f"{part}.tmp")
+            raise
+        for part in parts:
+            os.replace(f"{part}.tmp", part)
+        if len(new):
+            manifest['last_date'] = new['Date'].max().isoformat()
+            manifest['rows'] = manifest.get('rows', 0) + len(new)
+            with open(f"{manifest_path}.tmp", 'w', encoding='utf-8') as file:
+                json.dump(manifest, file)
+            os.replace(f"{manifest_path}.tmp", manifest_path)
+        return _report(logger, ticker_dir, len(new), started, parts)
+    except Exception as e:
+        logger.debug("Error appending data to the dataset: %s", e)
+
+
+# Save fetched data as memory-mapped column files
+def export_to_mmap(logger, data, ticker, root=None):
+    """
+    Save stock data to the memory-mapped store: one .npy file per column in 'mmap/<TICKER>'.
+
+    Loading it back with `MmapStore.load` maps the files instead of parsing them, and a date range is cut out without
+    reading the rest of the history.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        data (pandas.DataFrame): Stock data with a 'Date' column, as returned by `fetch_stock_data`.
+        ticker (str): The stock ticker symbol.
+        root (str, optional): The store directory. Defaults to 'mmap' within the script's directory.
+
+    Returns:
+        dict: {'path', 'rows', 'bytes', 'seconds', 'files'} describing the written files.
+              Returns None if an error occurs.
+
+    Logs:
+        Logs a debug message when the data is saved or if an error occurs.
+    """
+    try:
+        started = time.perf_counter()
+        store = MmapStore(root)
+        entry = store.save(ticker, data)
+        ticker_dir = os.path.join(store.root, ticker)
+        return _report(logger, ticker_dir, len(data), started,
+                       [os.path.join(ticker_dir, f"{column}.npy") for column in entry['columns']])
+    except Exception as e:
+        logger.debug("Error saving data to the memory-mapped store: %s", e)
+
+
+def read_dataset(ticker, root=None):
+    """
+    Read back all rows of a ticker stored with `append_to_dataset`, ordered by date.
+    """
+    ticker_dir = os.path.join(root or f"{path}/dataset", f"ticker={ticker}")
+    files = sorted(glob.glob(os.path.join(ticker_dir, "year=*", "*.parquet")))
+    if not files:
+        return pd.DataFrame()
+    return pd.concat([pd.read_parquet(f) for f in files], ignore_index=True).sort_values('Date', ignore_index=True)
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+# Default parameters of the indicators, the same as the data_download functions use
+DEFAULT_PARAMS = {'window_size': 5, 'rsi_window': 14, 'macd_short': 12, 'macd_long': 26}
+
+# Graph nodes: kind -> (dependencies of a node, computation from the dependency values).
+# A node key is a tuple (kind, *args); ('close',) is the source series.
+NODES = {
+    'diff': (lambda: [('close',)],
+             lambda close: close.diff()),
+    'gain': (lambda: [('diff',)],
+             lambda delta: delta.where(delta > 0, 0)),
+    'loss': (lambda: [('diff',)],
+             lambda delta: -delta.where(delta < 0, 0)),
+    'mean': (lambda source, window, min_periods: [(source,)],
+             lambda source, window, min_periods, values: values.rolling(window=window,
+                                                                          min_periods=min_periods).mean()),
+    'ema': (lambda span: [('close',)],
+            lambda span, close: close.ewm(span=span, adjust=False).mean()),
+    'MA': (lambda window: [('mean', 'close', window, None)],
+           lambda window, mean: mean),
+    'RSI': (lambda window: [('mean', 'gain', window, 1), ('mean', 'loss', window, 1)],
+            lambda window, avg_gain, avg_loss: 100 - (100 / (1 + avg_gain / avg_loss))),
+    'MACD': (lambda short, long: [('ema', short), ('ema', long)],
+             lambda short, long, short_ema, long_ema: short_ema - long_ema),
+}
+
+# Indicators a consumer can ask for, mapped to their graph node
+INDICATORS = {
+    'MA': lambda params: ('MA', params['window_size']),
+    'RSI': lambda params: ('RSI', params['rsi_window']),
+    'MACD': lambda params: ('MACD', params['macd_short'], params['macd_long']),
+}
+
+
+def fingerprint(close):
+    """
+    A content hash of a close price series, including its index.
+    """
+    hashed = pd.util.hash_pandas_object(close, index=True).to_numpy()
+    return hashlib.sha1(hashed.tobytes()).hexdigest()
+
+
+class IndicatorEngine:
+    """
+    Evaluates indicators as a dependency graph with shared, memoized intermediates.
+
+    Every indicator declares the nodes it depends on (see NODES): RSI needs the rolling means of gains and losses,
+    which need the price differences; MACD needs two EMAs; and so on. Asking for several indicators evaluates every
+    shared node once, and only the nodes needed by the requested indicators are evaluated at all.
+
+    Node values are memoized per dataset fingerprint (a hash of the close series) and node key, which carries the
+    parameters. The memo is an LRU cache of at most `max_entries` series and `max_bytes` of their values, so
+    repeated requests for the same data, e.g. a chart after a CSV export, cost no recomputation, while an engine shared
+    by a long-running process (watch.py, service.py) stays bounded however long its histories are.
+
+    Attributes:
+        max_entries (int): Maximum number of memoized series.
+        max_bytes (int): Maximum total size of the memoized values.
+        hits (int): Node values served from the memo.
+        misses (int): Node values computed.
+    """
+    def __init__(self, max_entries=256, max_bytes=64 * 2 ** 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memo = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    def _evaluate(self, key, close, data_id):
+        memo_key = (data_id, key)
+        with self._lock:
+            if memo_key in self._memo:
+                self._memo.move_to_end(memo_key)
+                self.hits += 1
+                return self._memo[memo_key]
+        if key == ('close',):
+            return close
+        kind, args = key[0], key[1:]
+        dependencies, compute = NODES[kind]
+        values = [self._evaluate(dep, close, data_id) for dep in dependencies(*args)]
+        result = compute(*args, *values)
+        with self._lock:
+            self.misses += 1
+            if memo_key not in self._memo:
+                self._memo[memo_key] = result
+                self._bytes += result.memory_usage(index=False)
+            while self._memo and (len(self._memo) > self.max_entries or self._bytes > self.max_bytes):
+                self._bytes -= self._memo.popitem(last=False)[1].memory_usage(index=False)
+        return result
+
+    def compute(self, data, indicators=('MA', 'RSI', 'MACD'), **params):
+        """
+        Evaluate the requested indicators of a quotes frame.
+
+        Args:
+            data (pandas.DataFrame): A DataFrame containing stock data with a 'Close' column.
+            indicators (iterable): Names from INDICATORS, e.g. ['MA', 'RSI'].
+            **params: Overrides of DEFAULT_PARAMS (window_size, rsi_window, macd_short, macd_long).
+
+        Returns:
+            dict: {indicator name: pandas.Series} aligned with `data`.
+        """
+        params = {**DEFAULT_PARAMS, **params}
+        close = data['Close']
+        data_id = fingerprint(close)
+        return {name: self._evaluate(INDICATORS[name](params), close, data_id) for name in indicators}
+
+    def add_to(self, logger, data, indicators=('MA', 'RSI', 'MACD'), **params):
+        """
+        Add the requested indicators to the DataFrame as columns, like the data_download functions do.
+
+        Args:
+            logger (logging.Logger): The logger object used to log debug messages.
+            data (pandas.DataFrame): A DataFrame containing stock data with a 'Close' column. Modified in place.
+            indicators (iterable): Names from INDICATORS.
+            **params: Overrides of DEFAULT_PARAMS.
+
+        Logs:
+            Logs a debug message when the columns are added or if an error occurs.
+        """
+        try:
+            for name, values in self.compute(data, indicators, **params).items():
+                data[name] = values
+            logger.debug("Columns %s have been added (memo hits: %s, misses: %s)", list(indicators), self.hits,
+                         self.misses)
+        except Exception as e:
+            logger.debug("Indicator columns not added: %s", e)
+
+    def clear(self):
+        """
+        Drop all memoized values.
+        """
+        with self._lock:
+            self._memo.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Memo counters: {'hits', 'misses', 'entries', 'bytes'}.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._memo), 'bytes': self._bytes}
@@ -1,8 +1,34 @@
-import logging, os
-from logging.handlers import TimedRotatingFileHandler
+import atexit, logging, os, queue
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
 from datetime import datetime
 
 
+class BlockingQueueHandler(QueueHandler):
+	"""
+	A QueueHandler that hands records to the background writer unformatted and waits when the queue is full.
+
+	The standard QueueHandler formats every message on the calling thread and drops records with an error when a
+	bounded queue is full. Here the message is formatted by the writer thread, and a full queue applies
+	back-pressure instead of losing records. Records with exception info are still prepared on the calling thread,
+	because traceback objects must not outlive the frame that raised them.
+	"""
+	def prepare(self, record):
+		if record.exc_info:
+			return super().prepare(record)
+		return record
+
+	def enqueue(self, record):
+		self.queue.put(record)
+
+
+class BlockingQueueListener(QueueListener):
+	"""
+	A QueueListener whose stop signal waits for room in a full bounded queue instead of raising queue.Full.
+	"""
+	def enqueue_sentinel(self):
+		self.queue.put(self._sentinel)
+
+
 class Logger:
 	"""
 	A custom logging class that sets up logging for both the main process and individual functions.
@@ -14,26 +40,38 @@ class Logger:
 	Log files are stored in a specified directory (default is "logs") and are rotated daily at midnight.
 	Both loggers share the same logging format and settings, with log messages stored in a time-stamped file.
 
+	With `use_queue=True` the loggers only put records on a bounded queue, and a background QueueListener thread
+	formats them and writes the file, so logging costs the calling thread no file I/O. The queue is flushed when
+	`close()` is called or the interpreter exits.
+
 	Attributes:
 		log_dir (str): Directory where log files will be saved. Defaults to "logs".
 		log_level (str): The log level for the file handler, controls which messages are recorded in the file.
+		use_queue (bool): Whether records are written by a background thread.
+		queue_size (int): Maximum number of records waiting in the queue; callers block while it is full.
 		main_logger (logging.Logger): Logger for main processes, logs at INFO level.
 		function_logger (logging.Logger): Logger for function-level debugging, logs at DEBUG level.
 
 	Methods:
-		__init__(log_dir="logs", log_level=''):
+		__init__(log_dir="logs", log_level='', use_queue=False, queue_size=10000):
 			Initializes the logger class with the specified logging directory and log level,
 			and sets up the loggers and file handlers.
 
+		close():
+			Flushes pending records, detaches the handlers from both loggers and closes the log file.
+
 		get_main_logger():
 			Returns the logger used for main process logging, which logs messages at the INFO level.
 
 		get_function_logger(self):
 			Returns the logger used for function-level logging, which logs messages at the DEBUG level.
 	"""
-	def __init__(self, log_dir="logs", log_level=logging.INFO):
+	def __init__(self, log_dir="logs", log_level=logging.INFO, use_queue=False, queue_size=10000):
 		self.log_dir = log_dir
 		self.log_level = log_level
+		self.use_queue = use_queue
+		self.queue_size = queue_size
+		self.listener = None
 
 		# Logger for main with INFO level
 		self.main_logger = logging.getLogger("main")
@@ -55,10 +93,27 @@ class Logger:
 		formatter = logging.Formatter(fmt='%(asctime)s.%(msecs)03d\t%(name)s\t%(message)s', datefmt='%H:%M:%S')
 		handler.setFormatter(formatter)
 		handler.setLevel(log_level)
+		self.file_handler = handler
+		if use_queue:
+			# Background writer: loggers only enqueue, the listener thread formats and writes
+			records = queue.Queue(maxsize=queue_size)
+			self.listener = BlockingQueueListener(records, handler, respect_handler_level=True)
+			self.listener.start()
+			handler = BlockingQueueHandler(records)
+			atexit.register(self.close)
+		self.handler = handler
 		# Add handler to both loggers
 		self.main_logger.addHandler(handler)
 		self.function_logger.addHandler(handler)
 
+	def close(self):
+		self.main_logger.removeHandler(self.handler)
+		self.function_logger.removeHandler(self.handler)
+		if self.listener:
+			self.listener.stop()
+			self.listener = None
+		self.file_handler.close()
+
 	def get_main_logger(self):
 		return self.main_logger
 
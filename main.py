@@ -1,36 +1,146 @@
+import argparse
+import json
+import os
+import time
 from data_download import (fetch_stock_data,
-                           add_moving_average,
-                           calculate_rsi,
-                           calculate_macd,
                            statistic_indicators,
                            calculate_and_display_average_price,
                            notify_if_strong_fluctuations,
                            export_to_csv
                            )
-from tools import console, colors, period_spell
-from data_plotting import create_and_save_plot
+from tools import console, period_spell, lazy_import
+from data_plotting import select_theme, render_chart, render_charts, THEMES
 from log_manager import Logger, logging
-from InquirerPy import inquirer
+from quote_store import QuoteStore, period_range
+from batch import run_batch, print_batch_summary
+from exporters import export_to_parquet, export_to_feather, append_to_dataset, export_to_mmap
+from profiling import StageProfiler
+from indicator_engine import IndicatorEngine
+from screener import screen, print_alerts
+from resampling import build_pyramid
+from artifact_cache import ArtifactCache, frame_fingerprint
 
-logger = Logger(log_level=logging.DEBUG)  # Set INFO to exclude functions' logging
+# Only the interactive mode loads InquirerPy
+inquirer = lazy_import('InquirerPy.inquirer')
+validator = lazy_import('InquirerPy.validator')
 
+LOG_LEVEL = logging.DEBUG  # Set INFO to exclude functions' logging
+CHART_POINTS = 2000  # Longer histories are downsampled and drawn with WebGL
+CPROFILE_DIR = None  # Set a directory, e.g. "profiles", to dump cProfile stats of every stage
+TRACE_MEMORY = False  # Set True to measure the peak memory of every stage (tracemalloc slows the stages down)
+# Indicators each output needs; they are evaluated only when the output is requested
+EXPORT_INDICATORS = ('MA', 'RSI', 'MACD')
+CHART_INDICATORS = ('MA', 'RSI', 'MACD')
+SCREEN_WINDOWS = (5, 20)  # Rows (trading days for daily bars) checked by the screener
+COMPACT_BATCH = False  # Set True to keep batch quotes in float32 without unused columns (large universes)
+RESAMPLE_CHARTS = True  # Chart long histories from weekly/monthly/quarterly rollups that fit CHART_POINTS
+PERIODS = ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd"]
+INTERVALS = ["1d", "1h", "15m", "5m", "1m"]
+EXPORT_FORMATS = ["csv", "parquet", "feather", "dataset", "mmap"]
+# Exports that write standalone files; dataset and mmap update indexes shared with later runs, so they always run
+CACHED_EXPORTS = ("csv", "parquet", "feather")
+ARTIFACT_CACHE_MB = 512  # Size limit of the cached exports and charts reused by unchanged runs
+_logger = None
+_artifacts = None
 
-def main():
-	welcome_text = """
+
+def get_logger():
+	"""
+	The Logger of the application, created on first use so importing this module writes nothing.
+	"""
+	global _logger
+	if _logger is None:
+		_logger = Logger(log_level=LOG_LEVEL)
+	return _logger
+
+
+def get_artifacts():
+	"""
+	The ArtifactCache of the exports and charts, opened on first use.
+	"""
+	global _artifacts
+	if _artifacts is None:
+		_artifacts = ArtifactCache(max_bytes=ARTIFACT_CACHE_MB * 2 ** 20)
+	return _artifacts
+
+
+def main(argv=None):
+	args = parse_args(argv)
+	logger = get_logger()
+	log = logger.get_main_logger()
+	func_log = logger.get_function_logger()
+	if args.job:
+		jobs = load_jobs(args.job)
+	elif args.tickers:
+		period = [args.start, args.end] if args.start and args.end else args.period
+		jobs = [make_job(args.tickers, period, args.interval, args.threshold, args.export, args.chart)]
+	else:
+		welcome_text = """
 	┌────────────────────────────────────── StockScope ──────────────────────────────────────┐
 	│ This tool can fetch quotes from fc.yahoo.com by builtin periods or by custom interval. │
 	│     Also it adds MA, MACD, RSI and statistic indicators within close price chart.      │
 	│               It is also available to export data to csv and png files.                │
 	└────────────────────────────────────────────────────────────────────────────────────────┘
 	"""
-	console.print(f'[#00a400 bold]{welcome_text}[#00a400 bold]')
-	log = logger.get_main_logger()
-	func_log = logger.get_function_logger()
+		console.print(f'[#00a400 bold]{welcome_text}[#00a400 bold]')
+		jobs = None
 	log.info("Start")
-	ticker = inquirer.text(message="Enter stock ticker:", instruction="e.g. «AAPL» for Apple Inc\n", style=colors).execute()
+	store = QuoteStore()
+	for job in [prompt_job()] if jobs is None else jobs:
+		run_job(log, func_log, job, store)
+
+
+def parse_args(argv=None):
+	parser = argparse.ArgumentParser(description="StockScope: fetch quotes, add indicators, export data and save charts. "
+												 "Without arguments every option is asked interactively.")
+	parser.add_argument("tickers", nargs="*", help="one ticker, several for a batch, or * to screen the local store")
+	parser.add_argument("--period", default="1mo", choices=PERIODS)
+	parser.add_argument("--start", help="start of a custom range, dd.mm.yyyy (use with --end)")
+	parser.add_argument("--end", help="end of a custom range, dd.mm.yyyy")
+	parser.add_argument("--interval", default="1d", choices=INTERVALS)
+	parser.add_argument("--threshold", type=float, default=5.0, help="price fluctuation threshold, percent")
+	parser.add_argument("--export", choices=EXPORT_FORMATS, help="save the data in this format")
+	parser.add_argument("--chart", choices=["plotly"] + THEMES, help="save the chart with this theme")
+	parser.add_argument("--job", help="JSON file with a job or a list of jobs, keyed like the options above")
+	return parser.parse_args(argv)
+
+
+def make_job(tickers, period='1mo', interval='1d', threshold=5.0, export=None, chart=None):
+	"""
+	Build a job run without prompts. `export` and `chart` set to None skip the export and the chart.
+
+	Raises:
+		ValueError: If the period, interval, export format or theme is unknown.
+	"""
+	tickers = tickers.replace(',', ' ').split() if isinstance(tickers, str) else list(tickers)
+	if (period not in PERIODS and not (isinstance(period, list) and len(period) == 2)) or interval not in INTERVALS \
+			or export not in EXPORT_FORMATS + [None] or chart not in ["plotly"] + THEMES + [None]:
+		raise ValueError(f"Invalid job: period {period}, interval {interval}, export {export}, chart {chart}")
+	return {'tickers': tickers, 'period': period, 'interval': interval, 'threshold': float(threshold),
+			'export': export, 'chart': chart}
+
+
+def load_jobs(job_path):
+	"""
+	Read a job file: a JSON object or a list of objects with the arguments of `make_job`, e.g.
+	{"tickers": ["AAPL", "MSFT"], "period": "6mo", "export": "parquet", "chart": "plotly_dark"}.
+	A custom range is given as "period": ["01.01.2024", "31.03.2024"].
+	"""
+	with open(job_path, encoding='utf-8') as file:
+		jobs = json.load(file)
+	return [make_job(**job) for job in (jobs if isinstance(jobs, list) else [jobs])]
+
+
+def prompt_job():
+	"""
+	Ask for a job interactively. The export and chart questions are asked later, once the data is analyzed.
+	"""
+	from tools import colors
+	ticker = inquirer.text(message="Enter stock ticker:", instruction="e.g. «AAPL» for Apple Inc, «AAPL MSFT» for a batch, «*» to screen the local store\n", style=colors).execute()
+	tickers = ticker.replace(',', ' ').split()
 	period = inquirer.select(
 		message="Select period:",
-		choices=["custom", "1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd"],
+		choices=["custom"] + PERIODS,
 		style=colors,
 		cycle=False
 	).execute()
@@ -49,47 +159,222 @@ def main():
 				style=colors
 			).execute()
 		]
-	threshold = inquirer.text(message="Enter the price fluctuation threshold:", style=colors).execute()
+	interval = inquirer.select(
+		message="Select interval:",
+		choices=INTERVALS,
+		style=colors,
+		cycle=False
+	).execute()
+	threshold = float(inquirer.text(
+		message="Enter the price fluctuation threshold:",
+		validate=validator.NumberValidator(float_allowed=True),
+		invalid_message="Enter a number of percent, e.g. 5 or 2.5.",
+		style=colors).execute())
+	return {'tickers': tickers, 'period': period, 'interval': interval, 'threshold': threshold}
 
-	log.info(f"Symbol: {ticker}, Period: {period_spell(period)}, % fluctuation {threshold}")
 
+def choose_export(job):
+	"""
+	The export format of a job, asked for when the job does not set it. None means no export.
+	"""
+	if 'export' in job:
+		return job['export']
+	from tools import colors
+	command = inquirer.text(
+		message="Would you like to save data to file?",
+		instruction="y\\n\n",
+		style=colors).execute()
+	return select_export_format() if command.lower() == 'y' else None
+
+
+def choose_chart(job, message):
+	"""
+	The chart theme of a job, asked for when the job does not set it. None means no chart.
+	"""
+	if 'chart' in job:
+		return job['chart']
+	from tools import colors
+	command = inquirer.text(message=message, instruction="y\\n\n", style=colors).execute()
+	return select_theme() if command.lower() == 'y' else None
+
+
+def run_job(log, func_log, job, store):
+	tickers, period, interval, threshold = job['tickers'], job['period'], job['interval'], job['threshold']
+	if tickers == ['*']:
+		screener_main(log, func_log, period, interval, threshold, store)
+		return
+	if len(tickers) > 1:
+		batch_main(log, func_log, job, store)
+		return
+
+	ticker = ' '.join(tickers)
+	log.info(f"Symbol: {ticker}, Period: {period_spell(period)}, Interval: {interval}, % fluctuation {threshold}")
+
+	profiler = StageProfiler(log, trace_memory=TRACE_MEMORY, cprofile_dir=CPROFILE_DIR)
+	artifacts = get_artifacts()
 	log.info(f"Getting quotes of {ticker} for {period_spell(period)}")
-	stock_data = fetch_stock_data(func_log, ticker, period)
+	with profiler.stage("fetch") as stage:
+		stock_data = fetch_stock_data(func_log, ticker, period, store=store, interval=interval)
+		stage.rows = 0 if stock_data is None else len(stock_data)
+	log.info(f"Quote store hits: {store.hits}, misses: {store.misses}")
+	if stock_data is None:
+		console.print(f"[red]No quotes of {ticker} for {period_spell(period)}, check the symbol and the period[red]")
+		log.info(f"No quotes of {ticker} for {period_spell(period)}")
+		log.info("Stop\n")
+		return
 
-	log.info(f"Adding MA values {ticker} for {period_spell(period)}")
-	add_moving_average(func_log, stock_data, 5)
+	engine = IndicatorEngine()
+	with profiler.stage("stats") as stage:
+		log.info(f"Adding statistic indicators {ticker} for {period_spell(period)}")
+		summary = statistic_indicators(func_log, stock_data, ticker, period)
 
-	log.info(f"Adding RSI values {ticker} for {period_spell(period)}")
-	calculate_rsi(func_log, stock_data)
+		log.info(f"Calculating average price for {period_spell(period)}")
+		calculate_and_display_average_price(func_log, stock_data, ticker, period)
 
-	log.info(f"Adding MACD values {ticker} for {period_spell(period)}")
-	calculate_macd(func_log, stock_data)
+		log.info(f"Calculating % fluctuation of the average price for {period_spell(period)}")
+		notify_if_strong_fluctuations(func_log, stock_data, threshold, ticker, period)
+		stage.rows = len(stock_data)
 
-	log.info(f"Adding statistic indicators {ticker} for {period_spell(period)}")
-	statistic_indicators(func_log, stock_data, ticker, period)
+	# Outputs of an unchanged frame with the same options are restored from the artifact cache
+	data_id = frame_fingerprint(stock_data)
+	export_format = choose_export(job)
+	if export_format:
+		key = artifacts.key(data_id, artifact='export', ticker=ticker, period=period, interval=interval,
+							format=export_format, indicators=EXPORT_INDICATORS,
+							window_size=5) if export_format in CACHED_EXPORTS else None
+		if key and artifacts.restore(func_log, key):
+			log.info(f"Reusing the cached {export_format} export of {ticker} for {period_spell(period)}")
+		else:
+			started = time.perf_counter()
+			log.info(f"Adding {', '.join(EXPORT_INDICATORS)} values {ticker} for {period_spell(period)}")
+			with profiler.stage("export-indicators") as stage:
+				engine.add_to(func_log, stock_data, EXPORT_INDICATORS, window_size=5)
+				stage.rows = len(stock_data)
+			log.info(f"Saving data to {export_format}")
+			with profiler.stage("export") as stage:
+				paths = export_data(func_log, stock_data, ticker, period, summary, export_format)
+				stage.rows = len(stock_data)
+			if key and paths:
+				artifacts.store(func_log, key, paths, time.perf_counter() - started)
+	theme = choose_chart(job, "Would you like to save data as png and html?")
+	if theme:
+		key = artifacts.key(data_id, artifact='chart', ticker=ticker, period=period, interval=interval, theme=theme,
+							indicators=CHART_INDICATORS, window_size=5, max_points=CHART_POINTS,
+							resample=RESAMPLE_CHARTS)
+		if artifacts.restore(func_log, key):
+			log.info(f"Reusing the cached chart of {ticker} for {period_spell(period)}")
+		else:
+			started = time.perf_counter()
+			pyramid = None
+			if RESAMPLE_CHARTS and len(stock_data) > CHART_POINTS:
+				# The rollups carry their own indicators, so the full-resolution ones are not computed
+				log.info(f"Rolling up {len(stock_data)} bars of {ticker} for {period_spell(period)}")
+				with profiler.stage("chart-rollups") as stage:
+					pyramid = build_pyramid(func_log, stock_data, interval, engine=engine)
+					stage.rows = len(stock_data)
+			if pyramid is None:
+				log.info(f"Adding {', '.join(CHART_INDICATORS)} values {ticker} for {period_spell(period)}")
+				with profiler.stage("chart-indicators") as stage:
+					engine.add_to(func_log, stock_data, CHART_INDICATORS, window_size=5)
+					stage.rows = len(stock_data)
+			log.info(f"saving average closing price chart for {period_spell(period)}")
+			with profiler.stage("plot") as stage:
+				report = plot_chart(log, func_log, stock_data, pyramid, ticker, period, summary, theme)
+				stage.rows = len(stock_data)
+			if report:
+				# Charts of long histories load plotly.js from the file next to them
+				artifacts.store(func_log, key, [report['path'], report['bundle']], time.perf_counter() - started)
 
-	log.info(f"Calculating average price for {period_spell(period)}")
-	calculate_and_display_average_price(func_log, stock_data, ticker, period)
+	profiler.print_summary()
+	cache = artifacts.stats()
+	log.info(f"Artifact cache hits: {cache['hits']}, misses: {cache['misses']}, "
+			 f"{cache['seconds_saved']:.2f}s saved, {cache['entries']} entries, {cache['bytes'] / 2 ** 20:.1f} MiB")
+	if cache['hits']:
+		console.print(f"[#00a400 bold]{cache['hits']} outputs reused from the artifact cache, "
+					  f"{cache['seconds_saved']:.2f}s saved[#00a400 bold]")
+	log.info("Stop\n")
 
-	log.info(f"Calculating % fluctuation of the average price for {period_spell(period)}")
-	notify_if_strong_fluctuations(func_log, stock_data, threshold, ticker, period)
 
-	command = inquirer.text(
-		message="Would you like to save data to csv?",
-		instruction="y\\n\n",
-		style=colors).execute()
-	if command.lower() == 'y':
-		log.info(f"Saving data to csv")
-		export_to_csv(func_log, stock_data, ticker, period)
-	command = (inquirer.text(
-		message="Would you like to save data as png and html?",
-		instruction="y\\n\n", style=colors).execute())
-	if command.lower() == 'y':
-		log.info(f"saving average closing price chart for {period_spell(period)}")
-		create_and_save_plot(func_log, stock_data, ticker, period)
+def plot_chart(log, func_log, stock_data, pyramid, ticker, period, summary, theme):
+	if pyramid is not None:
+		level, chart_data = pyramid.select(max_points=CHART_POINTS)
+		log.info(f"Charting {len(chart_data)} {level} rows of {len(stock_data)} bars")
+		return render_chart(func_log, chart_data, ticker, period, summary, theme, max_points=CHART_POINTS, webgl=True,
+							include_plotlyjs='directory')
+	elif len(stock_data) > CHART_POINTS:
+		return render_chart(func_log, stock_data, ticker, period, summary, theme, max_points=CHART_POINTS, webgl=True,
+							include_plotlyjs='directory')
+	return render_chart(func_log, stock_data, ticker, period, summary, theme)
 
+
+def batch_main(log, func_log, job, store):
+	tickers, period, interval, threshold = job['tickers'], job['period'], job['interval'], job['threshold']
+	log.info(f"Batch of {len(tickers)} symbols for {period_spell(period)}, % fluctuation {threshold}")
+	batch = run_batch(func_log, tickers, period, store=store, interval=interval, compact=COMPACT_BATCH)
+	log.info(f"Batch processed in {batch['seconds']:.2f}s, {batch['throughput']:.1f} symbols/s, "
+			 f"{len(batch['errors'])} failed")
+	print_batch_summary(batch, period)
+	for ticker, stock_data in batch['results'].items():
+		notify_if_strong_fluctuations(func_log, stock_data, threshold, ticker, period)
+
+	export_format = choose_export(job)
+	if export_format:
+		log.info(f"Saving data of {len(batch['results'])} symbols to {export_format}")
+		for ticker, stock_data in batch['results'].items():
+			export_data(func_log, stock_data, ticker, period, batch['summaries'][ticker], export_format)
+	theme = choose_chart(job, "Would you like to save charts as html?")
+	if theme:
+		log.info(f"Rendering {len(batch['results'])} charts for {period_spell(period)}")
+		jobs = [(stock_data, ticker, period, batch['summaries'][ticker]) for ticker, stock_data in batch['results'].items()]
+		reports = [report for report in render_charts(func_log, jobs, theme, max_points=CHART_POINTS, webgl=True) if report]
+		seconds = [report['seconds'] for report in reports]
+		log.info(f"{len(reports)} charts rendered, {sum(seconds) / max(len(seconds), 1):.2f}s per chart")
+		console.print(f"[#00a400 bold]{len(reports)} of {len(jobs)} charts saved, "
+					  f"max {max(seconds, default=0):.2f}s per chart[#00a400 bold]")
+
+	log.info("Stop\n")
+
+
+def screener_main(log, func_log, period, interval, threshold, store):
+	start, end, _ = period_range(period)
+	close = store.load_column(interval, start, end)
+	log.info(f"Screening {close.shape[1]} stored symbols for {period_spell(period)}, % fluctuation {threshold}")
+	if close.empty:
+		console.print("[red]The local store has no quotes for this period, fetch some symbols first[red]")
+		return
+	alerts = screen(func_log, close, SCREEN_WINDOWS, threshold)
+	if alerts is not None:
+		print_alerts(alerts, period)
+		log.info(f"Screener found {len(alerts)} alerts")
 	log.info("Stop\n")
 
 
+def select_export_format():
+	from tools import colors
+	return inquirer.select(
+		message="Select format:",
+		choices=EXPORT_FORMATS,
+		style=colors,
+		cycle=False
+	).execute()
+
+
+def export_data(func_log, stock_data, ticker, period, summary, export_format):
+	"""
+	Export with the exporter of `export_format`. Returns the paths of the written files, or None if an error occurs.
+	"""
+	if export_format == "csv":
+		return export_to_csv(func_log, stock_data, ticker, period, summary)
+	if export_format == "parquet":
+		report = export_to_parquet(func_log, stock_data, ticker, period)
+	elif export_format == "feather":
+		report = export_to_feather(func_log, stock_data, ticker, period)
+	elif export_format == "dataset":
+		report = append_to_dataset(func_log, stock_data, ticker)
+	else:
+		report = export_to_mmap(func_log, stock_data, ticker)
+	return report and report['files']
+
+
 if __name__ == "__main__":
 	main()
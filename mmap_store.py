@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from tools import path
+
+
+class MmapStore:
+    """
+    Quote histories stored as one NumPy .npy file per column per ticker, loaded as memory-mapped views.
+
+    The layout is '<root>/<TICKER>/<column>.npy' plus '<root>/_index.json', which records the date range, row count,
+    timezone and columns of every ticker. Dates are stored as UTC int64 nanoseconds, which stay unambiguous across
+    daylight saving changes, and the exchange timezone is restored on load; numeric columns are stored as float64.
+
+    Loading maps the files instead of reading them: the numeric columns of the returned frame are views of the
+    mapped files, so nothing is parsed or copied and the operating system pages in only what is used. A date range
+    is located by binary search on the date column, so slicing touches only the pages of the requested rows.
+    The views are read-only; the indicator functions only read them and add their results as new columns.
+
+    Attributes:
+        root (str): The directory of the store.
+    """
+    def __init__(self, root=None):
+        self.root = str(root or os.path.join(path, "mmap"))
+        self._index_path = os.path.join(self.root, "_index.json")
+        self._lock = threading.Lock()
+        self._index = (None, {})
+        os.makedirs(self.root, exist_ok=True)
+
+    def index(self):
+        """
+        Return the metadata of all tickers: {ticker: {'start', 'end', 'rows', 'tz', 'columns'}}.
+
+        The parsed index is reused until the file changes.
+        """
+        if not os.path.exists(self._index_path):
+            return {}
+        modified = os.stat(self._index_path).st_mtime_ns
+        if self._index[0] != modified:
+            with open(self._index_path, encoding='utf-8') as file:
+                self._index = (modified, json.load(file))
+        return self._index[1]
+
+    def save(self, ticker, data):
+        """
+        Write the history of a ticker, replacing what was stored before.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            data (pandas.DataFrame): Quotes with a 'Date' column, as returned by `fetch_stock_data`. Rows are sorted
+                                     by date before writing.
+
+        Returns:
+            dict: The index entry of the ticker.
+        """
+        data = data.sort_values('Date')
+        dates = pd.DatetimeIndex(data['Date'])
+        tz = str(dates.tz) if dates.tz is not None else None
+        utc = (dates.tz_convert('UTC').tz_localize(None) if tz else dates).as_unit('ns')
+        ticker_dir = os.path.join(self.root, ticker)
+        os.makedirs(ticker_dir, exist_ok=True)
+        columns = {'Date': utc.asi8}
+        for column in data.columns:
+            if column != 'Date' and pd.api.types.is_numeric_dtype(data[column]):
+                columns[column] = data[column].to_numpy(dtype=np.float64)
+        for column, values in columns.items():
+            # Write aside and rename, so readers never map a half-written file
+            temporary = os.path.join(ticker_dir, f"{column}.tmp.npy")
+            np.save(temporary, values)
+            os.replace(temporary, os.path.join(ticker_dir, f"{column}.npy"))
+        local = dates.sort_values()
+        entry = {'start': local[0].isoformat() if len(local) else None,
+                 'end': local[-1].isoformat() if len(local) else None,
+                 'rows': len(local), 'tz': tz, 'columns': list(columns)}
+        with self._lock:
+            index = dict(self.index())
+            index[ticker] = entry
+            temporary = f"{self._index_path}.tmp"
+            with open(temporary, 'w', encoding='utf-8') as file:
+                json.dump(index, file, indent=1)
+            os.replace(temporary, self._index_path)
+        return entry
+
+    @staticmethod
+    def _utc_ns(bound, tz):
+        bound = pd.Timestamp(bound)
+        if bound.tzinfo is None and tz:
+            bound = bound.tz_localize(tz, ambiguous=False, nonexistent='shift_forward')
+        return (bound.tz_convert('UTC').tz_localize(None) if bound.tzinfo else bound).as_unit('ns').value
+
+    def load_arrays(self, ticker, start=None, end=None, columns=None):
+        """
+        Map the columns of a ticker and cut them to [start, end).
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            start, end (optional): Bounds of the half-open date range, open when None. Naive bounds are exchange-local
+                                   wall time, like the range of `QuoteStore.load`.
+            columns (list, optional): The columns to map, all by default. 'Date' is always included.
+
+        Returns:
+            dict: {column: read-only numpy view}, with 'Date' as datetime64[ns] in UTC.
+
+        Raises:
+            LookupError: If the ticker is not in the store.
+        """
+        entry = self.index().get(ticker)
+        if entry is None:
+            raise LookupError(f"{ticker} is not in the memory-mapped store")
+        ticker_dir = os.path.join(self.root, ticker)
+        dates = np.load(os.path.join(ticker_dir, "Date.npy"), mmap_mode='r')
+        position = lambda bound: int(np.searchsorted(dates, self._utc_ns(bound, entry['tz']), side='left'))
+        first = 0 if start is None else position(start)
+        last = len(dates) if end is None else position(end)
+        arrays = {'Date': dates[first:last].view('datetime64[ns]')}
+        for column in columns or entry['columns']:
+            if column != 'Date':
+                arrays[column] = np.load(os.path.join(ticker_dir, f"{column}.npy"), mmap_mode='r')[first:last]
+        return arrays
+
+    def load(self, ticker, start=None, end=None, columns=None):
+        """
+        Load a ticker as a quotes frame shaped like the output of `fetch_stock_data`.
+
+        The numeric columns are zero-copy views of the mapped files; only the 'Date' column is materialized to
+        restore the timezone.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            start, end (optional): Bounds of the half-open date range, see `load_arrays`.
+            columns (list, optional): The columns to load, all by default.
+
+        Returns:
+            pandas.DataFrame: The quotes with a 'Date' column.
+
+        Raises:
+            LookupError: If the ticker is not in the store.
+        """
+        arrays = self.load_arrays(ticker, start, end, columns)
+        tz = self.index()[ticker]['tz']
+        dates = pd.DatetimeIndex(arrays['Date'])
+        arrays['Date'] = dates.tz_localize('UTC').tz_convert(tz) if tz else dates
+        return pd.DataFrame(arrays, copy=False)
@@ -0,0 +1,99 @@
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from rich.table import Table
+from tools import console
+
+
+class StageRecord:
+    """
+    Measurements of one pipeline stage. `rows` is set by the caller inside the stage.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_mb = None
+        self.rows = None
+
+    def to_dict(self):
+        return {'stage': self.name, 'wall_s': round(self.wall_s, 6), 'cpu_s': round(self.cpu_s, 6),
+                'peak_mb': None if self.peak_mb is None else round(self.peak_mb, 3), 'rows': self.rows}
+
+
+class StageProfiler:
+    """
+    Records wall time, CPU time, peak memory and row counts of the stages of a run.
+
+    Every finished stage is logged as one JSON event ({"event": "stage", "stage": ..., "wall_s": ..., ...}), and
+    `print_summary` shows all stages as a table at the end of the run.
+
+    Peak memory is measured with `tracemalloc`, which slows allocation-heavy code down; pass trace_memory=False to
+    record times only. With `cprofile_dir` set, every stage also runs under cProfile and its statistics are dumped
+    to '<cprofile_dir>/<stage>.prof' (open them with `python -m pstats` or snakeviz).
+
+    Attributes:
+        records (list): The StageRecord of every finished stage, in order.
+    """
+    def __init__(self, logger=None, trace_memory=True, cprofile_dir=None):
+        self.logger = logger
+        self.trace_memory = trace_memory
+        self.cprofile_dir = cprofile_dir
+        self.records = []
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Measure the code inside the `with` block as the stage `name`.
+
+        Example:
+            with profiler.stage("fetch") as stage:
+                data = fetch_stock_data(logger, ticker, period)
+                stage.rows = len(data)
+        """
+        record = StageRecord(name)
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        profile = cProfile.Profile() if self.cprofile_dir else None
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profile:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile:
+                profile.disable()
+            record.wall_s = time.perf_counter() - wall
+            record.cpu_s = time.process_time() - cpu
+            if self.trace_memory:
+                record.peak_mb = max(tracemalloc.get_traced_memory()[1] - baseline, 0) / 2 ** 20
+                if started_tracing:
+                    tracemalloc.stop()
+            if profile:
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                profile.dump_stats(os.path.join(self.cprofile_dir, f"{name}.prof"))
+            self.records.append(record)
+            if self.logger:
+                self.logger.info(json.dumps({'event': 'stage', **record.to_dict()}))
+
+    def print_summary(self):
+        """
+        Print the recorded stages and their total as a table.
+        """
+        table = Table(title="Stage timings", header_style="#00a400 bold")
+        for column in ("Stage", "Wall, s", "CPU, s", "Peak memory, MB", "Rows"):
+            table.add_column(column, justify="left" if column == "Stage" else "right")
+        for record in self.records:
+            table.add_row(record.name, f"{record.wall_s:.3f}", f"{record.cpu_s:.3f}",
+                          "-" if record.peak_mb is None else f"{record.peak_mb:.2f}",
+                          "-" if record.rows is None else str(record.rows))
+        table.add_row("total", f"{sum(r.wall_s for r in self.records):.3f}",
+                      f"{sum(r.cpu_s for r in self.records):.3f}", "", "")
+        console.print(table)
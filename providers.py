@@ -0,0 +1,310 @@
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from quote_store import period_range
+from tools import path, lazy_import
+
+# Loaded on the first request: offline providers and store hits never need them
+requests = lazy_import('requests')
+yf = lazy_import('yfinance')
+
+
+def transient_errors():
+    """
+    Errors worth retrying: network failures and Yahoo throttling.
+    """
+    return (requests.RequestException, ConnectionError, TimeoutError) + tuple(
+        error for error in [getattr(getattr(yf, 'exceptions', None), 'YFRateLimitError', None)] if error)
+
+
+# pandas frequencies of the supported intraday intervals
+INTRADAY_FREQ = {'1m': '1min', '2m': '2min', '5m': '5min', '15m': '15min', '30m': '30min', '60m': '60min',
+                 '90m': '90min', '1h': '60min'}
+
+# Longest range Yahoo Finance serves in one request, per interval
+INTERVAL_WINDOWS = {'1m': pd.Timedelta(days=7),
+                    '2m': pd.Timedelta(days=59),
+                    '5m': pd.Timedelta(days=59),
+                    '15m': pd.Timedelta(days=59),
+                    '30m': pd.Timedelta(days=59),
+                    '60m': pd.Timedelta(days=729),
+                    '90m': pd.Timedelta(days=59),
+                    '1h': pd.Timedelta(days=729)}
+
+
+def split_range(start, end, window):
+    """
+    Split [start, end) into consecutive half-open windows no longer than `window`. An empty range has no windows.
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if start >= end:
+        return []
+    if window is None:
+        return [(start, end)]
+    edges = list(pd.date_range(start, end, freq=window))
+    if edges[-1] < end:
+        edges.append(end)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def fetch_range(provider, ticker, start, end, interval='1d', max_workers=4):
+    """
+    Fetch [start, end) in provider-sized windows in parallel and merge them into one frame.
+
+    The range is split according to INTERVAL_WINDOWS, the windows are requested concurrently, and the results are
+    concatenated, de-duplicated (the last copy of a timestamp wins) and sorted by time.
+
+    Args:
+        provider: The data provider.
+        ticker (str): The stock ticker symbol.
+        start, end (datetime): The half-open range to fetch.
+        interval (str): The bar interval, e.g. '1d', '1h', '5m' or '1m'.
+        max_workers (int): The maximum number of concurrent window requests.
+
+    Returns:
+        pandas.DataFrame: The bars of the whole range indexed by timestamp; empty when start is not before end.
+    """
+    windows = split_range(start, end, INTERVAL_WINDOWS.get(interval))
+    if not windows:
+        return pd.DataFrame()
+    fetch = lambda window: provider.history(ticker, start=window[0].to_pydatetime(), end=window[1].to_pydatetime(),
+                                            interval=interval)
+    if len(windows) == 1:
+        return fetch(windows[0])
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(windows))) as pool:
+        chunks = [chunk for chunk in pool.map(fetch, windows) if chunk is not None and not chunk.empty]
+    if not chunks:
+        return pd.DataFrame()
+    data = pd.concat(chunks)
+    return data[~data.index.duplicated(keep='last')].sort_index()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens refill at `rate` per second up to `capacity`; every request takes one. A caller that finds the bucket
+    empty reserves the next token and sleeps until it is due, outside the lock, so concurrent callers queue up
+    fairly and the long-run request rate never exceeds `rate`.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum burst size.
+    """
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token, sleeping until it is available. Returns the seconds waited.
+        """
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+class YahooProvider:
+    """
+    Data provider backed by Yahoo Finance through the `yfinance` library.
+
+    Every provider exposes `history(ticker, **kwargs)` with the keyword arguments of `yfinance.Ticker.history`
+    (period, start, end, interval) and returns a DataFrame indexed by date, so the fetch layer can be swapped
+    for an offline implementation in tests and benchmarks.
+
+    All requests share one HTTP session with a connection pool, pass through a token bucket limiting the request
+    rate, and are retried with exponential backoff and jitter on network errors and throttling.
+
+    Attributes:
+        limiter (TokenBucket): The rate limiter shared by all threads using this provider.
+        retries (int): Number of retries after the first failed attempt.
+        backoff (float): Delay before the first retry in seconds; doubled for every further retry.
+        max_backoff (float): Upper bound of a single retry delay.
+    """
+    def __init__(self, rate=5.0, burst=10, retries=4, backoff=0.5, max_backoff=30.0, pool_size=16, session=None,
+                 sleep=time.sleep, retry_on=None):
+        self.limiter = TokenBucket(rate, burst, sleep=sleep)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self.sleep = sleep
+        self.retry_on = retry_on
+        self._session = session
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                self._session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                self._session.mount("https://", adapter)
+                self._session.mount("http://", adapter)
+            return self._session
+
+    def _request(self, ticker, **kwargs):
+        return yf.Ticker(ticker, session=self.session).history(**kwargs)
+
+    def history(self, ticker, **kwargs):
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                return self._request(ticker, **kwargs)
+            except self.retry_on or transient_errors():
+                if attempt == self.retries:
+                    raise
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                self.sleep(delay * random.uniform(0.5, 1.0))
+
+
+_default_provider = None
+_default_lock = threading.Lock()
+
+
+def default_provider():
+    """
+    The YahooProvider shared by every fetch that does not pass its own provider, so they share one session and one
+    rate limit.
+    """
+    global _default_provider
+    with _default_lock:
+        if _default_provider is None:
+            _default_provider = YahooProvider()
+        return _default_provider
+
+
+def _request_key(ticker, kwargs):
+    """
+    A file-name-safe key identifying one history request.
+    """
+    described = "|".join(f"{name}={kwargs[name]}" for name in sorted(kwargs) if kwargs[name] is not None)
+    digest = hashlib.sha1(described.encode()).hexdigest()[:12]
+    return f"{re.sub(r'[^A-Za-z0-9.^=-]', '_', ticker)}_{kwargs.get('interval') or '1d'}_{digest}"
+
+
+class ReplayProvider:
+    """
+    Data provider serving recorded responses from local Parquet files.
+
+    Each request (ticker and keyword arguments) maps to one file in `directory`. When a `source` provider is given,
+    missing responses are fetched from it and recorded, so a run against the real provider can be replayed offline
+    later; without a source a missing response raises LookupError.
+
+    Attributes:
+        directory (str): Where the recorded responses are stored. Defaults to 'replay' within the script's directory.
+        source (optional): The provider to record from.
+    """
+    def __init__(self, directory=None, source=None):
+        self.directory = directory or os.path.join(path, "replay")
+        self.source = source
+
+    def history(self, ticker, **kwargs):
+        file_path = os.path.join(self.directory, f"{_request_key(ticker, kwargs)}.parquet")
+        if os.path.exists(file_path):
+            return pd.read_parquet(file_path)
+        if self.source is None:
+            raise LookupError(f"No recorded response for {ticker} {kwargs}")
+        data = self.source.history(ticker, **kwargs)
+        os.makedirs(self.directory, exist_ok=True)
+        data.to_parquet(file_path)
+        return data
+
+
+class FakeProvider:
+    """
+    In-memory offline data provider for tests.
+
+    By default it produces deterministic synthetic daily bars: prices depend only on the ticker symbol and the date,
+    so the same ticker always gets the same history. Frames passed in `frames` are served instead for their tickers,
+    cut to the requested range.
+
+    Attributes:
+        delay (float): Seconds to sleep per request, simulating network latency.
+        fail (set): Tickers for which `history` raises a ConnectionError.
+        frames (dict): {ticker: DataFrame} served instead of synthetic bars.
+        max_window (dict): {interval: timedelta} - requests spanning a longer range raise ValueError, like Yahoo does.
+        calls (list): (ticker, kwargs) of every request received.
+    """
+    def __init__(self, delay=0.0, fail=(), tz='America/New_York', frames=None, max_window=None):
+        self.delay = delay
+        self.fail = set(fail)
+        self.tz = tz
+        self.frames = frames or {}
+        self.max_window = max_window or {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def history(self, ticker, period=None, start=None, end=None, interval='1d'):
+        with self._lock:
+            self.calls.append((ticker, {'period': period, 'start': start, 'end': end, 'interval': interval}))
+        if self.delay:
+            time.sleep(self.delay)
+        if ticker in self.fail:
+            raise ConnectionError(f"Fake provider refused {ticker}")
+        if period is not None:
+            start, end, tail = period_range(period)
+        else:
+            tail = None
+        limit = self.max_window.get(interval)
+        if limit is not None and pd.Timestamp(end) - pd.Timestamp(start) > limit:
+            raise ValueError(f"{interval} data can only be requested in windows of {limit}")
+        if ticker in self.frames:
+            data = self.frames[ticker]
+            wall = data.index.tz_localize(None) if data.index.tz is not None else data.index
+            data = data[(wall >= pd.Timestamp(start)) & (wall < pd.Timestamp(end))]
+        else:
+            data = synthetic_history(ticker, start, end, tz=self.tz, interval=interval)
+        return data.tail(tail) if tail else data
+
+
+def synthetic_history(ticker, start, end, tz='America/New_York', interval='1d'):
+    """
+    Build a yfinance-shaped OHLCV frame for the business days of [start, end).
+
+    Daily bars are indexed by 'Date'; intraday bars by 'Datetime' and cover the regular session from 9:30 to 16:00.
+    Prices are a deterministic function of the ticker and the timestamp, so overlapping ranges agree with each other.
+    """
+    days = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end), freq='B', inclusive='left').as_unit('ns')
+    if interval in INTRADAY_FREQ:
+        step = pd.Timedelta(INTRADAY_FREQ[interval])
+        offsets = pd.timedelta_range(pd.Timedelta(hours=9, minutes=30), pd.Timedelta(hours=16), freq=step,
+                                     closed='left').as_unit('ns')
+        stamps = (days.asi8[:, None] + offsets.asi8[None, :]).ravel()
+        dates = pd.DatetimeIndex(stamps, name='Datetime')
+        dates = dates[(dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end))]
+        units = (dates.asi8 // 60_000_000_000 / (24 * 60)).astype(float)
+    else:
+        dates = days.rename('Date')
+        units = (dates.asi8 // 86_400_000_000_000).astype(float)
+    seed = zlib.crc32(ticker.encode())
+    noise = np.sin(units * 0.7 + seed % 97) + 0.5 * np.sin(units * 0.05 + seed % 13)
+    close = 50 + seed % 200 + noise * (5 + seed % 7)
+    data = pd.DataFrame({'Open': close - 0.5 * noise,
+                         'High': close + 1.0,
+                         'Low': close - 1.0,
+                         'Close': close,
+                         'Volume': 1_000_000.0 + (units.astype(np.int64) % 10) * 1000,
+                         'Dividends': 0.0,
+                         'Stock Splits': 0.0}, index=dates)
+    if tz:
+        data.index = data.index.tz_localize(tz)
+    return data
@@ -0,0 +1,277 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+from tools import path
+
+
+# Columns persisted for every bar, in the order yfinance returns them
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+# Preset periods expressed as calendar offsets back from today
+PERIOD_OFFSETS = {'1mo': pd.DateOffset(months=1),
+                  '3mo': pd.DateOffset(months=3),
+                  '6mo': pd.DateOffset(months=6),
+                  '1y': pd.DateOffset(years=1),
+                  '2y': pd.DateOffset(years=2),
+                  '5y': pd.DateOffset(years=5),
+                  '10y': pd.DateOffset(years=10)
+                  }
+
+# Presets counted in trading bars rather than calendar days
+PERIOD_BARS = {'1d': 1, '5d': 5}
+
+MAX_START = pd.Timestamp('1900-01-01')
+
+# Tickers bound per query, well below SQLite's limit of host parameters
+QUERY_TICKERS = 500
+
+
+def period_range(period, today=None):
+    """
+    Translate a preset period or a custom [start, end] list into a concrete date range.
+
+    Presets like '1mo' or '5y' are counted back from today. The day presets ('1d', '5d') mean the last N trading
+    bars, so the range is widened to cover weekends and holidays and the caller is told how many bars to keep.
+
+    Args:
+        period (str | list): A preset period code (e.g., '1mo', '5y', 'ytd', 'max') or a list of two dates
+                             in 'dd.mm.yyyy' format.
+        today (datetime, optional): The reference date. Defaults to the current date.
+
+    Returns:
+        tuple: (start, end, tail) where start and end are naive pandas.Timestamp values delimiting the half-open
+               range [start, end), and tail is the number of trailing bars to keep or None.
+    """
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    if isinstance(period, list):
+        start = datetime.strptime(period[0], "%d.%m.%Y")
+        end = datetime.strptime(period[1], "%d.%m.%Y")
+        return pd.Timestamp(start - timedelta(days=1)), pd.Timestamp(end + timedelta(days=1)), None
+    end = today + pd.Timedelta(days=1)
+    if period in PERIOD_BARS:
+        bars = PERIOD_BARS[period]
+        return today - pd.Timedelta(days=bars * 2 + 7), end, bars
+    if period == 'ytd':
+        return today.replace(month=1, day=1), end, None
+    if period == 'max':
+        return MAX_START, end, None
+    return today - PERIOD_OFFSETS[period], end, None
+
+
+def _ns(timestamp):
+    return pd.Timestamp(timestamp).value
+
+
+class QuoteStore:
+    """
+    An on-disk SQLite store of OHLCV bars keyed by ticker and interval.
+
+    Besides the bars themselves the store keeps track of which date ranges have already been requested from the
+    provider, so repeated requests only fetch the missing pieces. Ranges that reach today are recorded as covered
+    up to the start of today only, which makes the current (still changing) bar be re-fetched on every request.
+
+    Timestamps are stored as exchange-local wall time in nanoseconds; the timezone of each series is kept
+    separately and restored on load.
+
+    Attributes:
+        db_path (str): Path to the SQLite database file.
+        hits (int): Number of requests served entirely from the store.
+        misses (int): Number of missing ranges that had to be fetched from the provider.
+        rows_served (int): Number of bars returned to callers.
+        rows_fetched (int): Number of bars received from the provider.
+    """
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(path, "store", "quotes.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.rows_served = 0
+        self.rows_fetched = 0
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        columns = ", ".join(f'"{column}" REAL' for column in BAR_COLUMNS)
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS bars (ticker TEXT, interval TEXT, ts INTEGER, {columns}, "
+                               f"PRIMARY KEY (ticker, interval, ts))")
+            # Cross-sectional reads (load_column over every ticker) scan by interval and date
+            self._conn.execute("CREATE INDEX IF NOT EXISTS bars_interval_ts ON bars (interval, ts)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS coverage (ticker TEXT, interval TEXT, "
+                               "start INTEGER, end INTEGER)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS series (ticker TEXT, interval TEXT, tz TEXT, "
+                               "index_name TEXT, PRIMARY KEY (ticker, interval))")
+
+    def close(self):
+        self._conn.close()
+
+    def coverage(self, ticker, interval='1d'):
+        """
+        Return the merged date ranges already fetched for a ticker and interval.
+
+        Returns:
+            list: A sorted list of (start, end) naive pandas.Timestamp tuples.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT start, end FROM coverage WHERE ticker=? AND interval=? ORDER BY start",
+                                      (ticker, interval)).fetchall()
+        return [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in rows]
+
+    def missing_ranges(self, ticker, interval, start, end):
+        """
+        Return the parts of [start, end) that are not covered by the store yet.
+
+        Returns:
+            list: A sorted list of (start, end) naive pandas.Timestamp tuples.
+        """
+        gaps = []
+        cursor = pd.Timestamp(start)
+        end = pd.Timestamp(end)
+        for covered_start, covered_end in self.coverage(ticker, interval):
+            if covered_end <= cursor:
+                continue
+            if covered_start >= end:
+                break
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start))
+            cursor = max(cursor, covered_end)
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def save(self, ticker, interval, data, start, end):
+        """
+        Merge fetched bars into the store and mark [start, end) as covered.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            interval (str): The bar interval, e.g. '1d'.
+            data (pandas.DataFrame): Bars indexed by (optionally timezone-aware) timestamps, as returned by yfinance.
+            start, end (pandas.Timestamp): The naive range that was requested from the provider.
+        """
+        end = min(pd.Timestamp(end), pd.Timestamp(datetime.now()).normalize())
+        with self._lock, self._conn:
+            if data is not None and not data.empty:
+                index = data.index
+                tz = str(index.tz) if getattr(index, 'tz', None) is not None else None
+                wall = index.tz_localize(None) if tz else index
+                self._conn.execute("INSERT OR IGNORE INTO series VALUES (?, ?, ?, ?)",
+                                   (ticker, interval, tz, index.name or 'Date'))
+                frame = data.reindex(columns=BAR_COLUMNS).astype(float)
+                rows = [(ticker, interval, int(ts), *values)
+                        for ts, values in zip(wall.as_unit("ns").asi8, frame.itertuples(index=False, name=None))]
+                placeholders = ", ".join("?" * (len(BAR_COLUMNS) + 3))
+                self._conn.executemany(f"INSERT OR REPLACE INTO bars VALUES ({placeholders})", rows)
+            if end > start:
+                self._add_coverage(ticker, interval, _ns(start), _ns(end))
+
+    def _add_coverage(self, ticker, interval, start, end):
+        rows = self._conn.execute("SELECT start, end FROM coverage WHERE ticker=? AND interval=? "
+                                  "AND end>=? AND start<=?", (ticker, interval, start, end)).fetchall()
+        for covered_start, covered_end in rows:
+            start = min(start, covered_start)
+            end = max(end, covered_end)
+        self._conn.execute("DELETE FROM coverage WHERE ticker=? AND interval=? AND end>=? AND start<=?",
+                           (ticker, interval, start, end))
+        self._conn.execute("INSERT INTO coverage VALUES (?, ?, ?, ?)", (ticker, interval, start, end))
+
+    def load(self, ticker, interval, start, end):
+        """
+        Read the stored bars of [start, end) in the same shape yfinance returns them.
+
+        Returns:
+            pandas.DataFrame: Bars indexed by timestamp, timezone restored when known. Empty if nothing is stored.
+        """
+        columns = ", ".join(f'"{column}"' for column in BAR_COLUMNS)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT ts, {columns} FROM bars WHERE ticker=? AND interval=? "
+                                      f"AND ts>=? AND ts<? ORDER BY ts",
+                                      (ticker, interval, _ns(start), _ns(end))).fetchall()
+            series = self._conn.execute("SELECT tz, index_name FROM series WHERE ticker=? AND interval=?",
+                                        (ticker, interval)).fetchone()
+        tz, index_name = series or (None, 'Date')
+        frame = pd.DataFrame([row[1:] for row in rows], columns=BAR_COLUMNS, dtype=float)
+        index = pd.to_datetime([row[0] for row in rows], unit='ns')
+        frame.index = index.tz_localize(tz) if tz else index
+        frame.index.name = index_name
+        return frame
+
+    def get(self, ticker, interval, start, end, fetch):
+        """
+        Serve [start, end) from the store, fetching only the missing ranges.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            interval (str): The bar interval, e.g. '1d'.
+            start, end (pandas.Timestamp): The naive half-open range to return.
+            fetch (callable): fetch(start, end) returning a yfinance-shaped DataFrame for a missing range.
+
+        Returns:
+            pandas.DataFrame: All stored bars of the requested range.
+        """
+        gaps = self.missing_ranges(ticker, interval, start, end)
+        with self._lock:
+            if not gaps:
+                self.hits += 1
+            self.misses += len(gaps)
+        for gap_start, gap_end in gaps:
+            data = fetch(gap_start.to_pydatetime(), gap_end.to_pydatetime())
+            if data is not None:
+                with self._lock:
+                    self.rows_fetched += len(data)
+            self.save(ticker, interval, data, gap_start, gap_end)
+        data = self.load(ticker, interval, start, end)
+        with self._lock:
+            self.rows_served += len(data)
+        return data
+
+    def tickers(self, interval='1d'):
+        """
+        Return the sorted tickers that have bars of the given interval in the store.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT ticker FROM series WHERE interval=? ORDER BY ticker",
+                                      (interval,)).fetchall()
+        return [row[0] for row in rows]
+
+    def load_column(self, interval, start, end, column='Close', tickers=None):
+        """
+        Read one column of many tickers as a wide date x ticker matrix with a single query.
+
+        Args:
+            interval (str): The bar interval, e.g. '1d'.
+            start, end (pandas.Timestamp): The naive half-open range to return.
+            column (str): One of BAR_COLUMNS.
+            tickers (list, optional): The tickers to read, all stored tickers by default.
+
+        Returns:
+            pandas.DataFrame: Values indexed by wall-time timestamp with one column per ticker; NaN where a ticker
+                              has no bar.
+        """
+        if column not in BAR_COLUMNS:
+            raise ValueError(f"Unknown bar column: {column}")
+        query = f'SELECT ticker, ts, "{column}" FROM bars WHERE interval=? AND ts>=? AND ts<?'
+        bounds = (interval, _ns(start), _ns(end))
+        with self._lock:
+            if tickers is None:
+                rows = self._conn.execute(query, bounds).fetchall()
+            else:
+                # Filtered by ticker in SQL, so only the requested tickers are read from the primary key
+                rows = []
+                tickers = list(dict.fromkeys(tickers))
+                for chunk in range(0, len(tickers), QUERY_TICKERS):
+                    batch = tickers[chunk:chunk + QUERY_TICKERS]
+                    rows += self._conn.execute(f"{query} AND ticker IN ({', '.join('?' * len(batch))})",
+                                               (*bounds, *batch)).fetchall()
+        frame = pd.DataFrame(rows, columns=['ticker', 'ts', column])
+        matrix = frame.pivot(index='ts', columns='ticker', values=column).astype(float)
+        matrix.index = pd.to_datetime(matrix.index, unit='ns')
+        matrix.index.name = 'Date'
+        matrix.columns.name = None
+        if tickers is not None:
+            matrix = matrix.reindex(columns=list(tickers))
+        return matrix
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'rows_served': self.rows_served, 'rows_fetched': self.rows_fetched}
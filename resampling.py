@@ -0,0 +1,166 @@
+import time
+import pandas as pd
+from indicator_engine import IndicatorEngine
+
+# pandas rules of the rollup levels, finest first. 'daily' is only built from intraday bars.
+LEVELS = {'daily': '1D', 'weekly': 'W-FRI', 'monthly': 'ME', 'quarterly': 'QE'}
+# Each level is rolled up from the finer level its periods nest in, or from the base when that level is not built
+SOURCES = {'weekly': 'daily', 'monthly': 'daily', 'quarterly': 'monthly'}
+# How the bars of a period are combined
+AGGREGATIONS = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum', 'Bars': 'sum'}
+
+
+def rollup(data, rule):
+    """
+    Aggregate OHLCV bars into periods of a pandas resampling rule.
+
+    Args:
+        data (pandas.DataFrame): Quotes with a 'Date' column, as returned by `fetch_stock_data`, or a finer rollup.
+        rule (str): The pandas rule, e.g. 'W-FRI' or 'ME'. Periods follow the exchange-local calendar of the dates.
+
+    Returns:
+        pandas.DataFrame: One row per period with trades, indexed by the period label ('Period'), with 'Date' set to
+                          the last bar of the period, the aggregated OHLCV columns and 'Bars', the number of bars.
+    """
+    frame = data.set_index('Date')
+    if 'Bars' not in frame.columns:
+        frame = frame.assign(Bars=1)
+    grouped = frame.resample(rule)
+    result = grouped.agg({column: how for column, how in AGGREGATIONS.items() if column in frame.columns})
+    result.insert(0, 'Date', pd.Series(frame.index, index=frame.index).resample(rule).last())
+    result.index.name = 'Period'
+    return result[result['Bars'] > 0]
+
+
+class ResamplingPyramid:
+    """
+    Weekly, monthly and quarterly rollups of one ticker's quotes with their indicators, for fast long-range views.
+
+    The base level is the quotes as given; every coarser level holds one row per period with the OHLCV rollup and
+    the MA, RSI and MACD of the rollup's closes. `select` picks the finest level that shows a date range within a
+    point budget, so a 10-year chart or analysis reads a few hundred weekly rows instead of thousands of daily or
+    hundreds of thousands of intraday bars.
+
+    Every level is rolled up from the finer level its periods nest in (weeks and months from days, quarters from
+    months), so `append` of new bars aggregates again only the last period of every level and the periods after it,
+    reading a few rows of the level below. The indicators are recomputed on the rollups, which are small next to the
+    base.
+
+    Attributes:
+        base (pandas.DataFrame): The quotes, with a 'Date' column, sorted by date.
+        levels (dict): {name: rollup frame}, finest first, without the base.
+        window_size (int): The MA window of the rollups.
+        engine (IndicatorEngine): Computes the indicators of the rollups; the caller's engine when given, else one
+                                  owned by the pyramid, so its memo is released with the pyramid.
+    """
+    def __init__(self, data, interval='1d', window_size=5, levels=None, engine=None):
+        self.window_size = window_size
+        self.engine = engine or IndicatorEngine(max_entries=64)
+        self.rules = {name: rule for name, rule in (levels or LEVELS).items()
+                      if not (name == 'daily' and interval in ('1d', '5d', '1wk', '1mo', '3mo'))}
+        self.base = data.sort_values('Date', ignore_index=True)
+        self.levels = {}
+        for name, rule in self.rules.items():
+            self.levels[name] = self._with_indicators(rollup(self._source(name), rule))
+
+    def _source(self, name):
+        return self.levels.get(SOURCES.get(name), self.base)
+
+    def _with_indicators(self, level):
+        for name, values in self.engine.compute(level, ('MA', 'RSI', 'MACD'), window_size=self.window_size).items():
+            level[name] = values
+        return level
+
+    def append(self, data):
+        """
+        Add new bars. Bars at or before the last base bar are ignored.
+
+        Args:
+            data (pandas.DataFrame): Quotes with a 'Date' column and the base columns.
+
+        Returns:
+            int: The number of rows aggregated again, over all levels.
+        """
+        new = data[data['Date'] > self.base['Date'].iloc[-1]].sort_values('Date') if len(self.base) else data
+        if new.empty:
+            return 0
+        self.base = pd.concat([self.base, new], ignore_index=True)
+        first = new['Date'].iloc[0]
+        touched = 0
+        for name, rule in self.rules.items():
+            level = self.levels[name]
+            # Periods before the one of the first new bar are complete and stay as they are
+            label = pd.Series([0], index=pd.DatetimeIndex([first])).resample(rule).last().index[0]
+            kept = level[level.index < label]
+            source = self._source(name)
+            tail = source.iloc[source['Date'].searchsorted(kept['Date'].iloc[-1], side='right'):] if len(kept) \
+                else source
+            touched += len(tail)
+            rolled = rollup(tail, rule)
+            self.levels[name] = self._with_indicators(pd.concat([kept[rolled.columns], rolled]))
+        return touched
+
+    def _bounds(self, frame, start, end):
+        dates = frame['Date']
+        tz = getattr(dates.dt, 'tz', None)
+
+        def position(bound, default):
+            if bound is None:
+                return default
+            bound = pd.Timestamp(bound)
+            if bound.tzinfo is None and tz is not None:
+                bound = bound.tz_localize(tz, ambiguous=False, nonexistent='shift_forward')
+            return int(dates.searchsorted(bound, side='left'))
+
+        return position(start, 0), position(end, len(frame))
+
+    def select(self, start=None, end=None, max_points=2000):
+        """
+        Return the finest level showing [start, end) in at most `max_points` rows.
+
+        Levels are tried from the base upwards; when even the coarsest level has more rows, the coarsest is returned.
+        The range is located by binary search, so only the selected rows are read.
+
+        Args:
+            start, end (optional): Bounds of the half-open date range, open when None. Naive bounds are exchange-local
+                                   wall time.
+            max_points (int): The point budget.
+
+        Returns:
+            tuple: (level name, frame), 'base' for the quotes as given.
+        """
+        candidates = [('base', self.base)] + list(self.levels.items())
+        for name, frame in candidates:
+            first, last = self._bounds(frame, start, end)
+            if last - first <= max_points or name == candidates[-1][0]:
+                return name, frame.iloc[first:last]
+
+    def stats(self):
+        return {'base': len(self.base), **{name: len(level) for name, level in self.levels.items()}}
+
+
+# Build the pyramid of a ticker, logging its size
+def build_pyramid(logger, data, interval='1d', window_size=5, engine=None):
+    """
+    Build a `ResamplingPyramid` of fetched quotes.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        data (pandas.DataFrame): Quotes with a 'Date' column, as returned by `fetch_stock_data`.
+        interval (str): The interval of the quotes; intraday quotes also get a daily level.
+        window_size (int): The MA window of the rollups.
+        engine (IndicatorEngine, optional): The engine computing the indicators of the rollups.
+
+    Returns:
+        ResamplingPyramid: The pyramid, or None if an error occurs.
+
+    Logs:
+        Logs a debug message with the rows of every level and the time taken, or if an error occurs.
+    """
+    try:
+        started = time.perf_counter()
+        pyramid = ResamplingPyramid(data, interval, window_size, engine=engine)
+        logger.debug("Resampling pyramid %s built in %.3fs", pyramid.stats(), time.perf_counter() - started)
+        return pyramid
+    except Exception as e:
+        logger.debug("Error building the resampling pyramid: %s", e)
@@ -0,0 +1,109 @@
+import time
+import numpy as np
+import pandas as pd
+from rich.table import Table
+from wide_indicators import rsi, macd, ewm_mean
+from tools import console, period_spell
+
+# Columns of the alert table returned by `screen`
+ALERT_COLUMNS = ['Ticker', 'Window', 'Fluctuation', 'RSI', 'RSI_extreme', 'MACD_cross', 'Alerts']
+
+
+def _last_position(mask):
+    """Row position of the last True value of every column of a 2-D mask (-1 where there is none)."""
+    positions = np.where(mask, np.arange(len(mask))[:, None], -1)
+    return positions.max(axis=0) if len(mask) else np.full(mask.shape[1], -1)
+
+
+def _latest_event(first, second, names):
+    """Name of the more recent of two events per column, '' when neither happened."""
+    first_at, second_at = _last_position(first), _last_position(second)
+    return np.where((first_at < 0) & (second_at < 0), '', np.where(first_at > second_at, names[0], names[1]))
+
+
+# Screen a whole universe for strong fluctuations, RSI extremes and MACD crossovers
+def screen(logger, close, windows=(5, 20), threshold=10.0, rsi_window=14, oversold=30.0, overbought=70.0,
+           signal_span=9):
+    """
+    Screen every ticker of a wide close-price matrix over the last rows of one or more windows.
+
+    For each window (a number of rows, e.g. trading days) three checks are evaluated for all tickers at once with
+    2-D array operations:
+
+    - fluctuation: (max - min) / min * 100 of the closes in the window exceeds `threshold`, as in
+      `notify_if_strong_fluctuations`;
+    - RSI extreme: the RSI reached `overbought` or `oversold` in the window (the more recent extreme is reported);
+    - MACD crossover: the MACD line crossed its signal line (an EMA of `signal_span` rows) in the window,
+      'bullish' when crossing upwards, 'bearish' when crossing downwards.
+
+    RSI and MACD are computed once over the whole matrix, so the history before the windows warms them up.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        close (pandas.DataFrame): Close prices indexed by date with one column per ticker, see
+                                  `QuoteStore.load_column` or `wide_indicators.close_matrix`.
+        windows (iterable): Window lengths in rows.
+        threshold (float): The fluctuation threshold in percent.
+        rsi_window (int): The RSI window.
+        oversold, overbought (float): The RSI extremes.
+        signal_span (int): The span of the MACD signal line.
+
+    Returns:
+        pandas.DataFrame: One row per ticker and window with at least one alert, columns ALERT_COLUMNS, ranked by
+                          the number of alerts and then by fluctuation. Returns None if an error occurs.
+
+    Logs:
+        Logs a debug message with the number of alerts and the time taken, or if an error occurs.
+    """
+    try:
+        started = time.perf_counter()
+        values = close.to_numpy(dtype=float)
+        tickers = np.asarray(close.columns, dtype=object)
+        rsi_values = rsi(values, rsi_window)
+        macd_values = macd(values)
+        signal = ewm_mean(macd_values, signal_span)
+        above = macd_values > signal
+        valid = ~np.isnan(macd_values) & ~np.isnan(signal)
+        # A crossover needs two consecutive valid rows, so a ticker's first bar is not one
+        both_valid = valid[1:] & valid[:-1]
+        crossed_up = np.zeros_like(above)
+        crossed_up[1:] = above[1:] & ~above[:-1] & both_valid
+        crossed_down = np.zeros_like(above)
+        crossed_down[1:] = ~above[1:] & above[:-1] & both_valid
+        tables = []
+        for window in windows:
+            recent = values[-window:]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                low = np.where(np.isnan(recent), np.inf, recent).min(axis=0)
+                high = np.where(np.isnan(recent), -np.inf, recent).max(axis=0)
+                fluctuation = (high - low) / low * 100
+            fluctuation[~np.isfinite(fluctuation)] = np.nan
+            recent_rsi = rsi_values[-window:]
+            extreme = _latest_event(recent_rsi >= overbought, recent_rsi <= oversold, ('overbought', 'oversold'))
+            cross = _latest_event(crossed_up[-window:], crossed_down[-window:], ('bullish', 'bearish'))
+            alerts = (fluctuation > threshold).astype(int) + (extreme != '') + (cross != '')
+            table = pd.DataFrame({'Ticker': tickers, 'Window': window, 'Fluctuation': fluctuation,
+                                  'RSI': rsi_values[-1], 'RSI_extreme': extreme, 'MACD_cross': cross,
+                                  'Alerts': alerts})
+            tables.append(table[table['Alerts'] > 0])
+        result = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=ALERT_COLUMNS)
+        result = result.sort_values(['Alerts', 'Fluctuation'], ascending=False, ignore_index=True)
+        logger.debug("Screened %s tickers over windows %s: %s alerts in %.3fs", close.shape[1], list(windows),
+                     len(result), time.perf_counter() - started)
+        return result
+    except Exception as e:
+        logger.debug("Error screening tickers: %s", e)
+
+
+def print_alerts(alerts, period, top=20):
+    """
+    Print the first `top` rows of a `screen` result as a table.
+    """
+    table = Table(title=f"Screener alerts for {period_spell(period)}", header_style="#00a400 bold")
+    for column in ALERT_COLUMNS:
+        table.add_column(column, justify="left" if column in ('Ticker', 'RSI_extreme', 'MACD_cross') else "right")
+    for row in alerts.head(top).itertuples(index=False):
+        table.add_row(row.Ticker, str(row.Window), f"{row.Fluctuation:.2f}%", f"{row.RSI:.1f}", row.RSI_extreme,
+                      row.MACD_cross, str(row.Alerts))
+    console.print(table)
+    console.print(f"[#00a400 bold]{len(alerts)} alerts in total[#00a400 bold]")
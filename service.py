@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+from artifact_cache import frame_fingerprint
+from batch import analyze_ticker
+from indicator_engine import IndicatorEngine
+from data_plotting import build_figure
+from log_manager import Logger
+from quote_store import QuoteStore
+from resampling import ResamplingPyramid
+from tools import period_spell, lazy_import
+
+offline = lazy_import('plotly.offline')
+
+# Columns returned by the /quotes and /indicators endpoints
+QUOTE_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+INDICATOR_COLUMNS = ['Date', 'Close', 'MA', 'RSI', 'MACD']
+# Maps exceptions of a computation to the HTTP status of the response
+ERROR_STATUS = [(LookupError, HTTPStatus.NOT_FOUND), (ValueError, HTTPStatus.BAD_REQUEST),
+                (ConnectionError, HTTPStatus.BAD_GATEWAY)]
+
+
+def _json_values(record):
+    # NaN (e.g. the deviation of a single bar) and infinities are not valid JSON, they are sent as null
+    return {name: None if isinstance(value, float) and not math.isfinite(value) else value
+            for name, value in record.items()}
+
+
+def _records(data, columns):
+    return data[[column for column in columns if column in data.columns]].to_json(orient='records',
+                                                                                 date_format='iso').encode()
+
+
+class QueryService:
+    """
+    A local asyncio HTTP service answering quote, indicator, summary and chart queries.
+
+    Endpoints (GET, query parameters ticker, period (a preset like '1mo', or start and end as dd.mm.yyyy),
+    interval and window):
+
+    - /quotes: the OHLCV bars as JSON records;
+    - /indicators: Date, Close, MA, RSI and MACD as JSON records; with points, the finest weekly, monthly or quarterly
+      rollup that fits that many records when the bars do not;
+    - /summary: the statistic indicators as a JSON object;
+    - /chart: the chart HTML (extra parameters theme and points, drawn from the rollup that fits the points); it
+      loads plotly.js from /plotly.min.js;
+    - /stats: the cache counters.
+
+    The event loop only parses requests and writes responses; fetching, the indicators, JSON encoding and chart
+    rendering run on a thread pool of `max_workers`. Every result is kept in an LRU cache of `cache_size` entries
+    keyed by endpoint, ticker, period and parameters, and the analysis a response is derived from is cached too, so
+    /summary after /indicators does not fetch again. So is the `ResamplingPyramid` of an analysis, which long-range
+    charts and point-limited indicator queries read instead of every bar. Cached results expire after `ttl` seconds
+    (None keeps them until evicted), so a long-running service picks up new bars. Identical requests arriving while
+    the result is being computed wait for that one computation instead of starting their own.
+
+    Attributes:
+        hits (int): Results served from the cache.
+        misses (int): Results computed.
+        coalesced (int): Requests that joined a computation already in flight.
+        engine (IndicatorEngine): Computes the indicators of every analysis of the service.
+    """
+    def __init__(self, logger, provider=None, store=None, max_workers=4, cache_size=128, ttl=300,
+                 clock=time.monotonic):
+        self.logger = logger
+        self.provider = provider
+        self.store = store
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.engine = IndicatorEngine()
+        self.server = None
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._cache = OrderedDict()
+        self._inflight = {}
+
+    async def _cached(self, key, compute, expire=True):
+        """
+        Return the cached result of `key`, joining or starting the computation `compute()` (a coroutine function).
+        The result expires after `ttl` seconds unless `expire` is False (results that never change).
+        """
+        if key in self._cache:
+            expires, result = self._cache[key]
+            if expires is None or self.clock() < expires:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return result
+            del self._cache[key]
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+        self.misses += 1
+        task = asyncio.ensure_future(compute())
+        self._inflight[key] = task
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            self._inflight.pop(key, None)
+        self._cache[key] = (self.clock() + self.ttl if expire and self.ttl is not None else None, result)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    async def _offload(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+
+    async def _analysis(self, ticker, period, interval, window):
+        return await self._cached(('analysis', ticker, str(period), interval, window),
+                                  lambda: self._offload(analyze_ticker, self.logger, ticker, period, self.provider,
+                                                        self.store, window, interval, False, self.engine))
+
+    async def _pyramid(self, data, ticker, period, interval, window):
+        # Keyed by the content of the bars, so a refreshed analysis with new bars gets a new pyramid
+        data_id = await self._offload(frame_fingerprint, data)
+        return await self._cached(('pyramid', ticker, str(period), interval, window, data_id),
+                                  lambda: self._offload(ResamplingPyramid, data, interval, window), expire=False)
+
+    async def query(self, endpoint, params):
+        """
+        Answer one query.
+
+        Args:
+            endpoint (str): The path, e.g. '/indicators'.
+            params (dict): The query parameters, {name: value}.
+
+        Returns:
+            tuple: (content type, body bytes).
+
+        Raises:
+            LookupError: For an unknown endpoint or ticker.
+            ValueError: For missing or invalid parameters.
+        """
+        if endpoint == '/stats':
+            return 'application/json', json.dumps(self.stats()).encode()
+        if endpoint == '/plotly.min.js':
+            return 'text/javascript', await self._cached(('plotly.js',),
+                                                         lambda: self._offload(lambda: offline.get_plotlyjs().encode()),
+                                                         expire=False)
+        if endpoint not in ('/quotes', '/indicators', '/summary', '/chart'):
+            raise LookupError(f"Unknown endpoint {endpoint}")
+        ticker = params.get('ticker', '').upper()
+        if not ticker:
+            raise ValueError("The ticker parameter is required")
+        period = [params['start'], params['end']] if 'start' in params and 'end' in params else \
+            params.get('period', '1mo')
+        try:
+            period_spell(period)
+        except KeyError:
+            raise ValueError(f"Unknown period {period}")
+        interval = params.get('interval', '1d')
+        window = int(params.get('window', 5))
+        theme = params.get('theme', 'plotly')
+        points = int(params.get('points', 2000)) if endpoint == '/chart' or 'points' in params else None
+
+        async def compute():
+            data, summary = await self._analysis(ticker, period, interval, window)
+            if points is not None and endpoint in ('/indicators', '/chart'):
+                pyramid = await self._pyramid(data, ticker, period, interval, window)
+                _, data = pyramid.select(max_points=points)
+            if endpoint == '/quotes':
+                return 'application/json', await self._offload(_records, data, QUOTE_COLUMNS)
+            if endpoint == '/indicators':
+                return 'application/json', await self._offload(_records, data, INDICATOR_COLUMNS)
+            if endpoint == '/summary':
+                return 'application/json', json.dumps(_json_values({'ticker': ticker, **summary}), allow_nan=False).encode()
+            render = lambda: build_figure(data, period, summary, theme, max_points=points, webgl=True).to_html(
+                include_plotlyjs='/plotly.min.js').encode()
+            return 'text/html', await self._offload(render)
+
+        extra = (theme, points) if endpoint == '/chart' else (points,) if endpoint == '/indicators' else ()
+        return await self._cached((endpoint, ticker, str(period), interval, window) + extra, compute)
+
+    async def _handle(self, reader, writer):
+        started = time.perf_counter()
+        status, content_type, body = HTTPStatus.OK, 'application/json', b''
+        request_line = []
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()).strip():
+                pass
+            if len(request_line) < 2 or request_line[0] != 'GET':
+                raise NotImplementedError("Only GET requests are supported")
+            url = urlsplit(request_line[1])
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            content_type, body = await self.query(url.path, params)
+        except NotImplementedError as e:
+            status, body = HTTPStatus.METHOD_NOT_ALLOWED, json.dumps({'error': str(e)}).encode()
+        except Exception as e:
+            status = next((code for error, code in ERROR_STATUS if isinstance(e, error)),
+                          HTTPStatus.INTERNAL_SERVER_ERROR)
+            content_type, body = 'application/json', json.dumps({'error': str(e)}).encode()
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+        self.logger.debug("%s %s in %.3fs", status.value, request_line[1] if len(request_line) > 1 else '-',
+                          time.perf_counter() - started)
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """
+        Start listening. Pass port=0 to pick a free port; the bound port is returned.
+        """
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        self._pool.shutdown(wait=False)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced, 'entries': len(self._cache)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="StockScope query service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--cache-size", type=int, default=128)
+    parser.add_argument("--ttl", type=float, default=300, help="seconds a cached result is served before refreshing")
+    parser.add_argument("--store", action="store_true", help="keep fetched bars in the local quote store")
+    args = parser.parse_args(argv)
+
+    logger = Logger(use_queue=True)
+    service = QueryService(logger.get_function_logger(), store=QuoteStore() if args.store else None,
+                           max_workers=args.workers, cache_size=args.cache_size, ttl=args.ttl)
+
+    async def serve():
+        port = await service.start(args.host, args.port)
+        logger.get_main_logger().info(f"Serving on http://{args.host}:{port}")
+        try:
+            await service.server.serve_forever()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        logger.get_main_logger().info("Stop\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import math
+
+
+class _RunningWindow:
+    """
+    A fixed-size ring buffer of floats with a compensated (Kahan) running sum of its valid values.
+
+    NaN values occupy a slot but are left out of the sum and the count, like pandas rolling windows do. When the
+    window holds no non-zero value the sum is reset to exactly zero, so rounding residue never survives a window.
+    """
+    def __init__(self, window):
+        self.window = window
+        self.values = []
+        self.position = 0
+        self.total = 0.0
+        self.compensation = 0.0
+        self.count = 0
+        self.nonzero = 0
+
+    def _add(self, value):
+        y = value - self.compensation
+        t = self.total + y
+        self.compensation = (t - self.total) - y
+        self.total = t
+
+    def push(self, value):
+        if len(self.values) < self.window:
+            self.values.append(value)
+        else:
+            old = self.values[self.position]
+            self.values[self.position] = value
+            self.position = (self.position + 1) % self.window
+            if not math.isnan(old):
+                self._add(-old)
+                self.count -= 1
+                self.nonzero -= old != 0
+        if not math.isnan(value):
+            self._add(value)
+            self.count += 1
+            self.nonzero += value != 0
+        if self.nonzero == 0:
+            self.total = self.compensation = 0.0
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, state):
+        window = cls(state['window'])
+        vars(window).update(state)
+        window.values = list(state['values'])
+        return window
+
+
+class StreamingMA:
+    """
+    Simple moving average of close prices updated one bar at a time.
+
+    Equivalent to `add_moving_average`: NaN until `window_size` valid prices are in the window.
+    Each update costs O(1) regardless of the length of the history.
+    """
+    def __init__(self, window_size=5):
+        self.window_size = window_size
+        self._window = _RunningWindow(window_size)
+
+    def update(self, close):
+        self._window.push(float(close))
+        if self._window.count < self.window_size:
+            return math.nan
+        return self._window.total / self._window.count
+
+    def to_dict(self):
+        return {'window_size': self.window_size, 'window': self._window.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state):
+        indicator = cls(state['window_size'])
+        indicator._window = _RunningWindow.from_dict(state['window'])
+        return indicator
+
+
+class StreamingRSI:
+    """
+    Relative Strength Index updated one bar at a time.
+
+    Equivalent to `calculate_rsi`: simple rolling means of gains and losses over `window` bars with min_periods=1.
+    """
+    def __init__(self, window=14):
+        self.window = window
+        self.previous = math.nan
+        self._gains = _RunningWindow(window)
+        self._losses = _RunningWindow(window)
+
+    def update(self, close):
+        close = float(close)
+        delta = close - self.previous
+        self.previous = close
+        # NaN deltas count as no change, as in calculate_rsi
+        self._gains.push(delta if delta > 0 else 0.0)
+        self._losses.push(-delta if delta < 0 else 0.0)
+        gain, loss = self._gains.total, self._losses.total
+        if loss == 0:
+            return math.nan if gain == 0 else 100.0
+        return 100 - (100 / (1 + gain / loss))
+
+    def to_dict(self):
+        return {'window': self.window, 'previous': self.previous,
+                'gains': self._gains.to_dict(), 'losses': self._losses.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state):
+        indicator = cls(state['window'])
+        indicator.previous = state['previous']
+        indicator._gains = _RunningWindow.from_dict(state['gains'])
+        indicator._losses = _RunningWindow.from_dict(state['losses'])
+        return indicator
+
+
+class StreamingEMA:
+    """
+    Exponential moving average with the recursion of `pandas.Series.ewm(span=span, adjust=False).mean()`.
+    """
+    def __init__(self, span):
+        self.span = span
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = math.nan
+        self.old_weight = 1.0
+
+    def update(self, close):
+        close = float(close)
+        if math.isnan(self.value):
+            self.value = close
+            return self.value
+        self.old_weight *= 1.0 - self.alpha
+        if not math.isnan(close):
+            if self.value != close:
+                self.value = (self.old_weight * self.value + self.alpha * close) / (self.old_weight + self.alpha)
+            self.old_weight = 1.0
+        return self.value
+
+    def to_dict(self):
+        return {'span': self.span, 'value': self.value, 'old_weight': self.old_weight}
+
+    @classmethod
+    def from_dict(cls, state):
+        indicator = cls(state['span'])
+        indicator.value = state['value']
+        indicator.old_weight = state['old_weight']
+        return indicator
+
+
+class StreamingMACD:
+    """
+    MACD (short EMA minus long EMA) updated one bar at a time, equivalent to `calculate_macd`.
+    """
+    def __init__(self, short=12, long=26):
+        self.short = StreamingEMA(short)
+        self.long = StreamingEMA(long)
+
+    def update(self, close):
+        return self.short.update(close) - self.long.update(close)
+
+    def to_dict(self):
+        return {'short': self.short.to_dict(), 'long': self.long.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state):
+        indicator = cls()
+        indicator.short = StreamingEMA.from_dict(state['short'])
+        indicator.long = StreamingEMA.from_dict(state['long'])
+        return indicator
+
+
+class StreamingIndicators:
+    """
+    The MA, RSI and MACD of one ticker kept up to date bar by bar.
+
+    The state is a plain dict (`to_dict`) that can be stored as JSON, so a refresh job can resume from the last
+    processed bar instead of recomputing the whole history.
+
+    Attributes:
+        last_date (str): ISO timestamp of the last processed bar, None before the first update.
+    """
+    def __init__(self, window_size=5):
+        self.ma = StreamingMA(window_size)
+        self.rsi = StreamingRSI()
+        self.macd = StreamingMACD()
+        self.last_date = None
+
+    def update(self, close, date=None):
+        """
+        Process one new bar and return its indicator values as {'MA': float, 'RSI': float, 'MACD': float}.
+        """
+        if date is not None:
+            self.last_date = str(date)
+        return {'MA': self.ma.update(close), 'RSI': self.rsi.update(close), 'MACD': self.macd.update(close)}
+
+    def to_dict(self):
+        return {'ma': self.ma.to_dict(), 'rsi': self.rsi.to_dict(), 'macd': self.macd.to_dict(),
+                'last_date': self.last_date}
+
+    @classmethod
+    def from_dict(cls, state):
+        indicators = cls()
+        indicators.ma = StreamingMA.from_dict(state['ma'])
+        indicators.rsi = StreamingRSI.from_dict(state['rsi'])
+        indicators.macd = StreamingMACD.from_dict(state['macd'])
+        indicators.last_date = state['last_date']
+        return indicators
@@ -1,8 +1,48 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
 import unittest
+import urllib.error
+import urllib.request
 from unittest.mock import patch, MagicMock
+import numpy as np
 import pandas as pd
 from data_download import calculate_and_display_average_price as cadap
 from data_download import notify_if_strong_fluctuations as nisf
+from data_download import fetch_stock_data, add_moving_average, calculate_rsi, calculate_macd
+from data_download import statistic_indicators, rolling_statistic_indicators, summary_statistics, export_to_csv
+from data_plotting import create_and_save_plot, lttb, render_chart, render_charts
+from exporters import export_to_parquet, export_to_feather, export_to_csv_chunked, append_to_dataset, read_dataset
+from exporters import export_to_mmap
+from mmap_store import MmapStore
+from quote_store import QuoteStore, period_range
+from providers import FakeProvider, ReplayProvider, TokenBucket, YahooProvider, INTERVAL_WINDOWS
+from providers import split_range, fetch_range
+from batch import run_batch
+from wide_indicators import wide_indicators, close_matrix
+from streaming import StreamingIndicators
+from indicator_engine import IndicatorEngine
+from compact import compact_frame, compact_report, price_values
+from screener import screen
+from watch import Watcher, SimulatedClock
+from service import QueryService
+from backtest import ma_matrix, performance, backtest, run_backtests
+from correlation import RollingCorrelation, correlation_beta, rolling_beta
+from resampling import ResamplingPyramid, rollup
+from artifact_cache import ArtifactCache, frame_fingerprint
+from benchmarks import run_suite, compare_results, bench_startup
+import main
+from profiling import StageProfiler
+from log_manager import Logger, BlockingQueueHandler
+
+
+def make_history(start, end, tz='America/New_York'):
+	dates = pd.date_range(start, end, freq='B', inclusive='left', tz=tz, name='Date').as_unit('ns')
+	close = pd.Series(dates.dayofyear + 100.0, index=dates)
+	return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+						 'Volume': 1000.0, 'Dividends': 0.0, 'Stock Splits': 0.0})
 
 
 class MathsTest(unittest.TestCase):
@@ -21,5 +61,938 @@ class MathsTest(unittest.TestCase):
 		self.assertTrue(result)
 
 
+class QuoteStoreTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.store = QuoteStore(os.path.join(self.tmp.name, 'quotes.sqlite'))
+
+	def tearDown(self):
+		self.store.close()
+		self.tmp.cleanup()
+
+	def test_period_range(self):
+		today = pd.Timestamp('2024-03-15')
+		self.assertEqual(period_range('1mo', today)[:2], (pd.Timestamp('2024-02-15'), pd.Timestamp('2024-03-16')))
+		self.assertEqual(period_range('ytd', today)[0], pd.Timestamp('2024-01-01'))
+		self.assertEqual(period_range('5d', today)[2], 5)
+		self.assertEqual(period_range(['01.02.2024', '10.02.2024'])[:2],
+						 (pd.Timestamp('2024-01-31'), pd.Timestamp('2024-02-11')))
+
+	def test_fetches_only_missing_ranges(self):
+		fetch = MagicMock(side_effect=lambda start, end: make_history(start, end))
+		first = self.store.get('AAPL', '1d', pd.Timestamp('2024-01-01'), pd.Timestamp('2024-02-01'), fetch)
+		second = self.store.get('AAPL', '1d', pd.Timestamp('2024-01-10'), pd.Timestamp('2024-03-01'), fetch)
+		self.assertEqual(fetch.call_count, 2)
+		self.assertEqual(fetch.call_args.args, (pd.Timestamp('2024-02-01'), pd.Timestamp('2024-03-01')))
+		pd.testing.assert_frame_equal(second, make_history('2024-01-10', '2024-03-01'), check_freq=False)
+		self.assertEqual(len(first), 23)
+		self.store.get('AAPL', '1d', pd.Timestamp('2024-01-05'), pd.Timestamp('2024-02-20'), fetch)
+		self.assertEqual(self.store.stats()['hits'], 1)
+		self.assertEqual(self.store.stats()['misses'], 2)
+
+	def test_fetch_stock_data_uses_store(self):
+		with patch('providers.yf.Ticker') as ticker:
+			ticker.return_value.history.side_effect = lambda start, end, interval: make_history(start, end)
+			data = fetch_stock_data(self.logger, 'AAPL', ['01.02.2024', '29.02.2024'], store=self.store)
+			again = fetch_stock_data(self.logger, 'AAPL', ['05.02.2024', '20.02.2024'], store=self.store)
+		self.assertEqual(ticker.return_value.history.call_count, 1)
+		self.assertEqual(list(data.columns[:2]), ['Date', 'Open'])
+		self.assertEqual(again['Date'].iloc[0], pd.Timestamp('2024-02-05', tz='America/New_York'))
+
+
+class ProvidersTest(unittest.TestCase):
+	def test_token_bucket_limits_rate(self):
+		now = [0.0]
+		sleeps = []
+
+		def sleep(seconds):
+			sleeps.append(seconds)
+			now[0] += seconds
+
+		bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
+		for _ in range(6):
+			bucket.acquire()
+		self.assertEqual(sleeps, [0.5, 0.5, 0.5, 0.5])
+		self.assertAlmostEqual(now[0], 2.0)
+
+	def test_yahoo_provider_retries_with_backoff(self):
+		sleep = MagicMock()
+		provider = YahooProvider(rate=1000, retries=3, backoff=1.0, sleep=sleep)
+		with patch.object(provider, '_request', side_effect=[ConnectionError(), ConnectionError(), 'bars']) as request:
+			self.assertEqual(provider.history('AAPL', period='1mo'), 'bars')
+		self.assertEqual(request.call_count, 3)
+		delays = [c.args[0] for c in sleep.call_args_list]
+		self.assertTrue(0.5 <= delays[0] <= 1.0 and 1.0 <= delays[1] <= 2.0)
+		with patch.object(provider, '_request', side_effect=ConnectionError()):
+			self.assertRaises(ConnectionError, provider.history, 'AAPL', period='1mo')
+		with patch.object(provider, '_request', side_effect=ValueError()) as request:
+			self.assertRaises(ValueError, provider.history, 'AAPL', period='1mo')
+		self.assertEqual(request.call_count, 1)
+
+	def test_replay_provider_records_and_replays(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			source = FakeProvider()
+			recorded = ReplayProvider(tmp, source=source).history('AAPL', start=pd.Timestamp('2024-01-01'),
+																 end=pd.Timestamp('2024-02-01'), interval='1d')
+			replayed = ReplayProvider(tmp).history('AAPL', start=pd.Timestamp('2024-01-01'),
+												   end=pd.Timestamp('2024-02-01'), interval='1d')
+			pd.testing.assert_frame_equal(replayed, recorded, check_freq=False)
+			self.assertEqual(len(source.calls), 1)
+			self.assertRaises(LookupError, ReplayProvider(tmp).history, 'MSFT', period='1mo')
+
+	def test_fake_provider_serves_given_frames(self):
+		provider = FakeProvider(frames={'AAPL': make_history('2024-01-01', '2024-03-01')})
+		data = provider.history('AAPL', start=pd.Timestamp('2024-02-01'), end=pd.Timestamp('2024-02-08'))
+		self.assertEqual(len(data), 5)
+		self.assertEqual(data['Close'].iloc[0], 132.0)
+
+
+class IntradayFetchTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def test_long_ranges_are_chunked_merged_and_ordered(self):
+		provider = FakeProvider(max_window=INTERVAL_WINDOWS)
+		self.assertRaises(ValueError, provider.history, 'AAPL', start=pd.Timestamp('2024-01-01'),
+						  end=pd.Timestamp('2024-02-01'), interval='1m')
+		data = fetch_stock_data(self.logger, 'AAPL', ['01.01.2024', '31.01.2024'], provider=provider, interval='1m')
+		self.assertEqual(len(provider.calls), 6)
+		self.assertTrue(data['Date'].is_monotonic_increasing and data['Date'].is_unique)
+		self.assertEqual(str(data['Date'].dt.tz), 'America/New_York')
+		self.assertEqual(len(data), 23 * 390)
+		calculate_rsi(self.logger, data)
+		calculate_macd(self.logger, data)
+		self.assertFalse(data['MACD'].isna().any())
+
+	def test_empty_and_inverted_ranges(self):
+		provider = FakeProvider()
+		day = pd.Timestamp('2024-03-04')
+		for start, end in ((day, day), (day, day - pd.Timedelta(days=3))):
+			self.assertEqual(split_range(start, end, INTERVAL_WINDOWS['1m']), [])
+			self.assertEqual(split_range(start, end, None), [])
+			for interval in ('1d', '1m'):
+				self.assertTrue(fetch_range(provider, 'AAPL', start, end, interval).empty)
+		self.assertEqual(provider.calls, [])
+
+	def test_intraday_store_and_day_presets(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			store = QuoteStore(os.path.join(tmp, 'quotes.sqlite'))
+			provider = FakeProvider(max_window=INTERVAL_WINDOWS)
+			data = fetch_stock_data(self.logger, 'AAPL', '5d', store=store, provider=provider, interval='5m')
+			again = fetch_stock_data(self.logger, 'AAPL', ['01.02.2024', '05.02.2024'], store=store,
+									 provider=provider, interval='15m')
+			self.assertEqual(store.coverage('AAPL', '1d'), [])
+			store.close()
+		self.assertEqual(data['Date'].dt.normalize().nunique(), 5)
+		self.assertEqual(len(data), 5 * 78)
+		self.assertEqual(again['Date'].iloc[0], pd.Timestamp('2024-01-31 09:30', tz='America/New_York'))
+
+
+class BatchTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def test_failures_are_isolated(self):
+		provider = FakeProvider(fail={'BAD'})
+		batch = run_batch(self.logger, ['AAPL', 'MSFT', 'BAD', 'AAPL'], '3mo', provider=provider, max_workers=4)
+		self.assertEqual(sorted(batch['results']), ['AAPL', 'MSFT'])
+		self.assertIn('BAD', batch['errors'])
+		self.assertEqual(len(provider.calls), 3)
+		self.assertTrue({'MA', 'RSI', 'MACD'} <= set(batch['results']['MSFT'].columns))
+		self.assertGreater(batch['throughput'], 0)
+
+	def test_engine_is_passed_to_the_workers(self):
+		engine = IndicatorEngine()
+		run_batch(self.logger, ['AAPL', 'MSFT'], '3mo', provider=FakeProvider(), engine=engine)
+		self.assertGreater(engine.misses, 0)
+
+
+class WideIndicatorsTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def test_matches_per_ticker_functions(self):
+		rng = np.random.default_rng(1)
+		close = pd.DataFrame(100 + rng.standard_normal((120, 4)).cumsum(axis=0), columns=['A', 'B', 'C', 'D'])
+		close.iloc[:30, 1] = np.nan
+		close.iloc[50:53, 2] = np.nan
+		wide = wide_indicators(self.logger, close, 5)
+		for ticker in close.columns:
+			data = pd.DataFrame({'Close': close[ticker]}).loc[close[ticker].first_valid_index():]
+			add_moving_average(self.logger, data, 5)
+			calculate_rsi(self.logger, data)
+			calculate_macd(self.logger, data)
+			for column in ('MA', 'RSI', 'MACD'):
+				np.testing.assert_allclose(wide[column][ticker].loc[data.index], data[column], rtol=1e-9, atol=1e-9)
+		self.assertTrue(wide['RSI']['B'].iloc[:30].isna().all())
+
+	def test_close_matrix_aligns_dates(self):
+		frames = {'A': make_history('2024-01-01', '2024-02-01').reset_index(),
+				  'B': make_history('2024-01-15', '2024-02-15').reset_index()}
+		close = close_matrix(frames)
+		self.assertEqual(list(close.columns), ['A', 'B'])
+		self.assertTrue(close['B'].loc[:'2024-01-12'].isna().all())
+
+
+class StreamingIndicatorsTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def test_matches_batch_functions_across_resume(self):
+		rng = np.random.default_rng(2)
+		close = 100 + rng.standard_normal(400).cumsum()
+		close[100:103] = np.nan
+		close[200:230] = close[199]
+		data = pd.DataFrame({'Close': close})
+		add_moving_average(self.logger, data, 5)
+		calculate_rsi(self.logger, data)
+		calculate_macd(self.logger, data)
+
+		indicators = StreamingIndicators(5)
+		rows = []
+		for i, value in enumerate(close):
+			if i == 250:
+				indicators = StreamingIndicators.from_dict(json.loads(json.dumps(indicators.to_dict())))
+			rows.append(indicators.update(value))
+		streamed = pd.DataFrame(rows)
+		for column in ('MA', 'RSI', 'MACD'):
+			np.testing.assert_allclose(streamed[column], data[column], rtol=1e-12, atol=1e-12)
+		np.testing.assert_array_equal(streamed['MACD'], data['MACD'])
+
+
+class IndicatorEngineTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def setUp(self):
+		rng = np.random.default_rng(3)
+		self.data = pd.DataFrame({'Close': 100 + rng.standard_normal(300).cumsum()})
+
+	def test_matches_data_download_functions(self):
+		expected = self.data.copy()
+		add_moving_average(self.logger, expected, 5)
+		calculate_rsi(self.logger, expected)
+		calculate_macd(self.logger, expected)
+		IndicatorEngine().add_to(self.logger, self.data, window_size=5)
+		for column in ('MA', 'RSI', 'MACD'):
+			pd.testing.assert_series_equal(self.data[column], expected[column])
+
+	def test_evaluates_requested_nodes_once_and_memoizes(self):
+		engine = IndicatorEngine()
+		self.assertEqual(list(engine.compute(self.data, ['MA'])), ['MA'])
+		self.assertEqual(engine.misses, 2)  # rolling mean, MA
+		engine.compute(self.data, ['RSI'])
+		self.assertEqual((engine.misses, engine.hits), (8, 1))  # diff (shared by gain and loss), gain, loss, ...
+		engine.compute(self.data, ['MA', 'RSI'])
+		self.assertEqual((engine.misses, engine.hits), (8, 3))
+		engine.compute(self.data, ['MA'], window_size=10)
+		self.assertEqual(engine.misses, 10)
+		changed = self.data.copy()
+		changed.loc[299, 'Close'] += 1
+		engine.compute(changed, ['MA'])
+		self.assertEqual(engine.misses, 12)
+
+	def test_lru_eviction(self):
+		engine = IndicatorEngine(max_entries=3)
+		engine.compute(self.data, ['MACD'])
+		self.assertEqual(engine.stats()['entries'], 3)
+		engine.compute(self.data, ['MA'])
+		self.assertEqual(engine.stats()['entries'], 3)
+		engine.compute(self.data, ['MACD'])
+		self.assertEqual(engine.misses, 5)
+		engine.compute(self.data, ['MACD'], macd_long=30)  # the evicted 12-span EMA is computed again
+		self.assertEqual(engine.misses, 8)
+
+	def test_memo_is_bounded_by_bytes(self):
+		engine = IndicatorEngine(max_bytes=2 * 300 * 8)
+		engine.compute(self.data, ['MACD'])
+		self.assertEqual(engine.stats()['entries'], 2)
+		self.assertEqual(engine.stats()['bytes'], 2 * 300 * 8)
+		engine.compute(self.data.iloc[:100], ['MA'])
+		self.assertLessEqual(engine.stats()['bytes'], 2 * 300 * 8)
+		engine.clear()
+		self.assertEqual(engine.stats()['bytes'], 0)
+
+
+class CompactFrameTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def setUp(self):
+		self.data = FakeProvider().history('AAPL', period='1y').reset_index()
+
+	def test_drops_unused_columns_and_shrinks_dtypes(self):
+		compact = compact_frame(self.data)
+		self.assertEqual(list(compact.columns), ['Date', 'Open', 'High', 'Low', 'Close', 'Volume'])
+		self.assertEqual(compact['Close'].dtype, np.float32)
+		self.assertLess(compact.memory_usage().sum(), self.data.memory_usage().sum() / 2)
+
+	def test_scaled_integer_prices(self):
+		data = self.data.copy()
+		data.loc[3, 'Close'] = np.nan
+		compact = compact_frame(data, prices='int32')
+		self.assertEqual(compact['Close'].dtype, np.int32)
+		np.testing.assert_allclose(price_values(compact), data['Close'], atol=0.5 / compact.attrs['price_scale'])
+		self.assertTrue(np.isnan(price_values(compact)[3]))
+		data['Close'] = 500_000.0
+		with self.assertRaises(ValueError):
+			compact_frame(data, prices='int32')
+
+	def test_report_and_batch(self):
+		report = compact_report(self.logger, self.data)
+		self.assertLess(report['bytes_per_row_after'], report['bytes_per_row_before'] / 2)
+		for column in ('MA', 'RSI', 'MACD'):
+			self.assertLess(report['max_rel_error'][column], 1e-4)
+		batch = run_batch(self.logger, ['AAPL'], '1y', provider=FakeProvider(), compact=True)
+		result = batch['results']['AAPL']
+		self.assertEqual(result['RSI'].dtype, np.float32)
+		self.assertNotIn('Dividends', result.columns)
+
+
+class ScreenerTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def test_alerts_are_ranked(self):
+		dates = pd.bdate_range('2024-01-01', periods=120, name='Date')
+		wave = 100 + 5 * np.sin(np.arange(120) / 6)
+		close = pd.DataFrame({'FLAT': 100.0,
+							  'RALLY': np.r_[np.full(110, 100.0) + np.arange(110) % 2, np.linspace(101, 130, 10)],
+							  'WAVE': wave,
+							  'EMPTY': np.nan}, index=dates)
+		alerts = screen(self.logger, close, windows=(5, 20), threshold=10)
+		self.assertNotIn('FLAT', set(alerts['Ticker']))
+		self.assertNotIn('EMPTY', set(alerts['Ticker']))
+		self.assertEqual(alerts.iloc[0][['Ticker', 'Window', 'RSI_extreme']].tolist(), ['RALLY', 20, 'overbought'])
+		self.assertTrue(alerts['Alerts'].is_monotonic_decreasing)
+		wave_cross = alerts[alerts['Ticker'] == 'WAVE'].set_index('Window')['MACD_cross']
+		self.assertEqual(wave_cross[20], 'bullish')
+
+	def test_universe_from_store(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			store = QuoteStore(os.path.join(tmp, 'quotes.sqlite'))
+			for ticker, tz in (('AAPL', 'America/New_York'), ('SAP', 'Europe/Berlin')):
+				store.save(ticker, '1d', make_history('2024-01-01', '2024-03-01', tz), pd.Timestamp('2024-01-01'),
+						   pd.Timestamp('2024-03-01'))
+			self.assertEqual(store.tickers(), ['AAPL', 'SAP'])
+			close = store.load_column('1d', pd.Timestamp('2024-02-01'), pd.Timestamp('2024-03-01'))
+			picked = store.load_column('1d', pd.Timestamp('2024-02-01'), pd.Timestamp('2024-03-01'),
+									   tickers=['SAP', 'MSFT'])
+			plan = store._conn.execute("EXPLAIN QUERY PLAN SELECT ts FROM bars WHERE interval='1d' AND ts>=0").fetchall()
+			store.close()
+		self.assertIn('bars_interval_ts', str(plan))
+		self.assertEqual(list(picked.columns), ['SAP', 'MSFT'])
+		self.assertTrue(picked['SAP'].equals(close['SAP']) and picked['MSFT'].isna().all())
+		self.assertEqual(list(close.columns), ['AAPL', 'SAP'])
+		self.assertEqual(close.index[0], pd.Timestamp('2024-02-01'))
+		self.assertEqual(close.loc['2024-02-01', 'SAP'], pd.Timestamp('2024-02-01').dayofyear + 100)
+
+
+class WatcherTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def test_incremental_refresh_on_schedule(self):
+		clock = SimulatedClock('2024-03-04 10:00')
+		provider = FakeProvider(fail={'BAD'})
+		with tempfile.TemporaryDirectory() as tmp, patch('data_download.console'):
+			state_path = os.path.join(tmp, 'watch.json')
+			watcher = Watcher(self.logger, ['AAPL', 'BAD'], every=86400, threshold=1, provider=provider,
+							  clock=clock, alert_bars=10, state_path=state_path)
+			watcher.run(cycles=2)
+			clock.advance(86400)
+			results = watcher.run_once()
+			self.assertEqual(list(results), ['AAPL'])
+			result = results['AAPL']
+			self.assertEqual(clock.waits, [86400])
+			self.assertEqual(watcher.cycles, 3)
+			starts = [kwargs['start'] for ticker, kwargs in provider.calls if ticker == 'AAPL']
+			self.assertEqual(starts, [pd.Timestamp('2024-01-04 10:00').to_pydatetime(),
+									  pd.Timestamp('2024-03-01').to_pydatetime(),
+									  pd.Timestamp('2024-03-04').to_pydatetime()])
+			state = watcher.states['AAPL']
+			self.assertEqual((result['new_bars'], state.last), (1, '2024-03-05T00:00:00'))
+			self.assertEqual(len(state.closes), 10)
+			self.assertEqual(watcher.alerts[-1], ('AAPL', '2024-03-05T00:00:00'))
+
+			expected = FakeProvider().history('AAPL', start=starts[0], end=pd.Timestamp('2024-03-06')).reset_index()
+			add_moving_average(self.logger, expected, 5)
+			calculate_rsi(self.logger, expected)
+			calculate_macd(self.logger, expected)
+			for column in ('MA', 'RSI', 'MACD'):
+				self.assertAlmostEqual(result['indicators'][column], expected[column].iloc[-1], places=9)
+
+			resumed = Watcher(self.logger, ['AAPL'], provider=provider, clock=clock, state_path=state_path)
+			self.assertEqual(resumed.states['AAPL'].to_dict(), state.to_dict())
+
+	def test_clock_in_another_timezone(self):
+		# 03:00 in Berlin is still the evening before in New York, where the bar of 5 March is being traded
+		clock = SimulatedClock(pd.Timestamp('2024-03-06 03:00', tz='Europe/Berlin'))
+		provider = FakeProvider()
+		watcher = Watcher(self.logger, ['AAPL'], threshold=1000, provider=provider, clock=clock)
+		watcher.run_once()
+		state = watcher.states['AAPL']
+		self.assertEqual((state.last, state.tz), ('2024-03-04T00:00:00', 'America/New_York'))
+		clock.advance(6 * 3600)
+		self.assertEqual(watcher.run_once()['AAPL']['new_bars'], 1)
+		self.assertEqual(state.last, '2024-03-05T00:00:00')
+		self.assertEqual(provider.calls[-1][1]['end'], pd.Timestamp('2024-03-07 03:00').to_pydatetime())
+
+	def test_overrun_cycles_skip_missed_slots(self):
+		clock = SimulatedClock('2024-03-04 10:00')
+		provider = FakeProvider()
+		slow_history = provider.history
+		def history(ticker, **kwargs):
+			clock.advance(150)
+			return slow_history(ticker, **kwargs)
+		provider.history = history
+		watcher = Watcher(self.logger, ['AAPL'], every=60, threshold=1000, provider=provider, clock=clock)
+		watcher.run(cycles=3)
+		self.assertEqual(clock.waits, [30, 30])
+
+
+class QueryServiceTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def test_endpoints_cache_and_coalescing(self):
+		provider = FakeProvider(delay=0.2, fail={'BAD'})
+
+		async def scenario():
+			service = QueryService(self.logger, provider=provider)
+			port = await service.start(port=0)
+
+			def get(query):
+				try:
+					with urllib.request.urlopen(f"http://127.0.0.1:{port}{query}") as response:
+						return response.status, response.read()
+				except urllib.error.HTTPError as e:
+					return e.code, e.read()
+
+			request = lambda query: asyncio.to_thread(get, query)
+			try:
+				same = await asyncio.gather(*[request('/indicators?ticker=aapl&period=3mo') for _ in range(4)])
+				summary = await request('/summary?ticker=AAPL&period=3mo')
+				chart = await request('/chart?ticker=AAPL&period=3mo')
+				errors = [await request(query) for query in ('/summary?ticker=BAD', '/summary?ticker=AAPL&period=7y',
+															 '/nothing?ticker=AAPL')]
+				return same, summary, chart, errors, service.stats()
+			finally:
+				await service.close()
+
+		same, summary, chart, errors, stats = asyncio.run(scenario())
+		self.assertEqual(len({body for status, body in same}), 1)
+		self.assertEqual(set(json.loads(same[0][1])[0]), {'Date', 'Close', 'MA', 'RSI', 'MACD'})
+		self.assertEqual(json.loads(summary[1])['Count'], len(json.loads(same[0][1])))
+		self.assertIn(b'/plotly.min.js', chart[1])
+		self.assertEqual([status for status, body in errors], [502, 400, 404])
+		self.assertEqual([ticker for ticker, kwargs in provider.calls], ['AAPL', 'BAD'])
+		self.assertEqual((stats['coalesced'], stats['hits']), (3, 2))
+
+	def test_cached_results_expire(self):
+		provider = FakeProvider()
+		now = [0.0]
+		service = QueryService(self.logger, provider=provider, ttl=60, clock=lambda: now[0])
+		query = lambda: asyncio.run(service.query('/summary', {'ticker': 'AAPL', 'period': '1mo'}))
+		query()
+		now[0] = 59
+		query()
+		self.assertEqual(len(provider.calls), 1)
+		now[0] = 61
+		query()
+		self.assertEqual(len(provider.calls), 2)
+		asyncio.run(service.close())
+		self.assertEqual(bench_startup(['service'], repeat=1)['service']['eager'], [])
+
+	def test_summary_nan_and_pyramid_identity(self):
+		service = QueryService(self.logger, provider=FakeProvider())
+		content_type, body = asyncio.run(service.query('/summary', {'ticker': 'AAPL', 'start': '04.03.2024',
+																	'end': '04.03.2024'}))
+		summary = json.loads(body)
+		self.assertEqual(summary['Count'], 1)
+		self.assertIsNone(summary['STD'])
+
+		async def pyramids():
+			data = make_history('2024-01-01', '2024-03-01').reset_index()
+			refreshed = make_history('2024-01-01', '2024-03-02').reset_index()
+			return [await service._pyramid(frame, 'AAPL', '3mo', '1d', 5) for frame in (data, data, refreshed)]
+		first, again, refreshed = asyncio.run(pyramids())
+		asyncio.run(service.close())
+		self.assertIs(first, again)
+		self.assertIsNot(first, refreshed)
+
+
+class BacktestTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def test_ma_matrix_matches_moving_average(self):
+		close = 100 + np.random.default_rng(5).standard_normal(300).cumsum()
+		windows = [2, 7, 50, 200]
+		data = pd.DataFrame({'Close': close})
+		for column, window in enumerate(windows):
+			add_moving_average(self.logger, data, window)
+			np.testing.assert_allclose(ma_matrix(close, windows)[:, column], data['MA'], rtol=1e-10)
+
+	def test_signals_are_held_from_the_next_bar(self):
+		close = np.array([10.0, 11.0, 12.0, 9.0, 9.0, 12.0])
+		signals = np.array([[1, 0], [1, 1], [0, 0], [1, 0], [0, 0], [0, 0]], dtype=float)
+		metrics = performance(close, signals)
+		# Column 0 holds bars 1-2 (10 -> 12, a win) and bar 4 (9 -> 9, not a win)
+		self.assertAlmostEqual(metrics['total_return'][0], 0.2)
+		self.assertEqual(metrics['trades'][0], 2)
+		self.assertAlmostEqual(metrics['hit_rate'][0], 0.5)
+		# Column 1 only holds bar 2 (11 -> 12) and misses the drop to 9
+		self.assertAlmostEqual(metrics['total_return'][1], 12 / 11 - 1)
+		self.assertEqual(metrics['max_drawdown'][1], 0)
+		self.assertAlmostEqual(metrics['buy_and_hold'][0], 0.2)
+		self.assertAlmostEqual(performance(close, np.ones((6, 1)))['max_drawdown'][0], 0.25)
+
+	def test_sweep_over_tickers(self):
+		provider = FakeProvider()
+		closes = {ticker: provider.history(ticker, period='2y')['Close'] for ticker in ('AAPL', 'MSFT')}
+		grids = {'ma': {'window': [5, 20]}, 'rsi': {'window': [14], 'lower': [30], 'upper': [70]},
+				 'macd': {'short': [12], 'long': [26], 'signal': [9]}}
+		results = run_backtests(self.logger, closes, grids, max_workers=2)
+		self.assertEqual(len(results), 8)
+		self.assertTrue(results['total_return'].is_monotonic_decreasing)
+		single = backtest(closes['AAPL'], grids)
+		expected = single.set_index('params')['total_return']
+		actual = results[results['ticker'] == 'AAPL'].set_index('params')['total_return']
+		pd.testing.assert_series_equal(actual.sort_index(), expected.sort_index())
+
+	def test_empty_grids_and_prices(self):
+		close = FakeProvider().history('AAPL', period='1y')['Close']
+		grids = {'ma': {'window': [5]}, 'rsi': {'window': [14], 'lower': [70], 'upper': [30]},
+				 'macd': {'short': [26], 'long': [12]}}
+		self.assertEqual(list(backtest(close, grids)['strategy']), ['ma'])
+		self.assertTrue(backtest(close, {'rsi': grids['rsi']}).empty)
+		for empty in ([], [np.nan, np.nan]):
+			result = backtest(empty)
+			self.assertTrue(result.empty)
+			self.assertEqual(list(result.columns[:2]), ['strategy', 'params'])
+
+
+class CorrelationTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def setUp(self):
+		rng = np.random.default_rng(11)
+		market = rng.standard_normal((300, 1)) * 0.01
+		returns = market * rng.uniform(0.5, 1.5, 12) + rng.standard_normal((300, 12)) * 0.01
+		self.close = pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), columns=[f"T{i}" for i in range(12)],
+								  index=pd.bdate_range('2023-01-02', periods=300))
+		self.close.iloc[:270, 3] = np.nan
+		self.close.iloc[280:284, 5] = np.nan
+
+	def test_matrices_match_pandas(self):
+		corr, beta = correlation_beta(self.logger, self.close, window=40, min_periods=10, block_size=5)
+		returns = self.close.pct_change(fill_method=None).iloc[-40:]
+		pd.testing.assert_frame_equal(corr, returns.corr(min_periods=10), check_names=False)
+		pair = returns[['T5', 'T0']].dropna()
+		self.assertAlmostEqual(beta.loc['T5', 'T0'], pair.cov().iloc[0, 1] / pair['T0'].var())
+		# T3 has 29 returns in the window, fewer than min_periods
+		corr, beta = correlation_beta(self.logger, self.close, window=40, min_periods=30)
+		self.assertTrue(np.isnan(corr.loc['T3', 'T0']) and np.isnan(beta.loc['T0', 'T3']))
+		self.assertFalse(np.isnan(corr.loc['T5', 'T0']))
+
+	def test_incremental_updates_match_refit(self):
+		rolling = RollingCorrelation(self.close.columns, window=20, min_periods=5, block_size=4).fit(self.close.iloc[:250])
+		for _, bar in self.close.iloc[250:].iterrows():
+			rolling.update(bar)
+		corr, beta = correlation_beta(self.logger, self.close, window=20, min_periods=5)
+		np.testing.assert_allclose(rolling.correlation(), corr, atol=1e-12)
+		np.testing.assert_allclose(rolling.beta(), beta, atol=1e-12)
+
+	def test_rolling_beta_against_benchmark(self):
+		corr, beta = rolling_beta(self.close, 'T0', window=20)
+		returns = self.close.pct_change(fill_method=None)
+		expected = returns['T1'].rolling(20).cov(returns['T0']) / returns['T0'].rolling(20).var()
+		pd.testing.assert_series_equal(beta['T1'], expected, check_names=False)
+		pd.testing.assert_series_equal(corr['T2'], returns['T2'].rolling(20).corr(returns['T0']), check_names=False)
+		self.assertTrue(np.allclose(beta['T0'].dropna(), 1))
+
+
+class ResamplingTest(unittest.TestCase):
+	def test_rollup_aggregates_ohlcv(self):
+		data = make_history('2024-01-01', '2024-02-01').reset_index()
+		weekly = rollup(data, 'W-FRI')
+		self.assertEqual(list(weekly['Bars']), [5, 5, 5, 5, 3])
+		second = weekly.iloc[1]
+		self.assertEqual(second['Date'], pd.Timestamp('2024-01-12', tz='America/New_York'))
+		self.assertEqual((second['Open'], second['High'], second['Low'], second['Close'], second['Volume']),
+						 (108.0, 113.0, 107.0, 112.0, 5000.0))
+
+	def test_append_matches_rebuild(self):
+		daily = make_history('2015-01-01', '2024-03-01').reset_index()
+		minutes = pd.date_range('2024-01-02 09:30', periods=60 * 24 * 50, freq='min', tz='America/New_York')
+		intraday = pd.DataFrame({'Date': minutes, 'Open': 1.0, 'High': 2.0, 'Low': 0.5,
+								 'Close': np.arange(len(minutes)) % 97 + 10.0, 'Volume': 1.0})
+		for data, interval, split in ((daily, '1d', 2300), (intraday, '1m', 60 * 24 * 45 + 7)):
+			pyramid = ResamplingPyramid(data.iloc[:split], interval)
+			touched = pyramid.append(data.iloc[split - 5:])
+			rebuilt = ResamplingPyramid(data, interval)
+			self.assertEqual(list(pyramid.levels), list(rebuilt.levels))
+			for name in rebuilt.levels:
+				pd.testing.assert_frame_equal(pyramid.levels[name], rebuilt.levels[name])
+			# Only the new bars, the rest of the day they start in and a few rollup rows are aggregated again
+			self.assertLess(touched, len(data) - split + 24 * 60 + 100)
+		self.assertEqual(list(pyramid.levels), ['daily', 'weekly', 'monthly', 'quarterly'])
+
+	def test_select_meets_point_budget(self):
+		engine = IndicatorEngine()
+		pyramid = ResamplingPyramid(make_history('2014-01-01', '2024-01-01').reset_index(), engine=engine)
+		self.assertIs(pyramid.engine, engine)
+		self.assertGreater(engine.misses, 0)
+		self.assertEqual(pyramid.select(max_points=3000)[0], 'base')
+		level, frame = pyramid.select(max_points=2000)
+		self.assertEqual((level, len(frame)), ('weekly', len(pyramid.levels['weekly'])))
+		self.assertEqual(pyramid.select(max_points=200)[0], 'monthly')
+		self.assertEqual(pyramid.select(max_points=10)[0], 'quarterly')
+		level, frame = pyramid.select('2020-01-01', '2021-01-01', max_points=100)
+		self.assertEqual((level, len(frame)), ('weekly', 52))
+		self.assertFalse(frame[['MA', 'RSI', 'MACD']].iloc[-1].isna().any())
+
+	def test_long_chart_skips_full_resolution_indicators(self):
+		with tempfile.TemporaryDirectory() as tmp, patch('data_download.default_provider', FakeProvider), \
+				patch('data_plotting.path', tmp), \
+				patch('main.get_artifacts', return_value=ArtifactCache(os.path.join(tmp, 'cache'))), \
+				patch.object(IndicatorEngine, 'add_to') as add_to:
+			store = QuoteStore(os.path.join(tmp, 'quotes.sqlite'))
+			main.run_job(MagicMock(), MagicMock(), main.make_job('AAPL', '10y', chart='plotly'), store)
+			store.close()
+			self.assertTrue(os.path.exists(os.path.join(tmp, 'charts', 'AAPL10 years.html')))
+		add_to.assert_not_called()
+
+
+class ArtifactCacheTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def test_fingerprint_follows_content(self):
+		data = make_history('2024-01-01', '2024-03-01').reset_index()
+		self.assertEqual(frame_fingerprint(data), frame_fingerprint(data.copy()))
+		changed = data.copy()
+		changed.loc[10, 'Close'] += 0.01
+		self.assertNotEqual(frame_fingerprint(data), frame_fingerprint(changed))
+		self.assertNotEqual(frame_fingerprint(data), frame_fingerprint(data.astype({'Volume': 'int64'})))
+		self.assertNotEqual(ArtifactCache.key('a', theme='dark'), ArtifactCache.key('a', theme='light'))
+
+	def test_hit_restores_files(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			cache = ArtifactCache(os.path.join(tmp, 'cache'))
+			outputs = [os.path.join(tmp, 'AAPL.csv'), os.path.join(tmp, 'AAPL_summary.csv')]
+			key = cache.key('abc', artifact='export')
+			self.assertFalse(cache.restore(self.logger, key))
+			for number, output in enumerate(outputs):
+				with open(output, 'w') as file:
+					file.write(f"content {number}")
+			cache.store(self.logger, key, outputs + [os.path.join(tmp, 'missing.js')], seconds=2.0)
+			self.assertEqual(os.stat(outputs[0]).st_nlink, 2)
+			os.remove(outputs[0])
+			with open(f"{outputs[1]}.new", 'w') as file:
+				file.write("edited")
+			os.replace(f"{outputs[1]}.new", outputs[1])
+			reopened = ArtifactCache(os.path.join(tmp, 'cache'))
+			self.assertTrue(reopened.restore(self.logger, key))
+			self.assertEqual([open(output).read() for output in outputs], ['content 0', 'content 1'])
+			stats = reopened.stats()
+			self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 0, 1))
+			self.assertGreater(stats['seconds_saved'], 1.0)
+
+	def test_output_rewritten_in_place_invalidates_its_blob(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			cache = ArtifactCache(os.path.join(tmp, 'cache'))
+			output = os.path.join(tmp, 'AAPL.csv')
+			with open(output, 'w') as file:
+				file.write("first run")
+			cache.store(self.logger, cache.key('first'), [output], seconds=1.0)
+			with open(output, 'w') as file:
+				file.write("second run, written over the linked blob")
+			self.assertFalse(cache.restore(self.logger, cache.key('first')))
+			with open(output, 'w') as file:
+				file.write("first run")
+			cache.store(self.logger, cache.key('third'), [output], seconds=1.0)
+			os.remove(output)
+			self.assertTrue(cache.restore(self.logger, cache.key('third')))
+			self.assertEqual(open(output).read(), "first run")
+
+	def test_eviction_keeps_recent_entries(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			cache = ArtifactCache(os.path.join(tmp, 'cache'), max_bytes=2500)
+			shared = os.path.join(tmp, 'plotly.min.js')
+			with open(shared, 'w') as file:
+				file.write('x' * 500)
+			for number in range(4):
+				chart = os.path.join(tmp, f'chart{number}.html')
+				with open(chart, 'w') as file:
+					file.write(str(number) * 1000)
+				cache.store(self.logger, cache.key(str(number)), [chart, shared], seconds=1.0)
+				if number == 1:
+					self.assertTrue(cache.restore(self.logger, cache.key('0')))
+			stats = cache.stats()
+			self.assertEqual(stats['entries'], 2)
+			self.assertLessEqual(stats['bytes'], 2500)
+			self.assertEqual(len(os.listdir(os.path.join(tmp, 'cache', 'blobs'))), 3)
+			self.assertFalse(cache.restore(self.logger, cache.key('0')))
+			self.assertTrue(cache.restore(self.logger, cache.key('3')))
+
+	def test_rerun_reuses_export_and_chart(self):
+		with tempfile.TemporaryDirectory() as tmp, patch('data_download.default_provider', FakeProvider), \
+				patch('exporters.path', tmp), patch('data_plotting.path', tmp), \
+				patch('main.get_artifacts', return_value=ArtifactCache(os.path.join(tmp, 'cache'))) as get_artifacts:
+			cache = get_artifacts.return_value
+			os.makedirs(os.path.join(tmp, 'charts'))
+			with open(os.path.join(tmp, 'charts', 'plotly.min.js'), 'w') as file:
+				file.write('stale bundle of an earlier long chart')
+			store = QuoteStore(os.path.join(tmp, 'quotes.sqlite'))
+			for job in (main.make_job('AAPL', '3mo', export='parquet', chart='plotly'),
+						main.make_job('AAPL', '3mo', export='dataset', chart='plotly')):
+				main.run_job(MagicMock(), MagicMock(), job, store)
+			self.assertEqual((cache.hits, cache.misses), (1, 2))
+			self.assertEqual(sorted(len(entry['files']) for entry in cache._index.values()), [1, 1])
+			os.remove(os.path.join(tmp, 'parquet', 'AAPL3 months.parquet'))
+			with patch('main.export_data') as export:
+				main.run_job(MagicMock(), MagicMock(), main.make_job('AAPL', '3mo', export='parquet'), store)
+			export.assert_not_called()
+			self.assertTrue(os.path.exists(os.path.join(tmp, 'parquet', 'AAPL3 months.parquet')))
+			store.close()
+
+
+class HeadlessModeTest(unittest.TestCase):
+	def test_job_file_runs_without_prompts(self):
+		jobs = [{'tickers': 'AAPL MSFT', 'period': '3mo', 'export': 'parquet'},
+				{'tickers': ['NVDA'], 'period': ['01.02.2024', '01.03.2024'], 'threshold': 2}]
+		with tempfile.TemporaryDirectory() as tmp, patch('main.inquirer') as prompt, \
+				patch('data_download.default_provider', FakeProvider), patch('exporters.path', tmp), \
+				patch('main.QuoteStore', lambda: QuoteStore(os.path.join(tmp, 'quotes.sqlite'))):
+			job_path = os.path.join(tmp, 'jobs.json')
+			with open(job_path, 'w', encoding='utf-8') as file:
+				json.dump(jobs, file)
+			main.main(['--job', job_path])
+			saved = sorted(os.listdir(os.path.join(tmp, 'parquet')))
+		prompt.text.assert_not_called()
+		self.assertEqual(saved, ['AAPL3 months.parquet', 'MSFT3 months.parquet'])
+		job = main.make_job('AAPL, MSFT', threshold='2')
+		self.assertEqual((job['tickers'], job['threshold'], job['export']), (['AAPL', 'MSFT'], 2.0, None))
+		self.assertRaises(ValueError, main.make_job, 'AAPL', period='7y')
+
+	def test_missing_quotes_stop_the_job(self):
+		with patch('main.fetch_stock_data', return_value=None), patch('main.statistic_indicators') as stats:
+			main.run_job(MagicMock(), MagicMock(), main.make_job('NOPE', export='csv'), MagicMock())
+		stats.assert_not_called()
+
+	def test_entry_point_defers_heavy_imports(self):
+		result = bench_startup(['main'], repeat=1)['main']
+		self.assertEqual(result['eager'], [])
+
+
+class SummaryStatisticsTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def test_summary_matches_pandas(self):
+		close = pd.Series(100 + np.random.default_rng(3).standard_normal(1000).cumsum())
+		data = pd.DataFrame({'Close': close})
+		summary = statistic_indicators(self.logger, data, 'AAPL', '1y')
+		self.assertEqual(list(data.columns), ['Close'])
+		self.assertAlmostEqual(summary['Median'], close.median())
+		self.assertAlmostEqual(summary['STD'], close.std())
+		self.assertAlmostEqual(summary['Variance'], close.var())
+		self.assertAlmostEqual(summary['Var_coef'], close.std() / close.mean() * 100)
+		self.assertEqual((summary['Min'], summary['Max']), (close.min(), close.max()))
+		chunked = summary_statistics(close, chunk_size=7)
+		self.assertAlmostEqual(chunked['Variance'], close.var())
+
+	def test_rolling_variant(self):
+		data = pd.DataFrame({'Close': [1.0, 2.0, 4.0, 8.0]})
+		rolling = rolling_statistic_indicators(self.logger, data, 2)
+		self.assertEqual(rolling['Max'].tolist()[1:], [2.0, 4.0, 8.0])
+		self.assertAlmostEqual(rolling['Variance'].iloc[3], 8.0)
+
+	def test_export_and_plot_consume_summary(self):
+		data = make_history('2024-01-01', '2024-03-01').reset_index()
+		data['Date'] = data['Date'].dt.tz_localize(None)
+		add_moving_average(self.logger, data, 5)
+		calculate_rsi(self.logger, data)
+		calculate_macd(self.logger, data)
+		summary = statistic_indicators(self.logger, data, 'AAPL', '1mo')
+		with tempfile.TemporaryDirectory() as tmp, patch('data_download.path', tmp), \
+				patch('data_plotting.path', tmp), patch('data_plotting.inquirer') as prompt:
+			prompt.text.return_value.execute.return_value = 'n'
+			export_to_csv(self.logger, data, 'AAPL', '1mo', summary)
+			create_and_save_plot(self.logger, data, 'AAPL', '1mo', summary)
+			saved = pd.read_csv(os.path.join(tmp, 'csv', 'AAPL1 month_summary.csv'))
+			self.assertEqual(len(saved), 1)
+			self.assertAlmostEqual(saved['Median'].iloc[0], summary['Median'])
+			self.assertTrue(os.path.exists(os.path.join(tmp, 'charts', 'AAPL1 month.html')))
+
+
+class ChartTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def test_lttb_keeps_shape(self):
+		x = np.arange(10_000)
+		y = np.sin(x / 500.0)
+		y[4321] = 5.0
+		keep = lttb(x, y, 200)
+		self.assertEqual(len(keep), 200)
+		self.assertEqual((keep[0], keep[-1]), (0, 9999))
+		self.assertIn(4321, keep)
+		self.assertTrue((np.diff(keep) > 0).all())
+
+	def test_downsampled_webgl_chart_with_shared_plotlyjs(self):
+		data = make_history('2015-01-01', '2024-01-01').reset_index()
+		add_moving_average(self.logger, data, 5)
+		calculate_rsi(self.logger, data)
+		calculate_macd(self.logger, data)
+		with tempfile.TemporaryDirectory() as tmp, patch('data_plotting.path', tmp), \
+				patch('data_plotting.inquirer') as prompt:
+			prompt.text.return_value.execute.return_value = 'n'
+			create_and_save_plot(self.logger, data, 'AAPL', '10y', max_points=500, webgl=True,
+								 include_plotlyjs='directory')
+			html = open(os.path.join(tmp, 'charts', 'AAPL10 years.html'), encoding='utf-8').read()
+			self.assertTrue(os.path.exists(os.path.join(tmp, 'charts', 'plotly.min.js')))
+		self.assertIn('scattergl', html)
+		self.assertLess(len(html), 500_000)
+
+	def test_headless_rendering(self):
+		data = make_history('2024-01-01', '2024-03-01').reset_index()
+		add_moving_average(self.logger, data, 5)
+		calculate_rsi(self.logger, data)
+		calculate_macd(self.logger, data)
+		with tempfile.TemporaryDirectory() as tmp, patch('data_plotting.inquirer') as prompt:
+			report = render_chart(self.logger, data, 'AAPL', '1mo', theme='plotly_dark', output_dir=tmp)
+			reports = render_charts(self.logger, [(data, 'MSFT', '1mo', None), (data, 'NVDA', '1mo', None)],
+									max_workers=2, output_dir=tmp)
+			self.assertTrue(os.path.exists(report['path']))
+			self.assertEqual([r['ticker'] for r in reports], ['MSFT', 'NVDA'])
+			self.assertTrue(all(os.path.exists(r['path']) and r['seconds'] > 0 for r in reports))
+			self.assertTrue(os.path.exists(os.path.join(tmp, 'plotly.min.js')))
+		prompt.text.assert_not_called()
+
+
+class ExportersTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.data = make_history('2023-11-01', '2024-02-01').reset_index()
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_file_formats_report_size_and_time(self):
+		with patch('exporters.path', self.tmp.name):
+			reports = [export_to_parquet(self.logger, self.data, 'AAPL', '3mo'),
+					   export_to_feather(self.logger, self.data, 'AAPL', '3mo'),
+					   export_to_csv_chunked(self.logger, self.data, 'AAPL', '3mo', chunk_size=10)]
+		for report in reports:
+			self.assertEqual(report['rows'], len(self.data))
+			self.assertEqual(report['bytes'], os.path.getsize(report['path']))
+			self.assertGreaterEqual(report['seconds'], 0)
+		pd.testing.assert_frame_equal(pd.read_parquet(reports[0]['path']), self.data)
+		pd.testing.assert_frame_equal(pd.read_feather(reports[1]['path']), self.data)
+		self.assertEqual(len(pd.read_csv(reports[2]['path'])), len(self.data))
+
+	def test_dataset_appends_only_new_rows(self):
+		first = append_to_dataset(self.logger, self.data.iloc[:30], 'AAPL', root=self.tmp.name)
+		second = append_to_dataset(self.logger, self.data, 'AAPL', root=self.tmp.name)
+		self.assertEqual((first['rows'], second['rows']), (30, len(self.data) - 30))
+		self.assertTrue(os.path.isdir(os.path.join(self.tmp.name, 'ticker=AAPL', 'year=2023')))
+		pd.testing.assert_frame_equal(read_dataset('AAPL', root=self.tmp.name), self.data)
+		self.assertEqual(len(second['files']), 2)
+		self.assertEqual(second['bytes'], sum(os.path.getsize(part) for part in second['files']))
+
+	def test_failed_append_leaves_no_rows(self):
+		to_parquet = pd.DataFrame.to_parquet
+
+		def fail_in_2024(frame, file_path, **kwargs):
+			if '/year=2024/' in file_path.replace(os.sep, '/'):
+				raise OSError("disk full")
+			to_parquet(frame, file_path, **kwargs)
+
+		with patch.object(pd.DataFrame, 'to_parquet', fail_in_2024):
+			self.assertIsNone(append_to_dataset(self.logger, self.data, 'AAPL', root=self.tmp.name))
+		self.assertTrue(read_dataset('AAPL', root=self.tmp.name).empty)
+		self.assertEqual([name for _, _, names in os.walk(self.tmp.name) for name in names if name.endswith('.tmp')], [])
+		append_to_dataset(self.logger, self.data, 'AAPL', root=self.tmp.name)
+		pd.testing.assert_frame_equal(read_dataset('AAPL', root=self.tmp.name), self.data)
+
+
+class MmapStoreTest(unittest.TestCase):
+	logger = MagicMock()
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.data = make_history('2023-11-01', '2024-02-01').reset_index()
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_memory_mapped_store_loads_views(self):
+		report = export_to_mmap(self.logger, self.data, 'AAPL', root=self.tmp.name)
+		self.assertEqual(report['rows'], len(self.data))
+		store = MmapStore(self.tmp.name)
+		self.assertEqual(store.index()['AAPL']['rows'], len(self.data))
+		loaded = store.load('AAPL')
+		pd.testing.assert_frame_equal(loaded, self.data)
+		self.assertFalse(loaded['Close'].to_numpy().flags.writeable)
+		recent = store.load('AAPL', start='2024-01-02', end='2024-01-05', columns=['Close'])
+		self.assertEqual(list(recent.columns), ['Date', 'Close'])
+		self.assertEqual(recent['Date'].dt.day.tolist(), [2, 3, 4])
+		add_moving_average(self.logger, recent, 2)
+		self.assertEqual(recent['MA'].iloc[-1], recent['Close'].iloc[-2:].mean())
+		with self.assertRaises(LookupError):
+			store.load('MSFT')
+
+
+class BenchmarkSuiteTest(unittest.TestCase):
+	def test_suite_covers_pipeline_and_detects_regressions(self):
+		current = run_suite(rows=[300], tickers=[2], repeat=1)
+		names = {result['name'] for result in current['results']}
+		self.assertTrue({'fetch_stock_data', 'calculate_rsi', 'export_to_csv', 'render_chart', 'run_batch'} <= names)
+		json.dumps(current)
+		baseline = {'results': [dict(result, seconds=result['seconds'] / 2) for result in current['results']]}
+		regressions = compare_results(baseline, current, threshold=0.5, min_seconds=0)
+		self.assertEqual(len(regressions), len(current['results']))
+		self.assertEqual(compare_results(baseline, current, threshold=1.5, min_seconds=0), [])
+		self.assertEqual(compare_results(baseline, current, threshold=0.5, min_seconds=0,
+										 thresholds={name: 1.5 for name in names}), [])
+
+
+class StageProfilerTest(unittest.TestCase):
+	def test_records_stages_as_json_events(self):
+		logger = MagicMock()
+		with tempfile.TemporaryDirectory() as tmp:
+			profiler = StageProfiler(logger, cprofile_dir=tmp)
+			with profiler.stage('MA') as stage:
+				values = [0.0] * 200_000
+				stage.rows = len(values)
+			with profiler.stage('RSI'):
+				pass
+			self.assertTrue(os.path.exists(os.path.join(tmp, 'MA.prof')))
+		event = json.loads(logger.info.call_args_list[0].args[0])
+		self.assertEqual((event['event'], event['stage'], event['rows']), ('stage', 'MA', 200_000))
+		self.assertGreater(event['peak_mb'], 1)
+		self.assertEqual([record.name for record in profiler.records], ['MA', 'RSI'])
+		with patch('profiling.console') as console:
+			profiler.print_summary()
+		console.print.assert_called_once()
+
+
+class QueueLoggerTest(unittest.TestCase):
+	def test_queue_mode_writes_all_records_on_close(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			logger = Logger(log_dir=tmp, log_level=logging.DEBUG, use_queue=True, queue_size=10)
+			self.assertIsInstance(logger.get_function_logger().handlers[-1], BlockingQueueHandler)
+			for i in range(100):
+				logger.get_function_logger().debug("Quotes for symbol %s received, #%s", 'AAPL', i)
+			logger.close()
+			self.assertNotIn(logger.handler, logger.get_main_logger().handlers)
+			with open(os.path.join(tmp, os.listdir(tmp)[0]), encoding='utf-8') as log_file:
+				lines = log_file.readlines()
+		self.assertEqual(len(lines), 100)
+		self.assertTrue(lines[-1].rstrip().endswith('func\tQuotes for symbol AAPL received, #99'))
+
+	def test_records_are_formatted_by_the_writer(self):
+		records = MagicMock()
+		handler = BlockingQueueHandler(records)
+		record = logging.LogRecord('func', logging.DEBUG, __file__, 1, "MA for %s days", (5,), None)
+		handler.handle(record)
+		queued = records.put.call_args.args[0]
+		self.assertEqual((queued.msg, queued.args), ("MA for %s days", (5,)))
+
+
 if __name__ == '__main__':
 	unittest.main()
@@ -1,4 +1,6 @@
-from InquirerPy.utils import InquirerPyStyle
+import importlib
+import sys
+import types
 from rich.console import Console
 from pathlib import Path
 
@@ -6,13 +8,49 @@ path = Path(__file__).parent
 
 
 console = Console()
-colors = InquirerPyStyle({
+# Prompt style; wrapped into an InquirerPyStyle on first use of `colors`, so importing tools does not load InquirerPy
+COLOR_STYLE = {
 		"question": "#00a400 bold",
 		"answer": "#00a400",
 		"input": "white",
 		"questionmark": "#00a400 bold",
 		"pointer": "#00a400"
-	})
+	}
+
+
+def __getattr__(name):
+    # PEP 562: build attributes that need a heavy import on first access
+    if name == 'colors':
+        from InquirerPy.utils import InquirerPyStyle
+        globals()['colors'] = InquirerPyStyle(COLOR_STYLE)
+        return globals()['colors']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _LazyModule(types.ModuleType):
+    """
+    Stands in for a module until one of its attributes is used, then imports it and forwards every lookup.
+
+    Attributes set on the stand-in (e.g. by `unittest.mock.patch`) shadow those of the module.
+    """
+    def __getattr__(self, attribute):
+        return getattr(importlib.import_module(self.__name__), attribute)
+
+
+def lazy_import(name):
+    """
+    Return the module `name`, deferring the import to the first attribute access.
+
+    Use it for heavy dependencies needed only on some code paths (yfinance, plotly, InquirerPy), so they do not
+    slow down the start of every command. A module that is already imported is returned as is.
+
+    Args:
+        name (str): The dotted module name, e.g. 'plotly.graph_objects'.
+
+    Returns:
+        module: The module, or a stand-in that imports it when used.
+    """
+    return sys.modules.get(name) or _LazyModule(name)
 
 
 def period_spell(period):
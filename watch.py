@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from data_download import notify_if_strong_fluctuations
+from log_manager import Logger
+from providers import default_provider, fetch_range
+from streaming import StreamingIndicators
+from tools import path
+
+# Length of one bar, used to tell finished bars from the one still being traded
+BAR_LENGTH = {'1d': timedelta(days=1), '1h': timedelta(hours=1), '60m': timedelta(hours=1),
+              '30m': timedelta(minutes=30), '15m': timedelta(minutes=15), '5m': timedelta(minutes=5),
+              '2m': timedelta(minutes=2), '1m': timedelta(minutes=1)}
+
+
+class SystemClock:
+    """
+    The wall clock. `now` is timezone-aware (UTC); `wait` returns early when the stop event is set.
+    """
+    def now(self):
+        return datetime.now(timezone.utc)
+
+    def time(self):
+        return time.monotonic()
+
+    def wait(self, seconds, event):
+        event.wait(seconds)
+
+
+class SimulatedClock:
+    """
+    A clock that only moves when waited on, so a scheduler can be tested without sleeping.
+
+    `start` may be timezone-aware; a naive one is read as the exchange time of the watched tickers.
+
+    Attributes:
+        current (datetime): The simulated wall time.
+        waits (list): The seconds of every `wait` call.
+    """
+    def __init__(self, start):
+        self.current = pd.Timestamp(start).to_pydatetime()
+        self.elapsed = 0.0
+        self.waits = []
+
+    def now(self):
+        return self.current
+
+    def time(self):
+        return self.elapsed
+
+    def wait(self, seconds, event):
+        self.waits.append(seconds)
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        self.current += timedelta(seconds=seconds)
+        self.elapsed += seconds
+
+
+def _exchange_time(moment, tz):
+    """
+    `moment` as a timestamp of the exchange timezone `tz`; a naive `moment` is taken to be exchange time already.
+    With no `tz` known the result is naive.
+    """
+    moment = pd.Timestamp(moment)
+    if tz is None:
+        return moment.tz_localize(None)
+    return moment.tz_convert(tz) if moment.tz is not None else moment.tz_localize(tz)
+
+
+class _TickerState:
+    """
+    What the watcher keeps per ticker: the streaming indicators and the closes of the alert window.
+    """
+    def __init__(self, window_size, alert_bars):
+        self.indicators = StreamingIndicators(window_size)
+        self.closes = deque(maxlen=alert_bars)
+        self.dates = deque(maxlen=alert_bars)
+        self.last = None
+        self.tz = None
+
+    def to_dict(self):
+        return {'indicators': self.indicators.to_dict(), 'closes': list(self.closes), 'dates': list(self.dates),
+                'last': self.last, 'tz': self.tz}
+
+    @classmethod
+    def from_dict(cls, state, window_size, alert_bars):
+        ticker_state = cls(window_size, alert_bars)
+        ticker_state.indicators = StreamingIndicators.from_dict(state['indicators'])
+        ticker_state.closes.extend(state['closes'])
+        ticker_state.dates.extend(state['dates'])
+        ticker_state.last = state['last']
+        ticker_state.tz = state.get('tz')
+        return ticker_state
+
+
+class Watcher:
+    """
+    Refreshes a watchlist on a fixed schedule, processing only the bars that arrived since the last refresh.
+
+    On every cycle each ticker is fetched from its last processed bar onwards (the first cycle fetches `lookback`
+    of history to warm up the indicators). Finished bars are fed into the ticker's `StreamingIndicators`, so the
+    work per cycle does not grow with the history; the bar that is still being traded is left for a later cycle.
+    When new bars arrived, the closes of the last `alert_bars` bars are checked with `notify_if_strong_fluctuations`.
+
+    Tickers are refreshed on a thread pool of `max_workers`, and per ticker only the streaming state and the alert
+    window are kept, so both concurrency and memory stay bounded however long the watcher runs. With `state_path`
+    the state is saved after every cycle and a restarted watcher resumes from it.
+
+    Attributes:
+        cycles (int): Number of finished refresh cycles.
+        alerts (list): (ticker, date) of every fluctuation alert fired.
+    """
+    def __init__(self, logger, tickers, interval='1d', every=300.0, threshold=5.0, provider=None, clock=None,
+                 max_workers=4, lookback=timedelta(days=60), alert_bars=20, window_size=5, state_path=None):
+        self.logger = logger
+        self.tickers = list(dict.fromkeys(tickers))
+        self.interval = interval
+        self.every = every
+        self.threshold = threshold
+        self.provider = provider or default_provider()
+        self.clock = clock or SystemClock()
+        self.max_workers = max_workers
+        self.lookback = lookback
+        self.alert_bars = alert_bars
+        self.window_size = window_size
+        self.state_path = state_path
+        self.cycles = 0
+        self.alerts = []
+        self._stopped = threading.Event()
+        self.states = {ticker: _TickerState(window_size, alert_bars) for ticker in self.tickers}
+        if state_path and os.path.exists(state_path):
+            with open(state_path, encoding='utf-8') as file:
+                saved = json.load(file)
+            for ticker, state in saved.items():
+                if ticker in self.states:
+                    self.states[ticker] = _TickerState.from_dict(state, window_size, alert_bars)
+
+    def refresh_ticker(self, ticker):
+        """
+        Fetch and process the new finished bars of one ticker.
+
+        Returns:
+            dict: {'ticker', 'new_bars', 'indicators', 'alert'}, where indicators are the values of the last new bar.
+        """
+        state = self.states[ticker]
+        now = self.clock.now()
+        # Bars and `state.last` are in exchange time, so the clock is read in the exchange timezone; before the
+        # first fetch it is unknown, and the day of slack on the end of the range covers the offset.
+        wall_now = _exchange_time(now, state.tz).tz_localize(None)
+        last = pd.Timestamp(state.last) if state.last else None
+        start = last if last is not None else wall_now - self.lookback
+        end = wall_now + timedelta(days=1)
+        data = fetch_range(self.provider, ticker, start.to_pydatetime(), end.to_pydatetime(), self.interval,
+                           max_workers=1)
+        if data is None or data.empty:
+            data = pd.DataFrame({'Close': []}, index=pd.DatetimeIndex([]))
+        tz = getattr(data.index, 'tz', None)
+        if tz is not None:
+            state.tz = str(tz)
+        wall = data.index.tz_localize(None) if tz is not None else data.index
+        finished = data.index + BAR_LENGTH[self.interval] <= _exchange_time(now, tz)
+        new = finished if last is None else finished & (wall > last)
+        values = None
+        for date, close in zip(wall[new], data['Close'].to_numpy()[new]):
+            values = state.indicators.update(float(close), date)
+            state.closes.append(float(close))
+            state.dates.append(date.isoformat())
+            state.last = date.isoformat()
+        alert = False
+        if new.any():
+            period = [pd.Timestamp(state.dates[0]).strftime('%d.%m.%Y'),
+                      pd.Timestamp(state.dates[-1]).strftime('%d.%m.%Y')]
+            alert = bool(notify_if_strong_fluctuations(self.logger, pd.DataFrame({'Close': state.closes}),
+                                                       self.threshold, ticker, period))
+            if alert:
+                self.alerts.append((ticker, state.last))
+        self.logger.debug("Watch refresh of %s: %s new bars", ticker, int(new.sum()))
+        return {'ticker': ticker, 'new_bars': int(new.sum()), 'indicators': values, 'alert': alert}
+
+    def run_once(self, pool=None):
+        """
+        Refresh every ticker of the watchlist once. A failing ticker is logged and skipped until the next cycle.
+
+        Returns:
+            dict: {ticker: refresh_ticker result}, failed tickers are left out.
+        """
+        own_pool = pool is None
+        pool = pool or ThreadPoolExecutor(max_workers=self.max_workers)
+        results = {}
+        try:
+            futures = {ticker: pool.submit(self.refresh_ticker, ticker) for ticker in self.tickers}
+            for ticker, future in futures.items():
+                try:
+                    results[ticker] = future.result()
+                except Exception as e:
+                    self.logger.debug("Watch refresh of %s failed: %s", ticker, e)
+        finally:
+            if own_pool:
+                pool.shutdown()
+        self.cycles += 1
+        if self.state_path:
+            self.save_state()
+        return results
+
+    def run(self, cycles=None):
+        """
+        Refresh the watchlist every `every` seconds until `stop` is called or `cycles` cycles are done.
+
+        Cycles are scheduled at fixed times from the start; if a cycle overruns, the missed slots are skipped
+        instead of being run back to back.
+        """
+        self._stopped.clear()
+        next_run = self.clock.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while not self._stopped.is_set():
+                self.run_once(pool)
+                if cycles is not None and self.cycles >= cycles:
+                    break
+                next_run += self.every
+                now = self.clock.time()
+                if now > next_run:
+                    next_run += ((now - next_run) // self.every + 1) * self.every
+                self.clock.wait(next_run - now, self._stopped)
+
+    def stop(self):
+        self._stopped.set()
+
+    def save_state(self):
+        """
+        Write the state of every ticker to `state_path` as JSON.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        with open(self.state_path, 'w', encoding='utf-8') as file:
+            json.dump({ticker: state.to_dict() for ticker, state in self.states.items()}, file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch a list of tickers and alert on strong fluctuations")
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--interval", default="1d", choices=sorted(BAR_LENGTH))
+    parser.add_argument("--every", type=float, default=300.0, help="seconds between refreshes")
+    parser.add_argument("--threshold", type=float, default=5.0, help="fluctuation threshold, percent")
+    parser.add_argument("--alert-bars", type=int, default=20, help="bars checked for fluctuations")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--state", default=os.path.join(path, "store", "watch.json"), help="state file")
+    args = parser.parse_args(argv)
+
+    logger = Logger(use_queue=True)
+    watcher = Watcher(logger.get_function_logger(), args.tickers, args.interval, args.every, args.threshold,
+                      max_workers=args.workers, alert_bars=args.alert_bars, state_path=args.state)
+    logger.get_main_logger().info(f"Watching {', '.join(watcher.tickers)} every {args.every:g}s")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    logger.get_main_logger().info("Stop\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+
+# Build a date x ticker matrix of close prices from per-ticker frames
+def close_matrix(frames):
+    """
+    Combine per-ticker quote frames into one wide close-price matrix.
+
+    Args:
+        frames (dict): {ticker: DataFrame} as returned by `fetch_stock_data` (with a 'Date' column)
+                       or by a provider (indexed by date).
+
+    Returns:
+        pandas.DataFrame: Close prices indexed by date with one column per ticker. Dates missing for a ticker are NaN.
+    """
+    columns = {}
+    for ticker, data in frames.items():
+        close = data.set_index('Date')['Close'] if 'Date' in data.columns else data['Close']
+        columns[ticker] = close[~close.index.duplicated(keep='last')]
+    return pd.DataFrame(columns).sort_index()
+
+
+def _first_valid(values):
+    """Row position of the first non-NaN value of every column (len(values) for all-NaN columns)."""
+    valid = ~np.isnan(values)
+    return np.where(valid.any(axis=0), valid.argmax(axis=0), len(values))
+
+
+def rolling_mean(values, window, min_periods=None):
+    """
+    Rolling mean of every column of a 2-D float array, computed with cumulative sums.
+
+    Matches `pandas.Series.rolling(window, min_periods).mean()` applied to each column: NaN values are skipped and a
+    window needs at least `min_periods` valid values (defaults to `window`).
+    """
+    min_periods = window if min_periods is None else min_periods
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / counts
+    mean[counts < max(min_periods, 1)] = np.nan
+    return mean
+
+
+def ewm_mean(values, span):
+    """
+    Exponentially weighted mean of every column of a 2-D float array.
+
+    Follows the recursion of `pandas.Series.ewm(span=span, adjust=False).mean()`: each column starts at its first
+    valid value, and NaN values keep the previous mean while still decaying its weight.
+    The loop runs over rows, each step updating all columns at once.
+    """
+    alpha = 2.0 / (span + 1.0)
+    result = np.empty_like(values)
+    weighted = values[0].copy()
+    old_weight = np.ones(values.shape[1])
+    result[0] = weighted
+    for i in range(1, len(values)):
+        current = values[i]
+        observed = ~np.isnan(current)
+        started = ~np.isnan(weighted)
+        old_weight = np.where(started, old_weight * (1.0 - alpha), old_weight)
+        update = started & observed
+        weighted = np.where(update, (old_weight * weighted + alpha * current) / (old_weight + alpha), weighted)
+        old_weight = np.where(update, 1.0, old_weight)
+        weighted = np.where(~started & observed, current, weighted)
+        result[i] = weighted
+    return result
+
+
+def rsi(values, window=14):
+    """
+    Relative Strength Index of every column of a 2-D float array.
+
+    Same definition as `data_download.calculate_rsi`: simple rolling means of gains and losses with min_periods=1,
+    where the warm-up of each column starts at its own first valid close.
+    """
+    delta = np.full_like(values, np.nan)
+    delta[1:] = values[1:] - values[:-1]
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    gain_sums = np.cumsum(gain, axis=0)
+    loss_sums = np.cumsum(loss, axis=0)
+    gain_sums[window:] = gain_sums[window:] - gain_sums[:-window]
+    loss_sums[window:] = loss_sums[window:] - loss_sums[:-window]
+    # Rows since the first valid close; earlier rows belong to no history at all
+    position = np.arange(len(values))[:, None] - _first_valid(values)[None, :] + 1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rs = gain_sums / loss_sums
+        result = 100 - (100 / (1 + rs))
+    result[position < 1] = np.nan
+    return result
+
+
+def macd(values, short=12, long=26):
+    """
+    MACD (short EMA minus long EMA) of every column of a 2-D float array, as in `data_download.calculate_macd`.
+    """
+    return ewm_mean(values, short) - ewm_mean(values, long)
+
+
+# Calculate MA, RSI and MACD for a whole universe at once
+def wide_indicators(logger, close, window_size=5):
+    """
+    Calculate MA, RSI and MACD for every ticker of a wide close-price matrix in one pass of 2-D array operations.
+
+    The results equal those of `add_moving_average`, `calculate_rsi` and `calculate_macd` applied to each ticker
+    separately (with the ticker's leading NaN rows dropped), but the pandas overhead is paid once per universe
+    instead of once per ticker.
+
+    Args:
+        logger (logging.Logger): The logger object used to log debug messages.
+        close (pandas.DataFrame): Close prices indexed by date with one column per ticker, see `close_matrix`.
+        window_size (int): The window size (in days) of the moving average.
+
+    Returns:
+        dict: {'MA': DataFrame, 'RSI': DataFrame, 'MACD': DataFrame} shaped like `close`.
+              Returns None if an error occurs.
+
+    Logs:
+        Logs a debug message when the indicators are calculated or if an error occurs.
+    """
+    try:
+        values = close.to_numpy(dtype=float)
+        frame = lambda result: pd.DataFrame(result, index=close.index, columns=close.columns)
+        indicators = {'MA': frame(rolling_mean(values, window_size)),
+                      'RSI': frame(rsi(values)),
+                      'MACD': frame(macd(values))}
+        logger.debug("Indicators calculated for %s tickers and %s dates", close.shape[1], close.shape[0])
+        return indicators
+    except Exception as e:
+        logger.debug("Error calculating wide indicators: %s", e)